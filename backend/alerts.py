@@ -1,49 +1,269 @@
 # alerts.py
 from db import db
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from indexes import declare_indexes, register_query
 from notifications import notify_user, notify_service_centre
 from db import db
 from voice_agent import trigger_voice_call
+import rollups
+from entity_cache import get_vehicle, get_user
+from config import ALERT_DEDUP_WINDOW_SECONDS, ALERT_DEDUP_WINDOWS
 
 alerts_col = db.alerts
 diagnosis_col = db.diagnosis
 
+declare_indexes(
+    "alerts",
+    [("vehicle_id", 1), ("timestamp", -1)],
+    [("feedback", 1)],
+    # Dedup lookup of the open alert for a (vehicle_id, alert_type)
+    [("vehicle_id", 1), ("alert_type", 1), ("resolved", 1), ("last_seen", -1)]
+)
+declare_indexes("diagnosis", [("alert_id", 1)])
 
+register_query(
+    "alerts.by_vehicles", "alerts",
+    {"vehicle_id": {"$in": ["VIN"]}}, sort=[("timestamp", -1)]
+)
+register_query(
+    "alerts.open", "alerts",
+    {"vehicle_id": "VIN", "alert_type": "TYPE", "resolved": False,
+     "last_seen": {"$gte": datetime(1970, 1, 1)}},
+    sort=[("last_seen", -1)]
+)
+register_query("alerts.false_positives", "alerts", {"feedback": "FALSE_POSITIVE"})
+register_query("diagnosis.by_alerts", "diagnosis", {"alert_id": {"$in": ["ALERT"]}})
 
-def create_alert(vehicle_id, alert_type, value, severity):
+# -------- DEDUP -------- #
+#
+# A flapping sensor would otherwise insert (and text, and call about) the
+# same alert on every reading. While an unresolved alert for a
+# (vehicle_id, alert_type) was last seen within its window, repeats only
+# bump its occurrences / last_seen. The owner is notified again only when a
+# repeat raises the severity. The alert keeps the first occurrence's
+# telemetry_timestamp, so MTTD measures the first detection.
+#
+# Concurrent workers can each open a new alert for the same key at the same
+# moment; later repeats then fold into the most recently seen one.
+
+ALERT_CREATED = "created"
+ALERT_SUPPRESSED = "suppressed"
+ALERT_ESCALATED = "escalated"
+
+SEVERITY_RANK = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
+
+
+def _parse_windows(spec: str) -> dict:
+    windows = {}
+    for item in spec.split(","):
+        if "=" in item:
+            alert_type, seconds = item.split("=", 1)
+            windows[alert_type.strip()] = int(seconds)
+    return windows
+
+
+DEDUP_WINDOWS = _parse_windows(ALERT_DEDUP_WINDOWS)
+
+
+def dedup_window(alert_type: str):
+    seconds = DEDUP_WINDOWS.get(alert_type, ALERT_DEDUP_WINDOW_SECONDS)
+    return timedelta(seconds=seconds) if seconds > 0 else None
+
+
+def _rank(severity) -> int:
+    return SEVERITY_RANK.get(severity, 0)
+
+
+def _absorb(vehicle_id, alert_type, value, severity, occurrences: int = 1):
+    """
+    Fold occurrences into the open alert for (vehicle_id, alert_type).
+    Returns (alert, outcome), or None when there is no open alert.
+    """
+    window = dedup_window(alert_type)
+    if window is None:
+        return None
+
+    now = datetime.utcnow()
+    alert = alerts_col.find_one_and_update(
+        {
+            "vehicle_id": vehicle_id,
+            "alert_type": alert_type,
+            "resolved": False,
+            "last_seen": {"$gte": now - window}
+        },
+        {
+            "$inc": {"occurrences": occurrences},
+            "$set": {"last_seen": now, "last_value": value}
+        },
+        sort=[("last_seen", -1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if alert is None:
+        return None
+
+    if _rank(severity) <= _rank(alert["severity"]):
+        return alert, ALERT_SUPPRESSED
+
+    # Conditional on the old severity so only one worker escalates
+    lower = [s for s in SEVERITY_RANK if _rank(s) < _rank(severity)]
+    escalated = alerts_col.update_one(
+        {"_id": alert["_id"], "severity": {"$in": lower}},
+        {"$set": {"severity": severity, "escalated_at": now}, "$inc": {"escalations": 1}}
+    ).modified_count
+    if not escalated:
+        return alert, ALERT_SUPPRESSED
+
+    rollups.record_status_change("severity", alert["severity"], severity)
+    alert["severity"] = severity
+    return alert, ALERT_ESCALATED
+
+
+# -------- ALERTS -------- #
+
+def _build_alert(vehicle_id, alert_type, value, severity, telemetry_timestamp=None, occurrences=1):
+    now = datetime.utcnow()
     alert = {
         "vehicle_id": vehicle_id,
-        "timestamp": datetime.utcnow(),
+        "timestamp": now,
         "alert_type": alert_type,
         "value": value,
         "severity": severity,
-        "resolved": False
+        "resolved": False,
+        "occurrences": occurrences,
+        "last_seen": now
     }
 
-    alert_id = alerts_col.insert_one(alert).inserted_id
+    # Timestamp of the reading that triggered this alert; the gap between
+    # the two is what mean_time_to_detect reports
+    if telemetry_timestamp is not None:
+        if isinstance(telemetry_timestamp, str):
+            telemetry_timestamp = datetime.fromisoformat(telemetry_timestamp)
+        if telemetry_timestamp.tzinfo is not None:
+            # Stored times are naive UTC; "...Z" / "+05:30" parse as aware
+            telemetry_timestamp = telemetry_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        alert["telemetry_timestamp"] = telemetry_timestamp
+        alert["detection_latency_ms"] = max(
+            0.0, (alert["timestamp"] - telemetry_timestamp).total_seconds() * 1000
+        )
+    return alert
+
+
+def _notify_alert(alert: dict, escalated: bool = False):
+    vehicle_id = alert["vehicle_id"]
+    alert_type = alert["alert_type"]
+    severity = alert["severity"]
+
+    if escalated:
+        message = (
+            f"Alert escalated: {alert_type} (Severity: {severity}, "
+            f"{alert.get('occurrences', 1)} occurrences)"
+        )
+    else:
+        message = f"Alert detected: {alert_type} (Severity: {severity})"
 
     # 🔔 Notify vehicle owner
-    vehicle = db.vehicles.find_one({"_id": vehicle_id})
+    vehicle = get_vehicle(vehicle_id)
     if vehicle:
         notify_user(
             user_id=vehicle["owner_user_id"],
-            message=f"Alert detected: {alert_type} (Severity: {severity})"
+            message=message
         )
-    if severity == "HIGH" :
-        vehicle = db.vehicles.find_one({"_id": vehicle_id})
-        if vehicle:
-            user = db.users.find_one({"_id": vehicle["owner_user_id"]})
-            if user and user.get("phone"):
-                trigger_voice_call(user["phone"])
+    if severity == "HIGH" and vehicle:
+        user = get_user(vehicle["owner_user_id"])
+        if user and user.get("phone"):
+            trigger_voice_call(user["phone"])
 
-    return alert_id
 
+def raise_alert(vehicle_id, alert_type, value, severity, telemetry_timestamp=None):
+    """
+    Create an alert, or fold it into the open one for the same vehicle and
+    type. Returns (alert, outcome), outcome being one of ALERT_CREATED,
+    ALERT_SUPPRESSED or ALERT_ESCALATED.
+    """
+    absorbed = _absorb(vehicle_id, alert_type, value, severity)
+    if absorbed:
+        alert, outcome = absorbed
+        if outcome == ALERT_ESCALATED:
+            _notify_alert(alert, escalated=True)
+        return alert, outcome
 
-def create_diagnosis(alert_id, diagnosis: dict):
-    if not diagnosis:
-        return
+    alert = _build_alert(vehicle_id, alert_type, value, severity, telemetry_timestamp)
+    alerts_col.insert_one(alert)
+    rollups.record_alert(alert)
+    _notify_alert(alert)
+
+    return alert, ALERT_CREATED
 
-    diagnosis_doc = {
+
+def create_alert(vehicle_id, alert_type, value, severity, telemetry_timestamp=None):
+    """raise_alert, returning only the (new or open) alert's id."""
+    alert, _ = raise_alert(vehicle_id, alert_type, value, severity, telemetry_timestamp)
+    return alert["_id"]
+
+
+def create_alerts_many(specs: list) -> list:
+    """
+    raise_alert for a batch. Each spec holds create_alert's keyword
+    arguments. Repeats within the batch are folded together first, so each
+    (vehicle_id, alert_type) costs at most one dedup lookup. New alerts go in
+    with one insert_many and one rollup write.
+
+    Returns (alert, outcome) pairs in spec order; repeats of a key after its
+    first spec are ALERT_SUPPRESSED.
+    """
+    if not specs:
+        return []
+
+    groups = {}
+    for i, spec in enumerate(specs):
+        groups.setdefault((spec["vehicle_id"], spec["alert_type"]), []).append(i)
+
+    results = [None] * len(specs)
+    new_alerts = []
+    for (vehicle_id, alert_type), indices in groups.items():
+        batch = [specs[i] for i in indices]
+        if dedup_window(alert_type) is None:
+            for i, spec in zip(indices, batch):
+                alert = _build_alert(**spec)
+                new_alerts.append(alert)
+                results[i] = (alert, ALERT_CREATED)
+            continue
+
+        severity = max((spec["severity"] for spec in batch), key=_rank)
+        absorbed = _absorb(vehicle_id, alert_type, batch[-1]["value"], severity, len(batch))
+        if absorbed:
+            alert, outcome = absorbed
+            if outcome == ALERT_ESCALATED:
+                _notify_alert(alert, escalated=True)
+        else:
+            # First reading's value and timestamp, highest severity seen
+            first = batch[0]
+            alert = _build_alert(
+                vehicle_id, alert_type, first["value"], severity,
+                first.get("telemetry_timestamp"), occurrences=len(batch)
+            )
+            if len(batch) > 1:
+                alert["last_value"] = batch[-1]["value"]
+            new_alerts.append(alert)
+            outcome = ALERT_CREATED
+
+        results[indices[0]] = (alert, outcome)
+        for i in indices[1:]:
+            results[i] = (alert, ALERT_SUPPRESSED)
+
+    if new_alerts:
+        # insert_many fills in _id on each document
+        alerts_col.insert_many(new_alerts)
+        rollups.record_alerts(new_alerts)
+        for alert in new_alerts:
+            _notify_alert(alert)
+
+    return results
+
+
+def _diagnosis_doc(alert_id, diagnosis: dict) -> dict:
+    return {
         "alert_id": alert_id,
         "probable_cause": diagnosis["probable_cause"],
         "recommendation": diagnosis["recommendation"],
@@ -51,12 +271,9 @@ def create_diagnosis(alert_id, diagnosis: dict):
         "created_at": datetime.utcnow()
     }
 
-    diagnosis_col.insert_one(diagnosis_doc)
-    alert = alerts_col.find_one({"_id": alert_id})
-    if not alert:
-        return
 
-    vehicle = db.vehicles.find_one({"_id": alert["vehicle_id"]})
+def _notify_diagnosis(alert: dict, diagnosis: dict):
+    vehicle = get_vehicle(alert["vehicle_id"])
     if not vehicle:
         return
 
@@ -74,3 +291,30 @@ def create_diagnosis(alert_id, diagnosis: dict):
                 message=f"High severity alert requires attention for vehicle {alert['vehicle_id']}"
             )
 
+
+def create_diagnosis(alert_id, diagnosis: dict):
+    if not diagnosis:
+        return
+
+    diagnosis_col.insert_one(_diagnosis_doc(alert_id, diagnosis))
+    alert = alerts_col.find_one({"_id": alert_id})
+    if not alert:
+        return
+
+    _notify_diagnosis(alert, diagnosis)
+
+
+def create_diagnoses_many(pairs: list):
+    """
+    Insert diagnoses for (alert document, diagnosis) pairs in one insert_many.
+    The alerts are already in hand, so they are not read back.
+    """
+    pairs = [(alert, diagnosis) for alert, diagnosis in pairs if diagnosis]
+    if not pairs:
+        return
+
+    diagnosis_col.insert_many([
+        _diagnosis_doc(alert["_id"], diagnosis) for alert, diagnosis in pairs
+    ])
+    for alert, diagnosis in pairs:
+        _notify_diagnosis(alert, diagnosis)
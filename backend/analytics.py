@@ -2,6 +2,11 @@
 from db import telemetry_col, db
 import numpy as np
 import ml
+from model_registry import ModelNotAvailableError, current_version
+from scoring_pool import scoring_pool
+from telemetry_store import to_query_time
+from fastapi.concurrency import run_in_threadpool
+import rollups
 from db import db
 from datetime import datetime, timedelta
 
@@ -16,34 +21,27 @@ else:
     rca_col = db.rca
     capa_col = db.capa_actions
 
-def anomaly_score_stats(limit=1000):
-    if telemetry_col is None:
-        return {
-            "count": 0,
-            "mean_score": 0.0,
-            "min_score": 0.0,
-            "max_score": 0.0,
-            "anomaly_rate": 0.0
-        }
-    
-    cursor = telemetry_col.find().sort("timestamp", -1).limit(limit)
+def _empty_score_stats():
+    return {
+        "count": 0,
+        "mean_score": 0.0,
+        "min_score": 0.0,
+        "max_score": 0.0,
+        "anomaly_rate": 0.0
+    }
 
-    scores = []
-    for t in cursor:
-        try:
-            result = ml.detect_anomaly(t)
-            scores.append(result["anomaly_score"])
-        except:
-            continue
+def _recent_feature_docs(limit):
+    projection = {f: 1 for f in ml.FEATURES}
+    projection["_id"] = 0
+    return list(
+        telemetry_col.find({}, projection).sort("timestamp", -1).limit(limit)
+    )
+
+def _score_stats(results):
+    scores = [r["anomaly_score"] for r in results if r is not None]
 
     if len(scores) == 0:
-        return {
-            "count": 0,
-            "mean_score": 0.0,
-            "min_score": 0.0,
-            "max_score": 0.0,
-            "anomaly_rate": 0.0
-        }
+        return _empty_score_stats()
 
     return {
         "count": len(scores),
@@ -52,48 +50,121 @@ def anomaly_score_stats(limit=1000):
         "max_score": float(np.max(scores)),
         "anomaly_rate": sum(1 for s in scores if s < 0) / len(scores) if len(scores) > 0 else 0.0
     }
+
+def anomaly_score_stats(limit=1000):
+    if telemetry_col is None:
+        return _empty_score_stats()
+
+    docs = _recent_feature_docs(limit)
+    try:
+        # Scored in the process pool; this thread waits without holding the GIL
+        results = scoring_pool.detect_anomalies_batch(docs, skip_invalid=True)
+    except ModelNotAvailableError:
+        results = []
+    return _score_stats(results)
+
+async def anomaly_score_stats_async(limit=1000):
+    if telemetry_col is None:
+        return _empty_score_stats()
+
+    docs = await run_in_threadpool(_recent_feature_docs, limit)
+    try:
+        results = await scoring_pool.detect_anomalies_batch_async(docs, skip_invalid=True)
+    except ModelNotAvailableError:
+        results = []
+    return _score_stats(results)
+
+async def rescore_history(vehicle_id=None, start=None, end=None, limit=None, page_size=50000):
+    """
+    Score stored telemetry with the active model, page by page, without
+    writing anything back. Used to check a new model version against history.
+    """
+    if telemetry_col is None:
+        return {**_empty_score_stats(), "skipped": 0, "model_version": None}
+
+    query = {}
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = to_query_time(start)
+        if end:
+            query["timestamp"]["$lte"] = to_query_time(end)
+
+    projection = {f: 1 for f in ml.FEATURES}
+
+    def fetch_page(after_id, size):
+        page_query = dict(query)
+        if after_id is not None:
+            page_query["_id"] = {"$gt": after_id}
+        return list(telemetry_col.find(page_query, projection).sort("_id", 1).limit(size))
+
+    count = anomalies = skipped = 0
+    total = 0.0
+    low = high = None
+    last_id = None
+    while limit is None or count + skipped < limit:
+        size = page_size if limit is None else min(page_size, limit - count - skipped)
+        docs = await run_in_threadpool(fetch_page, last_id, size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        results = await scoring_pool.detect_anomalies_batch_async(docs, skip_invalid=True)
+        scores = np.array([r["anomaly_score"] for r in results if r is not None])
+        skipped += len(docs) - len(scores)
+        if len(scores):
+            count += len(scores)
+            anomalies += int((scores < 0).sum())
+            total += float(scores.sum())
+            low = float(scores.min()) if low is None else min(low, float(scores.min()))
+            high = float(scores.max()) if high is None else max(high, float(scores.max()))
+
+    return {
+        "count": count,
+        "skipped": skipped,
+        "mean_score": total / count if count else 0.0,
+        "min_score": low or 0.0,
+        "max_score": high or 0.0,
+        "anomaly_rate": anomalies / count if count else 0.0,
+        "model_version": current_version()
+    }
+
 def alert_rate():
     if telemetry_col is None or alerts_col is None:
         return 0.0
-    total = telemetry_col.count_documents({})
-    alerts = alerts_col.count_documents({})
+    # Collection metadata count, no scan
+    total = telemetry_col.estimated_document_count()
+    alerts = rollups.get_total("alerts", "total")
     return alerts / max(total, 1)
 
-def mean_time_to_detect():
-    if telemetry_col is None:
-        return 0.0
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "alerts",
-                "localField": "vehicle_id",
-                "foreignField": "vehicle_id",
-                "as": "alerts"
-            }
-        },
-        {"$unwind": "$alerts"},
-        {
-            "$project": {
-                "latency": {
-                    "$subtract": ["$alerts.timestamp", "$timestamp"]
-                }
-            }
-        }
-    ]
-    results = list(telemetry_col.aggregate(pipeline))
-    return sum(r["latency"] for r in results) / max(len(results), 1)
+def mean_time_to_detect(days=None):
+    """
+    Mean milliseconds from the anomalous reading that triggered an alert to
+    the alert itself. Alerts record the triggering telemetry timestamp at
+    write time, so this reads rollup buckets instead of joining telemetry.
+    """
+    if days is None:
+        count = rollups.get_total("detection", "count")
+        latency = rollups.get_total("detection", "latency_ms")
+    else:
+        since = datetime.utcnow() - timedelta(days=days)
+        count = sum(b["count"] for b in rollups.get_series("detection", "count", "day", since))
+        latency = sum(b["count"] for b in rollups.get_series("detection", "latency_ms", "day", since))
+    return latency / max(count, 1)
 def anomaly_to_rca_rate():
     if alerts_col is None or rca_col is None:
         return 0.0
-    anomalies = alerts_col.count_documents({"alert_type": "ANOMALY_DETECTED"})
-    rcas = rca_col.count_documents({})
+    anomalies = rollups.get_total("alert_type", "ANOMALY_DETECTED")
+    rcas = rollups.get_total("rca", "total")
     return rcas / max(anomalies, 1)
 
 def false_positive_rate():
     if alerts_col is None:
         return 0.0
     false_pos = alerts_col.count_documents({"feedback": "FALSE_POSITIVE"})
-    total = alerts_col.count_documents({})
+    total = rollups.get_total("alerts", "total")
     return false_pos / max(total, 1)
 
 
@@ -102,30 +173,19 @@ def alert_trend(days=7):
         return []
     since = datetime.utcnow() - timedelta(days=days)
 
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": since}}},
-        {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
+    return [
+        {"_id": b["bucket"].strftime("%Y-%m-%d"), "count": b["count"]}
+        for b in rollups.get_series("alerts", "total", "day", since)
     ]
-    return list(alerts_col.aggregate(pipeline))
 
 def severity_distribution():
     if alerts_col is None:
         return []
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$severity",
-                "count": {"$sum": 1}
-            }
-        }
+    return [
+        {"_id": severity, "count": count}
+        for severity, count in rollups.get_totals("severity").items()
+        if count > 0
     ]
-    return list(alerts_col.aggregate(pipeline))
 
 def rca_closure_rate():
     if rca_col is None:
@@ -134,8 +194,8 @@ def rca_closure_rate():
             "closed_rca": 0,
             "closure_rate": 0
         }
-    total = rca_col.count_documents({})
-    closed = rca_col.count_documents({"status": "CLOSED"})
+    total = rollups.get_total("rca", "total")
+    closed = rollups.get_total("rca_status", "CLOSED")
 
     return {
         "total_rca": total,
@@ -0,0 +1,264 @@
+# anomaly_worker.py
+"""
+Anomaly detection worker fed by the telemetry Redis stream.
+
+set_telemetry / ingest XADD every reading to TELEMETRY_STREAM_KEY. Workers
+share one consumer group, so each reading is handled by exactly one of
+them, and more processes can be added to scale out:
+
+    python anomaly_worker.py [processes]
+
+A worker reads micro-batches and runs them through the batch graph: one
+IsolationForest call, bulk alert / diagnosis inserts and coalesced twin updates.
+A batch is acked once it is done. Entries left pending by a crashed
+worker are claimed by another after ANOMALY_WORKER_CLAIM_IDLE_MS. Entries that keep failing are
+dropped after ANOMALY_WORKER_MAX_DELIVERIES attempts.
+"""
+
+import os
+import socket
+import threading
+import time
+from redis.exceptions import ResponseError
+
+import telemetry_codec
+from graph import run_batch, publish_node_stats
+from model_registry import ModelNotAvailableError
+from redis_client import redis_client
+from config import (
+    TELEMETRY_STREAM_KEY,
+    ANOMALY_WORKER_GROUP,
+    ANOMALY_WORKER_BATCH_SIZE,
+    ANOMALY_WORKER_BLOCK_MS,
+    ANOMALY_WORKER_CLAIM_IDLE_MS,
+    ANOMALY_WORKER_MAX_DELIVERIES
+)
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def ensure_group():
+    try:
+        # "0" so a fresh group also picks up whatever is already in the stream
+        redis_client.xgroup_create(TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def stream_stats() -> dict:
+    """Stream length, consumer group lag and pending entries, across all workers."""
+    try:
+        groups = redis_client.xinfo_groups(TELEMETRY_STREAM_KEY)
+    except ResponseError:
+        return {"stream": TELEMETRY_STREAM_KEY, "length": 0, "group": None}
+
+    group = next((g for g in groups if _text(g["name"]) == ANOMALY_WORKER_GROUP), None)
+    stats = {
+        "stream": TELEMETRY_STREAM_KEY,
+        "length": redis_client.xlen(TELEMETRY_STREAM_KEY),
+        "group": ANOMALY_WORKER_GROUP if group else None
+    }
+    if not group:
+        return stats
+
+    pending = redis_client.xpending(TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP)
+    oldest_pending_age = None
+    if pending["pending"]:
+        # Stream ids start with the millisecond timestamp of the XADD
+        oldest_ms = int(_text(pending["min"]).split("-")[0])
+        oldest_pending_age = round(time.time() - oldest_ms / 1000, 3)
+
+    stats.update({
+        # Entries not yet delivered to any consumer (Redis >= 7)
+        "lag": group.get("lag"),
+        "pending": group["pending"],
+        "oldest_pending_age_seconds": oldest_pending_age,
+        "last_delivered_id": _text(group["last-delivered-id"]),
+        "consumers": [
+            {
+                "name": _text(c["name"]),
+                "pending": c["pending"],
+                "idle_ms": c["idle"]
+            }
+            for c in redis_client.xinfo_consumers(TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP)
+        ]
+    })
+    return stats
+
+
+class AnomalyWorker:
+    def __init__(
+        self,
+        consumer: str = None,
+        batch_size: int = ANOMALY_WORKER_BATCH_SIZE,
+        block_ms: int = ANOMALY_WORKER_BLOCK_MS,
+        claim_idle_ms: int = ANOMALY_WORKER_CLAIM_IDLE_MS,
+        max_deliveries: int = ANOMALY_WORKER_MAX_DELIVERIES
+    ):
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.should_stop = threading.Event()
+        self.thread = None
+        self._claim_cursor = "0-0"
+        self._last_claim = 0.0
+
+        self.processed = 0
+        self.anomalies = 0
+        self.unscored = 0
+        self.dropped = 0
+        self.reclaimed = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.last_timings = {}
+
+    # -------- CONSUMING -------- #
+
+    def _drop_poison(self):
+        """Ack entries that have failed too often so they stop coming back."""
+        stuck = redis_client.xpending_range(
+            TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP,
+            min="-", max="+", count=self.batch_size, idle=self.claim_idle_ms
+        )
+        dead = [e["message_id"] for e in stuck if e["times_delivered"] >= self.max_deliveries]
+        if dead:
+            redis_client.xack(TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP, *dead)
+            self.dropped += len(dead)
+            print(f"[anomaly_worker] Dropped {len(dead)} entries after {self.max_deliveries} attempts")
+
+    def _reclaim(self) -> list:
+        # Checked at most every claim interval; XAUTOCLAIM walks the PEL
+        now = time.monotonic()
+        if now - self._last_claim < self.claim_idle_ms / 1000:
+            return []
+        self._last_claim = now
+
+        self._drop_poison()
+        cursor, entries, *_ = redis_client.xautoclaim(
+            TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id=self._claim_cursor, count=self.batch_size
+        )
+        self._claim_cursor = cursor
+        # Entries trimmed from the stream come back without fields
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        self.reclaimed += len(entries)
+        return entries
+
+    def read_batch(self) -> list:
+        entries = self._reclaim()
+        if entries:
+            return entries
+        response = redis_client.xreadgroup(
+            ANOMALY_WORKER_GROUP, self.consumer,
+            {TELEMETRY_STREAM_KEY: ">"},
+            count=self.batch_size, block=self.block_ms
+        )
+        return response[0][1] if response else []
+
+    # -------- PROCESSING -------- #
+
+    def process(self, entries: list):
+        """Score and handle one batch, then ack it. Raises to leave it pending."""
+        ids = []
+        readings = []
+        for entry_id, fields in entries:
+            ids.append(entry_id)
+            try:
+                readings.append(telemetry_codec.decode(fields[b"data"]))
+            except Exception as e:
+                print(f"[anomaly_worker] Undecodable entry {_text(entry_id)}: {e}")
+                self.dropped += 1
+
+        if readings:
+            # Vectorized scoring, bulk alert/diagnosis inserts, twin via twin_writer
+            state = run_batch(readings)
+            self.anomalies += sum(1 for a in state["alert_ids"] if a)
+            # Readings missing a model feature are acked without scoring
+            unscored = sum(1 for a in state["anomalies"] if a is None)
+            if unscored:
+                self.unscored += unscored
+                print(f"[anomaly_worker] {unscored}/{len(readings)} readings in batch could not be scored")
+            self.last_timings = state["timings"]
+            publish_node_stats()
+
+        if ids:
+            redis_client.xack(TELEMETRY_STREAM_KEY, ANOMALY_WORKER_GROUP, *ids)
+        self.processed += len(ids)
+
+    def run_once(self) -> int:
+        entries = self.read_batch()
+        if not entries:
+            return 0
+        t0 = time.perf_counter()
+        self.process(entries)
+        self.last_batch_size = len(entries)
+        self.last_batch_ms = (time.perf_counter() - t0) * 1000
+        return len(entries)
+
+    # -------- LIFECYCLE -------- #
+
+    def run(self):
+        ensure_group()
+        print(f"[anomaly_worker] {self.consumer} consuming {TELEMETRY_STREAM_KEY}")
+        while not self.should_stop.is_set():
+            try:
+                self.run_once()
+            except ModelNotAvailableError as e:
+                # Nothing can be scored yet; leave entries pending and wait
+                print(f"[anomaly_worker] {e}")
+                self.should_stop.wait(self.claim_idle_ms / 1000)
+            except Exception as e:
+                print(f"[anomaly_worker] Batch failed, will be retried: {e}")
+                self.should_stop.wait(1)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.should_stop.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.should_stop.set()
+        if self.thread:
+            self.thread.join(timeout=self.block_ms / 1000 + 5)
+
+    def get_stats(self) -> dict:
+        return {
+            "consumer": self.consumer,
+            "processed": self.processed,
+            "anomalies": self.anomalies,
+            "unscored": self.unscored,
+            "dropped": self.dropped,
+            "reclaimed": self.reclaimed,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "last_node_ms": {k: round(v, 2) for k, v in self.last_timings.items()}
+        }
+
+
+anomaly_worker = AnomalyWorker()
+
+
+def _run_process():
+    AnomalyWorker().run()
+
+
+if __name__ == "__main__":
+    import sys
+    from multiprocessing import Process
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    if processes == 1:
+        _run_process()
+    else:
+        workers = [Process(target=_run_process) for _ in range(processes)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
@@ -0,0 +1,401 @@
+"""
+Benchmarks for the hot paths, run in-process against mongomock/fakeredis.
+
+    python benchmarks.py run [-o results.json] [-k name-substring]
+    python benchmarks.py compare old.json new.json [--threshold 10]
+
+Each benchmark is timed over several rounds and reported per call and per
+item (reading, slot, message...). Results are written as JSON tagged with
+the current git commit, so two runs can be diffed with `compare`.
+
+Numbers are only comparable between runs on the same machine; the fakes
+make absolute timings differ from a real Mongo/Redis deployment, but
+they are stable enough to catch regressions in our own code.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int = 1, items: int = 1, rounds: int = 5):
+    """Register a setup function returning the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number, items, rounds)
+        return setup
+    return register
+
+
+# -------- FAKES -------- #
+
+def install_fakes():
+    """Point pymongo/redis at in-process fakes. Must run before backend imports."""
+    import fakeredis
+    import mongomock
+    import pymongo
+    import redis
+    import redis.asyncio as aioredis
+
+    pymongo.MongoClient = mongomock.MongoClient
+    _patch_mongomock_bulk_write()
+
+    server = fakeredis.FakeServer()
+
+    def decode_responses(kwargs):
+        pool = kwargs.get("connection_pool")
+        if pool is not None:
+            return pool.connection_kwargs.get("decode_responses", False)
+        return kwargs.get("decode_responses", False)
+
+    redis.Redis = lambda *a, **k: fakeredis.FakeRedis(
+        server=server, decode_responses=decode_responses(k)
+    )
+    aioredis.Redis = lambda *a, **k: fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=decode_responses(k)
+    )
+
+    # Benchmarks train their own model; never touch the real model directory
+    os.environ["ML_MODEL_DIR"] = tempfile.mkdtemp(prefix="bench-models-")
+
+
+def _patch_mongomock_bulk_write():
+    # mongomock's bulk_write does not understand the operation objects of
+    # current pymongo releases; replay them as single-document calls
+    from mongomock.collection import Collection
+    from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+    class Result:
+        def __init__(self, count):
+            self.inserted_count = self.upserted_count = count
+            self.matched_count = self.modified_count = 0
+            self.bulk_api_result = {}
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        for op in requests:
+            if isinstance(op, InsertOne):
+                self.insert_one(op._doc)
+            elif isinstance(op, UpdateOne):
+                self.update_one(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, UpdateMany):
+                self.update_many(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, ReplaceOne):
+                self.replace_one(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, DeleteOne):
+                self.delete_one(op._filter)
+        return Result(len(requests))
+
+    Collection.bulk_write = bulk_write
+
+
+# -------- DATASETS -------- #
+
+def _readings(vehicles: int, ticks: int, seed: int = 0) -> list:
+    from simulator import synthetic_source
+    return [
+        r for _, r in synthetic_source(
+            vehicles, ticks, seed=seed, start_time=datetime(2025, 1, 1)
+        )
+    ]
+
+
+_model_ready = False
+
+
+def _ensure_model():
+    global _model_ready
+    if _model_ready:
+        return
+    import model_registry
+    from db import telemetry_col
+
+    telemetry_col.insert_many(_readings(100, 10, seed=1))
+    model_registry.train_model(min_samples=100)
+    _model_ready = True
+
+
+# -------- BENCHMARKS -------- #
+
+@benchmark("ml.detect_anomaly x200", items=200, rounds=3)
+def bench_detect_anomaly_loop():
+    import ml
+    _ensure_model()
+    readings = _readings(100, 2)
+    return lambda: [ml.detect_anomaly(r) for r in readings]
+
+
+@benchmark("ml.detect_anomalies_batch x1000", number=10, items=1000)
+def bench_detect_anomalies_batch():
+    import ml
+    _ensure_model()
+    readings = _readings(100, 10)
+    return lambda: ml.detect_anomalies_batch(readings)
+
+
+@benchmark("scoring_pool.detect_anomalies_batch x10000", number=3, items=10000)
+def bench_scoring_pool():
+    from scoring_pool import scoring_pool
+    _ensure_model()
+    readings = _readings(1000, 10)
+    return lambda: scoring_pool.detect_anomalies_batch(readings)
+
+
+@benchmark("graph pipeline per reading x100", items=100, rounds=3)
+def bench_graph_pipeline():
+    from graph import graph
+    _ensure_model()
+    readings = _readings(10, 10)
+    return lambda: [
+        graph.invoke({"telemetry": r, "anomaly": {}, "severity": "", "alert_id": None})
+        for r in readings
+    ]
+
+
+@benchmark("graph batch pipeline x100", number=5, items=100)
+def bench_graph_batch():
+    from graph import run_batch
+    _ensure_model()
+    readings = _readings(10, 10)
+    return lambda: run_batch(readings)
+
+
+@benchmark("telemetry.ingest_telemetry x1000", items=1000)
+def bench_ingest():
+    from telemetry import ingest_telemetry
+    from telemetry_buffer import telemetry_buffer
+    from utils import UserRole
+
+    telemetry_buffer.start()
+    readings = _readings(100, 10)
+
+    def run():
+        for r in readings:
+            ingest_telemetry(dict(r), role=UserRole.OEM_ADMIN)
+    return run
+
+
+@benchmark("telemetry.ingest_telemetry_batch x1000", number=3, items=1000)
+def bench_ingest_batch():
+    from telemetry import ingest_telemetry_batch
+    readings = _readings(100, 10)
+    return lambda: ingest_telemetry_batch([(dict(r), None) for r in readings])
+
+
+@benchmark("service.generate_available_slots", number=20, items=1)
+def bench_available_slots():
+    from db import db
+    from service import generate_available_slots
+
+    day = datetime(2025, 1, 6)  # a Monday
+    centre_id = db.service_centres.insert_one({
+        "name": "Bench Centre",
+        "max_capacity": 5,
+        "slot_duration_minutes": 30,
+        "working_hours": {"start": "08:00", "end": "20:00"}
+    }).inserted_id
+    db.bookings.insert_many([
+        {
+            "service_centre_id": str(centre_id),
+            "status": "CONFIRMED",
+            "slot_start": (day + timedelta(hours=8, minutes=30 * (i % 24))).isoformat()
+        }
+        for i in range(200)
+    ])
+    return lambda: generate_available_slots(str(centre_id), day.isoformat())
+
+
+@benchmark("analytics dashboard (all metrics)", number=10, items=1)
+def bench_analytics():
+    import alerts
+    import analytics
+
+    for i in range(500):
+        alerts.create_alert(
+            # One alert per vehicle, so dedup doesn't fold the seed data
+            vehicle_id=f"SIM-{i:06d}",
+            alert_type="ANOMALY_DETECTED" if i % 3 else "HIGH_ENGINE_TEMP",
+            value=-0.15,
+            severity=["LOW", "MEDIUM", "HIGH"][i % 3],
+            telemetry_timestamp=datetime.utcnow().isoformat()
+        )
+
+    def run():
+        analytics.alert_rate()
+        analytics.mean_time_to_detect()
+        analytics.anomaly_to_rca_rate()
+        analytics.false_positive_rate()
+        analytics.alert_trend()
+        analytics.severity_distribution()
+        analytics.rca_closure_rate()
+    return run
+
+
+@benchmark("websocket fan-out 200 subscribers x50 messages", items=200 * 50)
+def bench_ws_fanout():
+    import asyncio
+    from websocket_manager import ConnectionManager
+
+    subscribers, messages = 200, 50
+
+    class FakeSocket:
+        def __init__(self, done):
+            self.received = 0
+            self.done = done
+
+        async def accept(self):
+            pass
+
+        async def send_text(self, text):
+            self.received += 1
+            if self.received == messages:
+                self.done()
+
+    async def fan_out():
+        manager = ConnectionManager(queue_size=messages)
+        finished = asyncio.Event()
+        remaining = [subscribers]
+
+        def done():
+            remaining[0] -= 1
+            if not remaining[0]:
+                finished.set()
+
+        sockets = [FakeSocket(done) for _ in range(subscribers)]
+        for ws in sockets:
+            await manager.connect("BENCH-WS", ws)
+
+        payload = json.dumps(_readings(1, 1)[0])
+        for _ in range(messages):
+            await manager.broadcast("BENCH-WS", payload)
+        await asyncio.wait_for(finished.wait(), timeout=30)
+
+        for ws in sockets:
+            manager.disconnect("BENCH-WS", ws)
+
+    return lambda: asyncio.run(fan_out())
+
+
+@benchmark("telemetry_codec encode+decode x1000", number=5, items=1000)
+def bench_codec():
+    import telemetry_codec
+    codec = telemetry_codec.get_codec(os.getenv("TELEMETRY_CODEC", "json"))
+    readings = _readings(100, 10)
+    return lambda: [telemetry_codec.decode(codec.encode(r)) for r in readings]
+
+
+@benchmark("simulator.FleetSimulator tick 10k vehicles", number=5, items=10000)
+def bench_fleet_tick():
+    from simulator import FleetSimulator
+    fleet = FleetSimulator(
+        [f"SIM-{i:06d}" for i in range(10000)], seed=0, sink=lambda readings: None
+    )
+    return fleet.tick
+
+
+# -------- RUNNER -------- #
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run(selected: str = None) -> dict:
+    results = {}
+    for name, (setup, number, items, rounds) in BENCHMARKS.items():
+        if selected and selected not in name:
+            continue
+
+        fn = setup()
+        fn()  # warm-up: imports, caches, lazy model load
+        per_call = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            per_call.append((time.perf_counter() - t0) / number)
+
+        median = statistics.median(per_call)
+        results[name] = {
+            "rounds": rounds,
+            "number": number,
+            "min_ms": round(min(per_call) * 1000, 4),
+            "median_ms": round(median * 1000, 4),
+            "max_ms": round(max(per_call) * 1000, 4),
+            "per_item_us": round(median / items * 1e6, 3),
+            "items_per_s": round(items / median, 1)
+        }
+        print(f"{name:<50}{results[name]['median_ms']:>12.3f} ms{results[name]['per_item_us']:>12.3f} us/item")
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "telemetry_codec": os.getenv("TELEMETRY_CODEC", "json"),
+        "results": results
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 10.0) -> bool:
+    """Print per-benchmark change in median time; False if any regressed past threshold %."""
+    ok = True
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if not before:
+            print(f"  {name:<50} new")
+            continue
+        change = (result["median_ms"] / before["median_ms"] - 1) * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {name:<50}{before['median_ms']:>10.3f} ->{result['median_ms']:>10.3f} ms ({change:+.1f}%){flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hot path benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = commands.add_parser("run")
+    run_cmd.add_argument("-o", "--output", help="defaults to bench_results/<commit>.json")
+    run_cmd.add_argument("-k", dest="selected", help="only benchmarks whose name contains this")
+
+    compare_cmd = commands.add_parser("compare")
+    compare_cmd.add_argument("old")
+    compare_cmd.add_argument("new")
+    compare_cmd.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in %%")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        install_fakes()
+        report = run(args.selected)
+        output = args.output or os.path.join(
+            "bench_results", f"{report['commit'] or 'unknown'}.json"
+        )
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        sys.exit(0 if compare(old, new, args.threshold) else 1)
@@ -2,9 +2,19 @@ from db import db
 from datetime import datetime
 from auth import require_roles
 from utils import UserRole
+from pymongo import ReturnDocument
+import rollups
+from indexes import declare_indexes, register_query
 
 capa_col = db.capa_actions
 
+declare_indexes("capa_actions", [("target_date", 1), ("status", 1)])
+
+register_query(
+    "capa_actions.overdue", "capa_actions",
+    {"status": {"$ne": "COMPLETED"}, "target_date": {"$lt": datetime(1970, 1, 1)}}
+)
+
 
 def create_capa(rca_id, action_type, description, owner_team, target_date, current_role):
     require_roles(current_role, [UserRole.OEM_ADMIN])
@@ -19,13 +29,19 @@ def create_capa(rca_id, action_type, description, owner_team, target_date, curre
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
-    return capa_col.insert_one(capa).inserted_id
+    capa_id = capa_col.insert_one(capa).inserted_id
+    rollups.record_capa(capa)
+    return capa_id
 
 
 def update_capa_status(capa_id, status, current_role):
     require_roles(current_role, [UserRole.OEM_ADMIN, UserRole.SERVICE_CENTER])
 
-    capa_col.update_one(
+    previous = capa_col.find_one_and_update(
         {"_id": capa_id},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+        projection={"status": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    if previous:
+        rollups.record_status_change("capa_status", previous.get("status"), status)
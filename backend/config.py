@@ -9,3 +9,91 @@ DB_NAME = os.getenv("DB_NAME", "vehicle_intelligence")
 # Telemetry thresholds (used later)
 ENGINE_TEMP_LIMIT = 95
 BRAKE_WEAR_LIMIT = 70
+
+# Telemetry write-behind buffer
+TELEMETRY_BUFFER_MAX = int(os.getenv("TELEMETRY_BUFFER_MAX", "10000"))
+TELEMETRY_FLUSH_BATCH = int(os.getenv("TELEMETRY_FLUSH_BATCH", "500"))
+TELEMETRY_FLUSH_INTERVAL_MS = int(os.getenv("TELEMETRY_FLUSH_INTERVAL_MS", "1000"))
+# A flush that fails outright (failover, timeout) is retried this many times
+# in total, backing off from TELEMETRY_FLUSH_RETRY_BASE_MS and doubling
+TELEMETRY_FLUSH_MAX_ATTEMPTS = int(os.getenv("TELEMETRY_FLUSH_MAX_ATTEMPTS", "5"))
+TELEMETRY_FLUSH_RETRY_BASE_MS = int(os.getenv("TELEMETRY_FLUSH_RETRY_BASE_MS", "200"))
+
+# Anomaly model artifacts
+ML_MODEL_DIR = os.getenv(
+    "ML_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+)
+ML_MODEL_RELOAD_SECONDS = float(os.getenv("ML_MODEL_RELOAD_SECONDS", "30"))
+
+# Telemetry storage: "standard" (plain collection, ISO string timestamps)
+# or "timeseries" (MongoDB time-series collection + downsampled tiers)
+TELEMETRY_STORAGE_MODE = os.getenv("TELEMETRY_STORAGE_MODE", "standard")
+TELEMETRY_RAW_TTL_SECONDS = int(os.getenv("TELEMETRY_RAW_TTL_SECONDS", str(7 * 24 * 3600)))
+TELEMETRY_1M_TTL_SECONDS = int(os.getenv("TELEMETRY_1M_TTL_SECONDS", str(90 * 24 * 3600)))
+TELEMETRY_1H_TTL_SECONDS = int(os.getenv("TELEMETRY_1H_TTL_SECONDS", str(730 * 24 * 3600)))
+TELEMETRY_DOWNSAMPLE_INTERVAL_SECONDS = int(os.getenv("TELEMETRY_DOWNSAMPLE_INTERVAL_SECONDS", "60"))
+
+# Redis
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+# Vehicles not seen for this long drop out of the live-vehicle registry
+LIVE_VEHICLE_MAX_AGE_SECONDS = int(os.getenv("LIVE_VEHICLE_MAX_AGE_SECONDS", "3600"))
+# Encoding of live telemetry values in Redis: json | msgpack | struct
+TELEMETRY_CODEC = os.getenv("TELEMETRY_CODEC", "json")
+
+# Anomaly detection off the request path: every live write is also XADDed
+# to a Redis stream that anomaly_worker.py consumes as a consumer group
+TELEMETRY_STREAM_ENABLED = os.getenv("TELEMETRY_STREAM_ENABLED", "true").lower() in ("1", "true", "yes")
+TELEMETRY_STREAM_KEY = os.getenv("TELEMETRY_STREAM_KEY", "telemetry_stream")
+# Approximate cap; the oldest entries are trimmed if workers fall this far behind
+TELEMETRY_STREAM_MAXLEN = int(os.getenv("TELEMETRY_STREAM_MAXLEN", "100000"))
+ANOMALY_WORKER_GROUP = os.getenv("ANOMALY_WORKER_GROUP", "anomaly_workers")
+ANOMALY_WORKER_BATCH_SIZE = int(os.getenv("ANOMALY_WORKER_BATCH_SIZE", "256"))
+ANOMALY_WORKER_BLOCK_MS = int(os.getenv("ANOMALY_WORKER_BLOCK_MS", "1000"))
+# Entries left unacked this long (crashed consumer) are claimed by another worker
+ANOMALY_WORKER_CLAIM_IDLE_MS = int(os.getenv("ANOMALY_WORKER_CLAIM_IDLE_MS", "30000"))
+ANOMALY_WORKER_MAX_DELIVERIES = int(os.getenv("ANOMALY_WORKER_MAX_DELIVERIES", "5"))
+# Each process publishes its graph node timings to Redis this often, so
+# /telemetry/stream/stats can sum them across separate worker processes
+GRAPH_NODE_STATS_PUBLISH_SECONDS = int(os.getenv("GRAPH_NODE_STATS_PUBLISH_SECONDS", "10"))
+# Run one worker thread inside the API process, so the stream always has a
+# consumer; set to false when `python anomaly_worker.py N` runs separately
+ANOMALY_WORKER_IN_PROCESS = os.getenv("ANOMALY_WORKER_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+
+# Process pool for CPU-bound model scoring (0 = score in the calling thread)
+ML_SCORING_PROCESSES = int(os.getenv("ML_SCORING_PROCESSES", str(min(2, os.cpu_count() or 1))))
+# Rows per task; larger batches are split across the pool's processes
+ML_SCORING_CHUNK_ROWS = int(os.getenv("ML_SCORING_CHUNK_ROWS", "20000"))
+
+# Digital twin writes are coalesced in memory and flushed this often
+TWIN_FLUSH_INTERVAL_MS = int(os.getenv("TWIN_FLUSH_INTERVAL_MS", "1000"))
+
+# Notification outbox: rows in notification_logs are sent by
+# notification_dispatcher.py, off the alert path
+NOTIFICATION_DISPATCH_IN_PROCESS = os.getenv("NOTIFICATION_DISPATCH_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+# Concurrent sends; also the number of rows claimed at a time
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_RATE_PER_SECOND = float(os.getenv("NOTIFICATION_RATE_PER_SECOND", "10"))
+NOTIFICATION_POLL_MS = int(os.getenv("NOTIFICATION_POLL_MS", "1000"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_BACKOFF_BASE_MS = int(os.getenv("NOTIFICATION_BACKOFF_BASE_MS", "2000"))
+NOTIFICATION_BACKOFF_MAX_MS = int(os.getenv("NOTIFICATION_BACKOFF_MAX_MS", "300000"))
+# Rows left SENDING this long (crashed dispatcher) are claimed again
+NOTIFICATION_CLAIM_TIMEOUT_MS = int(os.getenv("NOTIFICATION_CLAIM_TIMEOUT_MS", "60000"))
+# twilio | fake (records messages in memory instead of sending them)
+NOTIFICATION_SMS_SINK = os.getenv("NOTIFICATION_SMS_SINK", "twilio")
+
+# Alert dedup: repeats of an open (vehicle_id, alert_type) alert seen within
+# the window are folded into it instead of inserting and notifying again.
+# 0 disables; ALERT_DEDUP_WINDOWS overrides per type, e.g. "FUEL_LOW=3600,ENGINE_OVERHEAT=300"
+ALERT_DEDUP_WINDOW_SECONDS = int(os.getenv("ALERT_DEDUP_WINDOW_SECONDS", "600"))
+ALERT_DEDUP_WINDOWS = os.getenv("ALERT_DEDUP_WINDOWS", "")
+
+# In-process cache for vehicle / user / service centre lookups on the alert path
+ENTITY_CACHE_TTL_SECONDS = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "60"))
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
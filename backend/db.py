@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 from config import MONGO_URI, DB_NAME
+from indexes import declare_indexes, register_query
 
 try:
     client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
@@ -18,3 +19,26 @@ except Exception as e:
 users_col = db.users
 vehicles_col = db.vehicles
 telemetry_col = db.telemetry_events
+
+declare_indexes("users", [("phone", 1)], [("email", 1)], [("user_id", 1)])
+declare_indexes("vehicles", [("vin", 1)], [("owner_user_id", 1)])
+declare_indexes(
+    "telemetry_events",
+    [("vehicle_id", 1), ("timestamp", -1)],
+    # Keyset pagination walks (timestamp, _id) oldest first
+    [("vehicle_id", 1), ("timestamp", 1), ("_id", 1)]
+)
+
+register_query("users.by_phone", "users", {"phone": "+10000000000"})
+register_query("vehicles.by_owner", "vehicles", {"owner_user_id": "USER"})
+register_query("users.by_user_ids", "users", {"user_id": {"$in": ["USER"]}})
+register_query("vehicles.by_vins", "vehicles", {"vin": {"$in": ["VIN"]}})
+register_query(
+    "telemetry_events.history", "telemetry_events",
+    {"vehicle_id": "VIN"}, sort=[("timestamp", -1)]
+)
+register_query(
+    "telemetry_events.range_page", "telemetry_events",
+    {"vehicle_id": "VIN", "timestamp": {"$gte": "2025-01-01T00:00:00"}},
+    sort=[("timestamp", 1), ("_id", 1)]
+)
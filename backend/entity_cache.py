@@ -0,0 +1,126 @@
+# entity_cache.py
+"""
+TTL + LRU cache for entities that are read on every alert but rarely change:
+vehicles (by _id or VIN), users and service centres (by _id).
+
+    vehicle = vehicles_cache.get(vehicle_id)   # one find_one per TTL window
+
+Misses are cached too (as None), so an unknown vehicle id costs one read
+per window as well. Concurrent misses for the same key share one read.
+Entries expire after ENTITY_CACHE_TTL_SECONDS, and the least recently used
+are dropped beyond ENTITY_CACHE_MAX_ENTRIES.
+
+Writers in this process call invalidate() with every key that may hold a
+stale entry, including keys that were cached as misses (e.g. the VIN of a
+vehicle that sent telemetry before it was registered). Invalidation is
+local: changes made from another process (worker processes, scripts such
+as update_phone.py, edits straight in Mongo) show up once the entry
+expires, after at most ENTITY_CACHE_TTL_SECONDS. Cached documents are
+shared, so treat them as read-only.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from db import db
+from config import ENTITY_CACHE_TTL_SECONDS, ENTITY_CACHE_MAX_ENTRIES
+
+
+class EntityCache:
+    def __init__(self, name: str, loader, ttl: float = ENTITY_CACHE_TTL_SECONDS, max_entries: int = ENTITY_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.loading = {}             # key -> Event, set when the read is done
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return self.loader(key)
+
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                pending = self.loading.get(key)
+                if pending is None:
+                    pending = self.loading[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            # Someone else is reading this key; use their result
+            pending.wait()
+
+        try:
+            value = self.loader(key)
+            with self.lock:
+                # Skip the store if invalidate() ran while we were reading
+                if self.loading.get(key) is pending:
+                    self._store(key, value)
+            return value
+        finally:
+            with self.lock:
+                if self.loading.get(key) is pending:
+                    del self.loading[key]
+            pending.set()
+
+    def _store(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            # An in-flight read may have fetched the old document
+            self.loading.pop(key, None)
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.loading.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"name": self.name, "size": len(self.entries), **self.stats}
+
+
+def _find_by_id(collection_name: str):
+    def load(key):
+        return db[collection_name].find_one({"_id": key})
+    return load
+
+
+def _find_vehicle(key):
+    # Alerts from the telemetry pipeline carry the VIN, simulator alerts the _id
+    return db.vehicles.find_one({"$or": [{"_id": key}, {"vin": key}]})
+
+
+vehicles_cache = EntityCache("vehicles", _find_vehicle)
+users_cache = EntityCache("users", _find_by_id("users"))
+service_centres_cache = EntityCache("service_centres", _find_by_id("service_centres"))
+
+
+def get_vehicle(vehicle_id):
+    return vehicles_cache.get(vehicle_id)
+
+
+def get_user(user_id):
+    return users_cache.get(user_id)
+
+
+def get_service_centre(service_centre_id):
+    return service_centres_cache.get(service_centre_id)
+
+
+def get_stats() -> list:
+    return [c.get_stats() for c in (vehicles_cache, users_cache, service_centres_cache)]
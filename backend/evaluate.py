@@ -4,6 +4,8 @@ from analytics import (
     mean_time_to_detect
 )
 
-print("Anomaly stats:", anomaly_score_stats())
-print("Alert rate:", alert_rate())
-print("MTTD:", mean_time_to_detect())
+# Guarded: scoring runs in spawned processes that re-import this module
+if __name__ == "__main__":
+    print("Anomaly stats:", anomaly_score_stats())
+    print("Alert rate:", alert_rate())
+    print("MTTD:", mean_time_to_detect())
@@ -1,28 +1,127 @@
 # graph.py
-from typing import TypedDict, Dict
+import json
+import os
+import socket
+import threading
+import time
+from functools import wraps
+from typing import TypedDict, Dict, List
 from langgraph.graph import StateGraph, END
 
 import ml
 import alerts
 import twin
+from redis_client import redis_client
+from config import GRAPH_NODE_STATS_PUBLISH_SECONDS
 
 
 # -------- GRAPH STATE -------- #
 
-class TelemetryState(TypedDict):
+class TelemetryState(TypedDict, total=False):
     telemetry: dict
     anomaly: Dict
     severity: str
     alert_id: str | None
+    timings: Dict[str, float]
+
+
+class TelemetryBatchState(TypedDict, total=False):
+    readings: List[dict]
+    anomalies: List[Dict | None]  # None for readings that could not be scored
+    severities: List[str]
+    alert_ids: List[str | None]
+    timings: Dict[str, float]
+
+
+# -------- NODE TIMING -------- #
+
+# Process-wide wall time per node, across every invocation
+_node_stats = {}
+_node_stats_lock = threading.Lock()
+
+# One hash field per process, so reading them never scans the keyspace;
+# fields of processes that stopped publishing are pruned by age
+NODE_STATS_KEY = "graph_node_stats"
+_node_stats_field = f"{socket.gethostname()}-{os.getpid()}"
+_last_publish = 0.0
+
+def timed(name: str):
+    """Record a node's wall time in state["timings"] (ms) and in get_node_stats()."""
+    def decorate(node):
+        @wraps(node)
+        def run(state):
+            t0 = time.perf_counter()
+            state = node(state)
+            elapsed = (time.perf_counter() - t0) * 1000
+
+            state.setdefault("timings", {})[name] = elapsed
+            with _node_stats_lock:
+                stats = _node_stats.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+                stats["calls"] += 1
+                stats["total_ms"] += elapsed
+                stats["max_ms"] = max(stats["max_ms"], elapsed)
+            return state
+        return run
+    return decorate
+
+def get_node_stats() -> dict:
+    with _node_stats_lock:
+        return {
+            name: {
+                **stats,
+                "mean_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+            }
+            for name, stats in _node_stats.items()
+        }
+
+def publish_node_stats(force: bool = False):
+    """Write this process's totals to Redis, at most every GRAPH_NODE_STATS_PUBLISH_SECONDS."""
+    global _last_publish
+    now = time.monotonic()
+    if not force and now - _last_publish < GRAPH_NODE_STATS_PUBLISH_SECONDS:
+        return
+    _last_publish = now
+    stats = get_node_stats()
+    if stats:
+        redis_client.hset(
+            NODE_STATS_KEY, _node_stats_field,
+            json.dumps({"published_at": time.time(), "nodes": stats})
+        )
+
+def collect_node_stats() -> dict:
+    """Node totals summed over every process that published recently."""
+    publish_node_stats(force=True)
+    cutoff = time.time() - GRAPH_NODE_STATS_PUBLISH_SECONDS * 3
+    totals = {}
+    processes = 0
+    stale = []
+    for field, value in redis_client.hgetall(NODE_STATS_KEY).items():
+        entry = json.loads(value)
+        if entry["published_at"] < cutoff:
+            stale.append(field)
+            continue
+        processes += 1
+        for name, stats in entry["nodes"].items():
+            total = totals.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            total["calls"] += stats["calls"]
+            total["total_ms"] += stats["total_ms"]
+            total["max_ms"] = max(total["max_ms"], stats["max_ms"])
+    for total in totals.values():
+        total["mean_ms"] = total["total_ms"] / total["calls"] if total["calls"] else 0.0
+    if stale:
+        redis_client.hdel(NODE_STATS_KEY, *stale)
+    return {"processes": processes, "nodes": totals}
 
 
 # -------- NODES -------- #
 
+@timed("anomaly")
 def anomaly_node(state: TelemetryState):
-    result = ml.detect_anomaly(state["telemetry"])
+    result = ml.detect_anomalies_batch([state["telemetry"]])[0]
     state["anomaly"] = result
     return state
 
+@timed("severity")
 def severity_node(state: TelemetryState):
     if state["anomaly"]["is_anomaly"]:
         state["severity"] = ml.severity_from_score(
@@ -32,24 +131,29 @@ def severity_node(state: TelemetryState):
         state["severity"] = "LOW"
     return state
 
+@timed("alert")
 def alert_node(state: TelemetryState):
     if not state["anomaly"]["is_anomaly"]:
         return state
 
     telemetry = state["telemetry"]
-    alert_id = alerts.create_alert(
+    alert, outcome = alerts.raise_alert(
         vehicle_id=telemetry["vehicle_id"],
         alert_type="ANOMALY_DETECTED",
         value=state["anomaly"]["anomaly_score"],
-        severity=state["severity"]
+        severity=state["severity"],
+        telemetry_timestamp=telemetry.get("timestamp")
     )
 
-    diagnosis = ml.generate_diagnosis(telemetry)
-    alerts.create_diagnosis(alert_id, diagnosis)
+    # Repeats folded into an open alert already have its diagnosis
+    if outcome == alerts.ALERT_CREATED:
+        diagnosis = ml.generate_diagnosis(telemetry)
+        alerts.create_diagnosis(alert["_id"], diagnosis)
 
-    state["alert_id"] = str(alert_id)
+    state["alert_id"] = str(alert["_id"])
     return state
 
+@timed("twin")
 def twin_node(state: TelemetryState):
     twin.update_twin_state(
         state["telemetry"]["vehicle_id"],
@@ -58,6 +162,58 @@ def twin_node(state: TelemetryState):
     return state
 
 
+# -------- BATCH NODES -------- #
+
+@timed("batch_anomaly")
+def batch_anomaly_node(state: TelemetryBatchState):
+    # One decision_function call for the whole batch; a reading missing a
+    # feature is skipped rather than failing everyone else's
+    state["anomalies"] = ml.detect_anomalies_batch(state["readings"], skip_invalid=True)
+    return state
+
+@timed("batch_severity")
+def batch_severity_node(state: TelemetryBatchState):
+    state["severities"] = [
+        ml.severity_from_score(a["anomaly_score"]) if a and a["is_anomaly"] else "LOW"
+        for a in state["anomalies"]
+    ]
+    return state
+
+@timed("batch_alert")
+def batch_alert_node(state: TelemetryBatchState):
+    flagged = [
+        i for i, a in enumerate(state["anomalies"]) if a and a["is_anomaly"]
+    ]
+    created = alerts.create_alerts_many([
+        {
+            "vehicle_id": state["readings"][i]["vehicle_id"],
+            "alert_type": "ANOMALY_DETECTED",
+            "value": state["anomalies"][i]["anomaly_score"],
+            "severity": state["severities"][i],
+            "telemetry_timestamp": state["readings"][i].get("timestamp")
+        }
+        for i in flagged
+    ])
+    alerts.create_diagnoses_many([
+        (alert, ml.generate_diagnosis(state["readings"][i]))
+        for i, (alert, outcome) in zip(flagged, created)
+        if outcome == alerts.ALERT_CREATED
+    ])
+
+    alert_ids = [None] * len(state["readings"])
+    for i, (alert, _) in zip(flagged, created):
+        alert_ids[i] = str(alert["_id"])
+    state["alert_ids"] = alert_ids
+    return state
+
+@timed("batch_twin")
+def batch_twin_node(state: TelemetryBatchState):
+    twin.update_twin_states([
+        r for r, a in zip(state["readings"], state["anomalies"]) if a is not None
+    ])
+    return state
+
+
 # -------- GRAPH WIRING -------- #
 
 def build_graph():
@@ -76,4 +232,25 @@ def build_graph():
 
     return g.compile()
 
+def build_batch_graph():
+    """Same steps as build_graph, over a list of readings per invocation."""
+    g = StateGraph(TelemetryBatchState)
+
+    g.add_node("anomaly", batch_anomaly_node)
+    g.add_node("severity", batch_severity_node)
+    g.add_node("alert", batch_alert_node)
+    g.add_node("twin", batch_twin_node)
+
+    g.set_entry_point("anomaly")
+    g.add_edge("anomaly", "severity")
+    g.add_edge("severity", "alert")
+    g.add_edge("alert", "twin")
+    g.add_edge("twin", END)
+
+    return g.compile()
+
 graph = build_graph()
+batch_graph = build_batch_graph()
+
+def run_batch(readings: list) -> TelemetryBatchState:
+    return batch_graph.invoke({"readings": readings, "timings": {}})
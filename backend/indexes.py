@@ -0,0 +1,137 @@
+# indexes.py
+"""
+Index declarations and query-plan audit for the Mongo collections.
+
+Modules declare the indexes their hot queries need right next to the
+collection they own:
+
+    declare_indexes("alerts", [("vehicle_id", 1), ("timestamp", -1)])
+    register_query("alerts.by_vehicle", "alerts",
+                   {"vehicle_id": "VIN"}, sort=[("timestamp", -1)])
+
+ensure_indexes() runs at startup and is idempotent (create_indexes is a
+no-op for indexes that already exist). audit_queries() explains every
+registered query and flags the ones whose winning plan is a COLLSCAN.
+
+    python indexes.py ensure
+    python indexes.py audit
+"""
+
+from collections import defaultdict
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+_INDEXES = defaultdict(list)
+_QUERIES = []
+
+
+# -------- DECLARATION -------- #
+
+def declare_indexes(collection_name: str, *indexes, **options):
+    for keys in indexes:
+        _INDEXES[collection_name].append(IndexModel(keys, **options))
+
+
+def register_query(name: str, collection_name: str, filter: dict, sort=None):
+    _QUERIES.append({
+        "name": name,
+        "collection": collection_name,
+        "filter": filter,
+        "sort": sort
+    })
+
+
+def declared_indexes() -> dict:
+    return {name: [m.document for m in models] for name, models in _INDEXES.items()}
+
+
+# -------- BOOTSTRAP -------- #
+
+def ensure_indexes(database=None):
+    """
+    Create every declared index. A collection whose indexes can't be built
+    (e.g. duplicates under a new unique index) doesn't stop the others.
+    Returns ({collection: index names}, {collection: error}).
+    """
+    if database is None:
+        from db import db as database
+    if database is None:
+        return {}, {}
+
+    created, failed = {}, {}
+    for collection_name, models in _INDEXES.items():
+        try:
+            created[collection_name] = database[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            failed[collection_name] = str(e)
+            print(f"[indexes] Could not create indexes on {collection_name}: {e}")
+    return created, failed
+
+
+def ensure_declared_indexes(collection, collection_name: str) -> list:
+    """Create the indexes declared for `collection_name` on another collection."""
+    models = _INDEXES.get(collection_name)
+    return collection.create_indexes(models) if models else []
+
+
+# -------- AUDIT -------- #
+
+def _plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def audit_queries(database=None) -> list:
+    if database is None:
+        from db import db as database
+    if database is None:
+        return []
+
+    report = []
+    for q in _QUERIES:
+        cursor = database[q["collection"]].find(q["filter"])
+        if q["sort"]:
+            cursor = cursor.sort(q["sort"])
+        explain = cursor.limit(1).explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "name": q["name"],
+            "collection": q["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return report
+
+
+def _load_declarations():
+    # Importing the owning modules runs their declare_indexes/register_query calls
+    import db, alerts, service, notifications, jobs, ueba, rollups, capa, telemetry_store, twin  # noqa: F401
+
+
+if __name__ == "__main__":
+    import sys
+
+    _load_declarations()
+    import telemetry_store
+    command = sys.argv[1] if len(sys.argv) > 1 else "audit"
+
+    if command == "ensure":
+        telemetry_store.ensure_telemetry_storage()
+        created, failed = ensure_indexes()
+        for collection_name, names in created.items():
+            print(f"{collection_name}: {', '.join(names)}")
+        sys.exit(1 if failed else 0)
+    else:
+        report = audit_queries()
+        for r in report:
+            flag = "COLLSCAN" if r["collscan"] else "ok"
+            print(f"[{flag}] {r['name']} ({r['collection']}): {' -> '.join(r['stages'])}")
+        sys.exit(1 if any(r["collscan"] for r in report) else 0)
@@ -6,10 +6,35 @@ from datetime import datetime
 from auth import require_roles
 from utils import UserRole
 from bson import ObjectId
+from indexes import declare_indexes, register_query
 
 jobs_col = db.job_cards
 worker_logs_col = db.worker_logs
 
+declare_indexes(
+    "job_cards",
+    [("service_centre_id", 1), ("created_at", -1)],
+    [("booking_id", 1)]
+)
+declare_indexes(
+    "worker_logs",
+    [("job_card_id", 1), ("timestamp", -1)],
+    [("service_centre_id", 1), ("timestamp", -1)]
+)
+
+register_query(
+    "job_cards.by_centre", "job_cards",
+    {"service_centre_id": "CENTRE"}, sort=[("created_at", -1)]
+)
+register_query(
+    "worker_logs.by_job", "worker_logs",
+    {"job_card_id": "JOB"}, sort=[("timestamp", -1)]
+)
+register_query(
+    "worker_logs.by_centre", "worker_logs",
+    {"service_centre_id": "CENTRE"}, sort=[("timestamp", -1)]
+)
+
 
 def create_job_card(booking_id, notes, current_role, assigned_technician=None):
     require_roles(current_role, [UserRole.SERVICE_CENTER])
@@ -8,10 +8,26 @@ from oem import router as oem_router
 from logs import router as logs_router
 from telemetry_ws import router as telemetry_ws_router
 from voice_agent import router as voice_router
+import asyncio
 import threading
+from fastapi.concurrency import run_in_threadpool
 
 from telemetry import router as telemetry_router
 from telemetry_simulator import telemetry_simulator_loop
+from telemetry_buffer import telemetry_buffer
+from indexes import ensure_indexes
+from telemetry_store import ensure_telemetry_storage, downsampler
+from rollups import backfill_once
+from redis_client import close_async_client
+from anomaly_worker import anomaly_worker, stream_stats
+from scoring_pool import scoring_pool
+from twin import twin_writer
+from notification_dispatcher import notification_dispatcher
+from config import (
+    ANOMALY_WORKER_IN_PROCESS,
+    NOTIFICATION_DISPATCH_IN_PROCESS,
+    TELEMETRY_STREAM_ENABLED
+)
 
 # Phase 3 (workflow / closure)
 import rca
@@ -88,6 +104,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged listings report their total here
+    expose_headers=["X-Total-Count"],
 )
 app.include_router(service_views_router)
 app.include_router(user_views_router)
@@ -169,11 +187,8 @@ def create_capa(payload: dict):
 # ANALYTICS ENDPOINTS
 # ----------------------------
 
-@app.get("/analytics")
-def get_analytics():
-    """Get comprehensive analytics data"""
+def _dashboard_metrics():
     return {
-        "anomaly_score_stats": analytics.anomaly_score_stats(),
         "alert_rate": analytics.alert_rate(),
         "mean_time_to_detect": analytics.mean_time_to_detect(),
         "anomaly_to_rca_rate": analytics.anomaly_to_rca_rate(),
@@ -184,6 +199,16 @@ def get_analytics():
         "overdue_capa": analytics.overdue_capa(),
     }
 
+@app.get("/analytics")
+async def get_analytics():
+    """Get comprehensive analytics data"""
+    # Model scoring runs in the scoring pool, the Mongo reads in a thread
+    anomaly_stats, metrics = await asyncio.gather(
+        analytics.anomaly_score_stats_async(),
+        run_in_threadpool(_dashboard_metrics)
+    )
+    return {"anomaly_score_stats": anomaly_stats, **metrics}
+
 # ----------------------------
 # TEST ENDPOINT
 # ----------------------------
@@ -209,14 +234,70 @@ def seed_test_data():
 # RUN SERVER
 # ----------------------------
 
+def _backfill_rollups():
+    try:
+        backfill_once()
+    except Exception as e:
+        print(f"Warning: Could not backfill analytics rollups: {e}")
+
+
+def _check_stream_consumers():
+    # Readings pile up in the stream unscored if nothing consumes it
+    try:
+        consumers = stream_stats().get("consumers")
+    except Exception as e:
+        print(f"Warning: Could not read telemetry stream stats: {e}")
+        return
+    if not consumers:
+        print(
+            "Warning: TELEMETRY_STREAM_ENABLED is on but ANOMALY_WORKER_IN_PROCESS "
+            "is off and no anomaly worker has joined the consumer group; "
+            "readings are not scored until `python anomaly_worker.py` runs"
+        )
+
+
 @app.on_event("startup")
 def start_background_services():
+    try:
+        # Time-series collection must exist before indexes touch it
+        ensure_telemetry_storage()
+        _, failed = ensure_indexes()
+        if failed:
+            print(f"Warning: Indexes missing on {', '.join(sorted(failed))}; see errors above")
+    except Exception as e:
+        print(f"Warning: Could not prepare MongoDB collections: {e}")
+    telemetry_buffer.start()
+    downsampler.start()
+    twin_writer.start()
+    # First deploy with rollups: count existing alerts / rca / capa once,
+    # in the background so startup isn't held up
+    threading.Thread(target=_backfill_rollups, daemon=True).start()
+    if ANOMALY_WORKER_IN_PROCESS:
+        anomaly_worker.start()
+    elif TELEMETRY_STREAM_ENABLED:
+        # Production runs `python anomaly_worker.py N` as separate processes
+        _check_stream_consumers()
+    if NOTIFICATION_DISPATCH_IN_PROCESS:
+        notification_dispatcher.start()
     threading.Thread(
         target=telemetry_simulator_loop,
         daemon=True
     ).start()
 
 
+@app.on_event("shutdown")
+async def stop_background_services():
+    # Flush buffered telemetry so nothing queued is lost on exit
+    await run_in_threadpool(telemetry_buffer.stop)
+    await run_in_threadpool(downsampler.stop)
+    await run_in_threadpool(anomaly_worker.stop)
+    # After the worker, so its last batch's twin updates are written too
+    await run_in_threadpool(twin_writer.stop)
+    await run_in_threadpool(notification_dispatcher.stop)
+    await run_in_threadpool(scoring_pool.shutdown)
+    await close_async_client()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
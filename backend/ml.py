@@ -1,8 +1,8 @@
 # ml.py
 import numpy as np
-from sklearn.ensemble import IsolationForest
+from model_registry import get_model
 
-# -------- MODEL INIT (LOAD ONCE) -------- #
+# -------- MODEL -------- #
 
 FEATURES = [
     "speed_kmph",
@@ -16,39 +16,70 @@ FEATURES = [
     "acceleration_mps2"
 ]
 
-iso_forest = IsolationForest(
-    n_estimators=100,
-    contamination=0.05,
-    random_state=42
-)
-
-# Dummy warm-up fit (replace later with real historical data)
-def warmup():
-    dummy_data = np.random.normal(size=(200, len(FEATURES)))
-    iso_forest.fit(dummy_data)
-
-warmup()
+# The fitted IsolationForest is trained offline and loaded lazily from
+# model_registry; importing this module does no fitting.
 
 # -------- INFERENCE -------- #
 
 def extract_features(telemetry: dict) -> np.ndarray:
     return np.array([[telemetry[f] for f in FEATURES]])
 
-def detect_anomaly(telemetry: dict) -> dict:
-    X = extract_features(telemetry)
-    score = iso_forest.decision_function(X)[0]
-    pred = iso_forest.predict(X)[0]  # -1 = anomaly
+def extract_feature_matrix(telemetry, skip_invalid: bool = False):
+    """
+    Build the (n, len(FEATURES)) matrix for a batch in one go.
 
-    if pred == -1:
-        return {
-            "is_anomaly": True,
-            "anomaly_score": float(score)
+    `telemetry` is either a list of telemetry dicts or a structured NumPy
+    array with one field per feature. Returns (X, rows) where `rows` are the
+    input positions that made it into X. With skip_invalid=True, readings
+    missing a feature (or with a non-numeric value) are left out instead
+    of raising.
+    """
+    if isinstance(telemetry, np.ndarray) and telemetry.dtype.names:
+        X = np.column_stack([telemetry[f] for f in FEATURES]).astype(float)
+        return X, list(range(len(telemetry)))
+
+    values = []
+    rows = []
+    for i, t in enumerate(telemetry):
+        try:
+            values.append([float(t[f]) for f in FEATURES])
+        except (KeyError, TypeError, ValueError):
+            if not skip_invalid:
+                raise
+            continue
+        rows.append(i)
+
+    X = np.array(values, dtype=float).reshape(len(values), len(FEATURES))
+    return X, rows
+
+def detect_anomalies_batch(telemetry, skip_invalid: bool = False) -> list:
+    """
+    Score a batch of readings with a single decision_function call.
+
+    Returns one result per input reading, in order. Readings skipped
+    because of missing features come back as None.
+    """
+    X, rows = extract_feature_matrix(telemetry, skip_invalid=skip_invalid)
+    if len(rows) == 0:
+        return [None] * len(telemetry)
+    return results_from_scores(len(telemetry), rows, get_model().decision_function(X))
+
+def results_from_scores(n: int, rows: list, scores: np.ndarray) -> list:
+    """Per-reading results for scores computed over the rows of a feature matrix."""
+    results = [None] * n
+    # IsolationForest.predict() is just decision_function(X) < 0,
+    # so derive it instead of running the forest a second time
+    is_anomaly = scores < 0
+
+    for i, score, flag in zip(rows, scores.tolist(), is_anomaly.tolist()):
+        results[i] = {
+            "is_anomaly": flag,
+            "anomaly_score": score
         }
+    return results
 
-    return {
-        "is_anomaly": False,
-        "anomaly_score": float(score)
-    }
+def detect_anomaly(telemetry: dict) -> dict:
+    return detect_anomalies_batch([telemetry])[0]
 
 def severity_from_score(score: float) -> str:
     if score < -0.2:
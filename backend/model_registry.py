@@ -0,0 +1,195 @@
+# model_registry.py
+"""
+Versioned IsolationForest artifacts on local disk.
+
+Layout under ML_MODEL_DIR:
+    v20250101120000123456-3fa9.joblib   fitted model
+    v20250101120000123456-3fa9.json     training metadata
+    CURRENT                             name of the active version
+
+Version names sort by training time; the random suffix keeps two
+trainings in the same microsecond (another worker, a retry) apart.
+
+Training happens offline (`python model_registry.py train`). API workers
+only ever load: the active model is read lazily on first use and swapped
+in when CURRENT points at a new version.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+import joblib
+from sklearn.ensemble import IsolationForest
+
+from config import ML_MODEL_DIR, ML_MODEL_RELOAD_SECONDS
+
+CURRENT_FILE = "CURRENT"
+
+
+class ModelNotAvailableError(RuntimeError):
+    pass
+
+
+# -------- PATHS -------- #
+
+def _artifact_path(version: str) -> str:
+    return os.path.join(ML_MODEL_DIR, f"{version}.joblib")
+
+def _metadata_path(version: str) -> str:
+    return os.path.join(ML_MODEL_DIR, f"{version}.json")
+
+def _current_path() -> str:
+    return os.path.join(ML_MODEL_DIR, CURRENT_FILE)
+
+def _write_atomic(path: str, data: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# -------- REGISTRY -------- #
+
+def list_versions() -> list:
+    if not os.path.isdir(ML_MODEL_DIR):
+        return []
+    return sorted(
+        name[:-len(".joblib")]
+        for name in os.listdir(ML_MODEL_DIR)
+        if name.endswith(".joblib")
+    )
+
+def current_version():
+    try:
+        with open(_current_path()) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def get_metadata(version: str) -> dict:
+    with open(_metadata_path(version)) as f:
+        return json.load(f)
+
+def activate_version(version: str):
+    """Point CURRENT at an existing version (also used for rollback)."""
+    if not os.path.exists(_artifact_path(version)):
+        raise ValueError(f"Unknown model version: {version}")
+    _write_atomic(_current_path(), version)
+
+
+def train_model(limit: int = 100000, min_samples: int = 200,
+                n_estimators: int = 100, contamination: float = 0.05,
+                activate: bool = True) -> str:
+    """Fit on historical telemetry_events and store a new version."""
+    import ml
+    from db import telemetry_col
+
+    projection = {f: 1 for f in ml.FEATURES}
+    projection["_id"] = 0
+    docs = list(
+        telemetry_col.find({}, projection).sort("timestamp", -1).limit(limit)
+    )
+    X, rows = ml.extract_feature_matrix(docs, skip_invalid=True)
+    if len(rows) < min_samples:
+        raise ValueError(
+            f"Need at least {min_samples} complete telemetry readings to train, "
+            f"found {len(rows)}"
+        )
+
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        contamination=contamination,
+        random_state=42
+    )
+    model.fit(X)
+
+    os.makedirs(ML_MODEL_DIR, exist_ok=True)
+    version = f"{datetime.utcnow():v%Y%m%d%H%M%S%f}-{secrets.token_hex(2)}"
+
+    # Write under a temporary name first so a reader never sees a partial file
+    tmp = f"{_artifact_path(version)}.tmp"
+    joblib.dump(model, tmp)
+    os.replace(tmp, _artifact_path(version))
+    _write_atomic(_metadata_path(version), json.dumps({
+        "version": version,
+        "features": ml.FEATURES,
+        "n_samples": len(rows),
+        "n_estimators": n_estimators,
+        "contamination": contamination,
+        "trained_at": datetime.utcnow().isoformat()
+    }, indent=2))
+
+    if activate:
+        activate_version(version)
+    return version
+
+
+# -------- LOADING / HOT-SWAP -------- #
+
+class ModelHolder:
+    """
+    Process-local handle on the active model.
+
+    Readers grab `self.model` without locking; reloads build the new model
+    fully before a single reference assignment, so callers always see either
+    the old or the new model, never a half-loaded one.
+    """
+
+    def __init__(self, reload_seconds: float = ML_MODEL_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self.model = None
+        self.version = None
+        self.last_check = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self.model is None or now - self.last_check >= self.reload_seconds:
+            self._refresh(now)
+        if self.model is None:
+            raise ModelNotAvailableError(
+                f"No anomaly model found in {ML_MODEL_DIR}; "
+                "run `python model_registry.py train` first"
+            )
+        return self.model
+
+    def _refresh(self, now: float):
+        with self.lock:
+            if self.model is not None and now - self.last_check < self.reload_seconds:
+                return
+            self.last_check = now
+            version = current_version()
+            if version is None or version == self.version:
+                return
+            # mmap keeps the tree arrays in the page cache shared between workers
+            model = joblib.load(_artifact_path(version), mmap_mode="r")
+            self.model, self.version = model, version
+            print(f"[model_registry] Loaded anomaly model {version}")
+
+
+_holder = ModelHolder()
+
+def get_model():
+    return _holder.get()
+
+def loaded_version():
+    return _holder.version
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "train":
+        print(f"Trained and activated {train_model()}")
+    elif command == "activate":
+        activate_version(sys.argv[2])
+        print(f"Activated {sys.argv[2]}")
+    else:
+        active = current_version()
+        for v in list_versions():
+            print(f"{'*' if v == active else ' '} {v}")
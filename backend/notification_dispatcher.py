@@ -0,0 +1,314 @@
+# notification_dispatcher.py
+"""
+Outbox dispatcher for notification_logs.
+
+notify_user only inserts a QUEUED row. The dispatcher claims due rows
+(QUEUED -> SENDING, attempts + 1), looks up the recipient and sends them,
+so the alert path never waits on the SMS provider:
+
+    - NOTIFICATION_WORKERS async workers, so at most that many sends are
+      in flight; the blocking Mongo / Twilio calls run in threads
+    - one token bucket caps sends at NOTIFICATION_RATE_PER_SECOND
+    - a failed send goes back to QUEUED with next_attempt_at pushed out
+      exponentially (NOTIFICATION_BACKOFF_BASE_MS, doubling, capped at
+      NOTIFICATION_BACKOFF_MAX_MS) until NOTIFICATION_MAX_ATTEMPTS, then it
+      is marked FAILED; a user without a phone number fails right away
+    - rows left SENDING by a crashed dispatcher are claimed again after
+      NOTIFICATION_CLAIM_TIMEOUT_MS
+
+The API runs one dispatcher in-process (NOTIFICATION_DISPATCH_IN_PROCESS);
+more can run on their own, since claims are atomic:
+
+    python notification_dispatcher.py          # run until stopped
+    python notification_dispatcher.py once     # send what is due, then exit
+
+NOTIFICATION_SMS_SINK=fake swaps Twilio for FakeSmsSink, which records
+messages in memory.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+from entity_cache import get_user
+from notifications import notification_col, mark_notification_sent, mark_notification_failed
+from config import (
+    NOTIFICATION_WORKERS,
+    NOTIFICATION_RATE_PER_SECOND,
+    NOTIFICATION_POLL_MS,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_BACKOFF_BASE_MS,
+    NOTIFICATION_BACKOFF_MAX_MS,
+    NOTIFICATION_CLAIM_TIMEOUT_MS,
+    NOTIFICATION_SMS_SINK
+)
+
+
+class PermanentFailure(Exception):
+    """A send that cannot succeed on retry (unknown user, no phone number)."""
+
+
+# -------- SINKS -------- #
+
+def twilio_sink(to: str, message: str):
+    # Imported on first send so the fake sink works without Twilio installed
+    from twilio_client import send_sms
+    send_sms(to, message)
+
+
+class FakeSmsSink:
+    """Records messages instead of sending them. Optional latency and failures."""
+
+    def __init__(self, latency: float = 0.0, fail_every: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, to: str, message: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise RuntimeError("Fake SMS failure")
+            self.sent.append({"to": to, "message": message, "sent_at": datetime.utcnow()})
+
+
+def get_sms_sink(name: str = NOTIFICATION_SMS_SINK):
+    if name == "fake":
+        return FakeSmsSink()
+    if name == "twilio":
+        return twilio_sink
+    raise ValueError(f"Unknown NOTIFICATION_SMS_SINK '{name}'")
+
+
+# -------- RATE LIMIT -------- #
+
+class RateLimiter:
+    """Token bucket shared by the workers of one dispatcher."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# -------- DISPATCHER -------- #
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        collection=notification_col,
+        sms_sink=None,
+        workers: int = NOTIFICATION_WORKERS,
+        rate_per_second: float = NOTIFICATION_RATE_PER_SECOND,
+        poll_ms: int = NOTIFICATION_POLL_MS,
+        max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+        backoff_base_ms: int = NOTIFICATION_BACKOFF_BASE_MS,
+        backoff_max_ms: int = NOTIFICATION_BACKOFF_MAX_MS,
+        claim_timeout_ms: int = NOTIFICATION_CLAIM_TIMEOUT_MS
+    ):
+        self.collection = collection
+        self.sinks = {"SMS": sms_sink or get_sms_sink()}
+        self.workers = workers
+        self.rate_per_second = rate_per_second
+        self.poll_interval = poll_ms / 1000
+        self.max_attempts = max_attempts
+        self.backoff_base_ms = backoff_base_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.claim_timeout = timedelta(milliseconds=claim_timeout_ms)
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+
+        self.thread = None
+        self.loop = None
+        self._wake = None
+        self.should_stop = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {
+            "claimed": 0,
+            "sent": 0,
+            "retried": 0,
+            "failed": 0,
+            "last_send_ms": 0.0,
+            "max_send_ms": 0.0,
+        }
+
+    # -------- ROW LIFECYCLE (blocking, run in threads) -------- #
+
+    def claim(self):
+        now = datetime.utcnow()
+        doc = self.collection.find_one_and_update(
+            {
+                "channel": {"$in": list(self.sinks)},
+                "user_id": {"$exists": True},
+                "$or": [
+                    {"status": "QUEUED", "next_attempt_at": {"$lte": now}},
+                    {"status": "SENDING", "claimed_at": {"$lte": now - self.claim_timeout}}
+                ]
+            },
+            {
+                "$set": {"status": "SENDING", "claimed_at": now, "claimed_by": self.name},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            self._count("claimed")
+        return doc
+
+    def send(self, doc: dict):
+        user = get_user(doc["user_id"])
+        if not user:
+            raise PermanentFailure(f"No user found for user_id={doc['user_id']}")
+        phone = user.get("phone")
+        if not phone:
+            raise PermanentFailure(f"No phone number for user_id={doc['user_id']}")
+        self.sinks[doc["channel"]](phone, doc["message"])
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay_ms = min(self.backoff_max_ms, self.backoff_base_ms * 2 ** max(0, attempts - 1))
+        return timedelta(milliseconds=delay_ms)
+
+    def complete(self, doc: dict, error: Exception = None):
+        if error is None:
+            mark_notification_sent(doc["_id"])
+            self._count("sent")
+        elif isinstance(error, PermanentFailure) or doc["attempts"] >= self.max_attempts:
+            mark_notification_failed(doc["_id"], str(error))
+            self._count("failed")
+            print(f"[notification_dispatcher] {doc['_id']} failed after {doc['attempts']} attempts: {error}")
+        else:
+            self.collection.update_one(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {
+                        "status": "QUEUED",
+                        "next_attempt_at": datetime.utcnow() + self.backoff(doc["attempts"]),
+                        "last_error": str(error)
+                    },
+                    "$unset": {"claimed_at": "", "claimed_by": ""}
+                }
+            )
+            self._count("retried")
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    # -------- ASYNC WORKERS -------- #
+
+    async def _deliver(self, doc: dict, limiter: RateLimiter):
+        await limiter.acquire()
+        t0 = time.perf_counter()
+        error = None
+        try:
+            await asyncio.to_thread(self.send, doc)
+        except Exception as e:
+            error = e
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self.lock:
+            self.stats["last_send_ms"] = elapsed
+            self.stats["max_send_ms"] = max(self.stats["max_send_ms"], elapsed)
+        await asyncio.to_thread(self.complete, doc, error)
+
+    async def _worker(self, limiter: RateLimiter, until_idle: bool):
+        while not self.should_stop.is_set():
+            try:
+                doc = await asyncio.to_thread(self.claim)
+            except Exception as e:
+                print(f"[notification_dispatcher] Claim failed: {e}")
+                doc = None
+            if doc:
+                try:
+                    await self._deliver(doc, limiter)
+                except Exception as e:
+                    # The row stays SENDING and is claimed again after claim_timeout
+                    print(f"[notification_dispatcher] Could not record result for {doc['_id']}: {e}")
+                continue
+            if until_idle:
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run(self, until_idle: bool = False):
+        """Run the workers until stop(), or until nothing is due with until_idle."""
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        limiter = RateLimiter(self.rate_per_second)
+        await asyncio.gather(*(
+            self._worker(limiter, until_idle) for _ in range(max(1, self.workers))
+        ))
+
+    def dispatch_pending(self):
+        """Send everything that is due now and return (for scripts and tests)."""
+        asyncio.run(self.run(until_idle=True))
+
+    def wake(self):
+        """Thread-safe nudge so a new row is sent without waiting for the next poll."""
+        loop, event = self.loop, self._wake
+        if loop is not None and event is not None and loop.is_running():
+            loop.call_soon_threadsafe(event.set)
+
+    # -------- LIFECYCLE -------- #
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.should_stop.clear()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.run()), daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        self.should_stop.set()
+        self.wake()
+        if self.thread:
+            # In-flight sends finish; anything still SENDING is reclaimed later
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats["running"] = bool(self.thread and self.thread.is_alive())
+        stats["queued"] = self.collection.count_documents({"status": "QUEUED"})
+        stats["sending"] = self.collection.count_documents({"status": "SENDING"})
+        return stats
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "once":
+        notification_dispatcher.dispatch_pending()
+        print(notification_dispatcher.get_stats())
+    else:
+        print(f"[notification_dispatcher] {notification_dispatcher.name} dispatching notification_logs")
+        asyncio.run(notification_dispatcher.run())
@@ -1,15 +1,45 @@
 from datetime import datetime
 from db import db
-from twilio_client import send_sms
+from indexes import declare_indexes, register_query
 
 
 # Collection
 notification_col = db.notification_logs
 
+declare_indexes(
+    "notification_logs",
+    [("user_id", 1), ("timestamp", -1)],
+    [("service_centre_id", 1), ("timestamp", -1)],
+    [("category", 1), ("timestamp", -1)],
+    # Dispatcher claims: due QUEUED rows and expired SENDING leases
+    [("status", 1), ("next_attempt_at", 1)]
+)
+
+register_query(
+    "notification_logs.by_user", "notification_logs",
+    {"user_id": "USER"}, sort=[("timestamp", -1)]
+)
+register_query(
+    "notification_logs.by_centre", "notification_logs",
+    {"service_centre_id": "CENTRE"}, sort=[("timestamp", -1)]
+)
+register_query(
+    "notification_logs.security", "notification_logs",
+    {"category": "SECURITY"}, sort=[("timestamp", -1)]
+)
+register_query(
+    "notification_logs.due", "notification_logs",
+    {"status": "QUEUED"}, sort=[("next_attempt_at", 1)]
+)
+
 
 def _insert_notification(payload: dict):
-    payload["timestamp"] = datetime.utcnow()
-    payload["status"] = "QUEUED"  # QUEUED | SENT | FAILED
+    now = datetime.utcnow()
+    payload["timestamp"] = now
+    payload["status"] = "QUEUED"  # QUEUED | SENDING | SENT | FAILED
+    # Outbox fields for notification_dispatcher
+    payload["attempts"] = 0
+    payload["next_attempt_at"] = now
     notification_col.insert_one(payload)
 
 
@@ -19,48 +49,18 @@ def notify_user(
     category: str = "INFO",
     channel: str = "SMS",
 ):
-    # Fetch user's phone number
-    user = db.users.find_one({"_id": user_id})
-    phone = user.get("phone") if user else None
-
-    print(
-        f"[notify_user] user_id={user_id}, channel={channel}, "
-        f"has_user={bool(user)}, has_phone={bool(phone)}"
-    )
-
-    notification = {
+    """
+    Queue a notification for a user. Nothing is sent here: the row is picked
+    up by notification_dispatcher, which looks up the phone number and sends
+    it, so a slow SMS provider never blocks the caller.
+    """
+    _insert_notification({
         "user_id": user_id,
         "channel": channel,
         "category": category,
-        "message": message,
-        "status": "QUEUED",
-    }
-
-    try:
-        if channel == "SMS" and phone:
-            print(f"[notify_user] Attempting SMS to {phone}")
-            send_sms(phone, message)
-            notification["status"] = "SENT"
-            print("[notify_user] SMS sent successfully")
-        else:
-            notification["status"] = "QUEUED"
-            if not user:
-                print(f"[notify_user] No user found for user_id={user_id}")
-            elif not phone:
-                print(f"[notify_user] No phone number for user_id={user_id}")
-            else:
-                print(
-                    f"[notify_user] Channel '{channel}' is not SMS, "
-                    "skipping direct Twilio send"
-                )
-
-    except Exception as e:
-        notification["status"] = "FAILED"
-        notification["failure_reason"] = str(e)
-        print(f"[notify_user] Failed to send notification: {e}")
-
-    notification["timestamp"] = datetime.utcnow()
-    notification_col.insert_one(notification)
+        "message": message
+    })
+    wake_dispatcher()
 
 
 def notify_service_centre(
@@ -93,6 +93,12 @@ def notify_oem_security(
     })
 
 
+def wake_dispatcher():
+    """Let an in-process dispatcher pick up new rows now instead of on its next poll."""
+    from notification_dispatcher import notification_dispatcher
+    notification_dispatcher.wake()
+
+
 def mark_notification_sent(notification_id):
     notification_col.update_one(
         {"_id": notification_id},
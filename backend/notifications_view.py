@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from auth import get_current_role, require_roles
 from utils import UserRole
 from db import db
+from notification_dispatcher import notification_dispatcher
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -84,3 +85,12 @@ def get_sms_notifications(
             {"_id": 0}
         ).sort("timestamp", -1)
     )
+
+
+@router.get("/oem/dispatcher/stats")
+def get_dispatcher_stats(
+    role=Depends(get_current_role)
+):
+    """Outbox backlog and send counters for this process's dispatcher."""
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+    return notification_dispatcher.get_stats()
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
 from auth import get_current_role, require_roles
 from utils import UserRole
 import analytics
+from model_registry import ModelNotAvailableError
+import rollups
 import db
 
 router = APIRouter(prefix="/oem", tags=["OEM Dashboard"])
@@ -22,18 +25,26 @@ def oem_dashboard(role=Depends(get_current_role)):
 def high_risk_vehicles(role=Depends(get_current_role)):
     require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
 
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$vehicle_id",
-                "alert_count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"alert_count": -1}},
-        {"$limit": 10}
+    return [
+        {"_id": v["key"], "alert_count": v["count"]}
+        for v in rollups.get_top("vehicle", 10)
     ]
 
-    return list(db.alerts.aggregate(pipeline))
+@router.post("/rescore")
+async def rescore_telemetry(
+    vehicle_id: str | None = None,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    limit: int | None = Query(None, ge=1),
+    role=Depends(get_current_role)
+):
+    """Score stored telemetry with the active model (e.g. after training a new version)."""
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+
+    try:
+        return await analytics.rescore_history(vehicle_id, start, end, limit)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.get("/security/ueba")
 def ueba_dashboard(role=Depends(get_current_role)):
@@ -2,6 +2,8 @@ from db import db
 from datetime import datetime
 from auth import require_roles
 from utils import UserRole
+from pymongo import ReturnDocument
+import rollups
 
 rca_col = db.rca
 
@@ -18,13 +20,19 @@ def create_rca(alert_id, vehicle_id, root_cause, method, current_role):
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
-    return rca_col.insert_one(rca).inserted_id
+    rca_id = rca_col.insert_one(rca).inserted_id
+    rollups.record_rca(rca)
+    return rca_id
 
 
 def update_rca_status(rca_id, status, current_role):
     require_roles(current_role, [UserRole.OEM_ADMIN])
 
-    rca_col.update_one(
+    previous = rca_col.find_one_and_update(
         {"_id": rca_id},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+        projection={"status": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    if previous:
+        rollups.record_status_change("rca_status", previous.get("status"), status)
@@ -1,18 +1,167 @@
 import redis
-import json
+import redis.asyncio as aioredis
+import time
+import telemetry_codec
+from config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+    LIVE_VEHICLE_MAX_AGE_SECONDS,
+    TELEMETRY_CODEC,
+    TELEMETRY_STREAM_ENABLED,
+    TELEMETRY_STREAM_KEY,
+    TELEMETRY_STREAM_MAXLEN
+)
+
+_pool_kwargs = dict(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    # Replies stay bytes so binary telemetry codecs round-trip untouched
+    decode_responses=False
+)
 
-redis_client = redis.Redis(
-    host="localhost",
-    port=6379,
-    decode_responses=True
+# Simulator / worker threads share one pool; when it is exhausted callers
+# wait up to REDIS_POOL_TIMEOUT for a connection instead of failing
+redis_pool = redis.BlockingConnectionPool(**_pool_kwargs)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# asyncio callers (WebSocket hub, async endpoints) use their own pool so
+# the event loop never blocks on Redis I/O
+async_redis_pool = aioredis.BlockingConnectionPool(**_pool_kwargs)
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
+
+# Pub/sub holds its connection for as long as it listens, so it must not
+# borrow from the bounded pool above. No socket timeout: a quiet channel
+# is normal, not an error.
+async_pubsub_client = aioredis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    decode_responses=False
 )
 
+# Sorted set of vehicle_id -> last-seen unix time, maintained by set_telemetry
+LIVE_VEHICLES_KEY = "live_vehicles"
+PRUNE_INTERVAL_SECONDS = 60
+_last_prune = 0.0
+
+# Writes use the configured codec; reads accept whatever codec wrote the value
+codec = telemetry_codec.get_codec(TELEMETRY_CODEC)
+
+def telemetry_channel(vehicle_id: str) -> str:
+    return f"telemetry_updates:{vehicle_id}"
+
+def _queue_live_writes(pipe, vehicle_id: str, data: bytes, now: float):
+    pipe.set(f"telemetry:{vehicle_id}", data)
+    pipe.publish(telemetry_channel(vehicle_id), data)
+    pipe.zadd(LIVE_VEHICLES_KEY, {vehicle_id: now})
+    if TELEMETRY_STREAM_ENABLED:
+        # Consumed by anomaly_worker.py
+        pipe.xadd(
+            TELEMETRY_STREAM_KEY, {"data": data},
+            maxlen=TELEMETRY_STREAM_MAXLEN, approximate=True
+        )
+
+def _queue_prune(pipe, now: float):
+    # Piggyback expiry of stale registry entries on a regular write, at most
+    # once per PRUNE_INTERVAL_SECONDS per process
+    global _last_prune
+    if now - _last_prune >= PRUNE_INTERVAL_SECONDS:
+        _last_prune = now
+        pipe.zremrangebyscore(LIVE_VEHICLES_KEY, "-inf", now - LIVE_VEHICLE_MAX_AGE_SECONDS)
+
 def set_telemetry(vehicle_id: str, payload: dict):
-    redis_client.set(f"telemetry:{vehicle_id}", json.dumps(payload))
+    now = time.time()
+    # SET + PUBLISH + registry update in one round trip; subscribers get
+    # the same encoded bytes
+    pipe = redis_client.pipeline(transaction=False)
+    _queue_live_writes(pipe, vehicle_id, codec.encode(payload), now)
+    _queue_prune(pipe, now)
+    pipe.execute()
+
+def set_telemetry_many(payloads: list):
+    # One round trip for a whole batch; later readings for the same
+    # vehicle overwrite earlier ones, same as sequential SETs would.
+    now = time.time()
+    pipe = redis_client.pipeline(transaction=False)
+    for payload in payloads:
+        _queue_live_writes(pipe, payload["vehicle_id"], codec.encode(payload), now)
+    _queue_prune(pipe, now)
+    pipe.execute()
 
 def get_telemetry(vehicle_id: str):
     data = redis_client.get(f"telemetry:{vehicle_id}")
-    return json.loads(data) if data else None
+    return telemetry_codec.decode(data) if data else None
+
+def _project(payload: dict, fields):
+    if not fields:
+        return payload
+    projected = {"vehicle_id": payload.get("vehicle_id")}
+    for f in fields:
+        if f in payload:
+            projected[f] = payload[f]
+    return projected
+
+def _decode_many(vehicle_ids: list, values: list, fields=None):
+    return {
+        vehicle_id: _project(telemetry_codec.decode(data), fields) if data else None
+        for vehicle_id, data in zip(vehicle_ids, values)
+    }
+
+def get_telemetry_many(vehicle_ids: list, fields=None) -> dict:
+    """Live state for many vehicles in one MGET; None for vehicles with no data."""
+    if not vehicle_ids:
+        return {}
+    values = redis_client.mget([f"telemetry:{v}" for v in vehicle_ids])
+    return _decode_many(vehicle_ids, values, fields)
 
 def get_all_vehicle_keys():
-    return [k.replace("telemetry:", "") for k in redis_client.keys("telemetry:*")]
+    # Served from the registry instead of KEYS telemetry:*, which walks the
+    # whole keyspace and blocks Redis while it does
+    return [v.decode() for v in redis_client.zrange(LIVE_VEHICLES_KEY, 0, -1)]
+
+def get_live_vehicles(seen_within_seconds: int = 60, offset: int = 0, limit: int = 100):
+    """Vehicles seen in the last N seconds, most recent first. O(log n + page)."""
+    since = time.time() - seen_within_seconds
+    entries = redis_client.zrevrangebyscore(
+        LIVE_VEHICLES_KEY, "+inf", since,
+        start=offset, num=limit, withscores=True
+    )
+    return [
+        {"vehicle_id": vehicle_id.decode(), "last_seen": last_seen}
+        for vehicle_id, last_seen in entries
+    ]
+
+def count_live_vehicles(seen_within_seconds: int = 60) -> int:
+    return redis_client.zcount(LIVE_VEHICLES_KEY, time.time() - seen_within_seconds, "+inf")
+
+
+# -------- ASYNC API -------- #
+
+async def set_telemetry_async(vehicle_id: str, payload: dict):
+    now = time.time()
+    pipe = async_redis_client.pipeline(transaction=False)
+    _queue_live_writes(pipe, vehicle_id, codec.encode(payload), now)
+    _queue_prune(pipe, now)
+    await pipe.execute()
+
+async def get_telemetry_async(vehicle_id: str):
+    data = await async_redis_client.get(f"telemetry:{vehicle_id}")
+    return telemetry_codec.decode(data) if data else None
+
+async def get_telemetry_many_async(vehicle_ids: list, fields=None) -> dict:
+    if not vehicle_ids:
+        return {}
+    values = await async_redis_client.mget([f"telemetry:{v}" for v in vehicle_ids])
+    return _decode_many(vehicle_ids, values, fields)
+
+async def close_async_client():
+    await async_redis_client.aclose()
+    await async_pubsub_client.aclose()
@@ -0,0 +1,310 @@
+# rollups.py
+"""
+Pre-aggregated counters for the analytics dashboard.
+
+Each counter lives in one document of `analytics_rollups` keyed by
+(granularity, bucket, dimension, key), e.g. ("day", 2025-01-01, "severity",
+"HIGH"). Writers bump them at write time so /analytics reads a handful of
+buckets instead of scanning alerts / rca / capa_actions.
+
+Granularities:
+    hour / day  - time-bucketed counts (alert trend)
+    all         - running totals (distributions, closure rates)
+"""
+
+from collections import Counter
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from db import db
+from indexes import declare_indexes, register_query, ensure_declared_indexes
+
+rollups_col = None if db is None else db.analytics_rollups
+
+# One document per counter; unique so nothing can ever split a counter in two
+declare_indexes(
+    "analytics_rollups",
+    [("granularity", 1), ("dimension", 1), ("key", 1), ("bucket", 1)],
+    unique=True
+)
+
+register_query(
+    "analytics_rollups.series", "analytics_rollups",
+    {"granularity": "day", "dimension": "alerts", "key": "total", "bucket": {"$gte": datetime(1970, 1, 1)}},
+    sort=[("bucket", 1)]
+)
+register_query(
+    "analytics_rollups.totals", "analytics_rollups",
+    {"granularity": "all", "bucket": datetime(1970, 1, 1), "dimension": "severity"}
+)
+
+GRANULARITIES = ("hour", "day", "all")
+ALL_TIME = datetime(1970, 1, 1)
+
+
+def _bucket(ts: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ALL_TIME
+
+
+def _counters(dimensions: dict, ts: datetime, granularities=GRANULARITIES) -> list:
+    return [
+        (g, _bucket(ts, g), dimension, key)
+        for g in granularities
+        for dimension, key in dimensions.items()
+    ]
+
+
+def _write(increments: Counter):
+    """One unordered bulk upsert for a set of counter increments."""
+    if rollups_col is None or not increments:
+        return
+    ops = []
+    for (granularity, bucket, dimension, key), amount in increments.items():
+        if amount == 0:
+            continue
+        ops.append(UpdateOne(
+            {"_id": f"{granularity}|{bucket.isoformat()}|{dimension}|{key}"},
+            {
+                "$inc": {"count": amount},
+                "$setOnInsert": {
+                    "granularity": granularity,
+                    "bucket": bucket,
+                    "dimension": dimension,
+                    "key": key
+                }
+            },
+            upsert=True
+        ))
+    if ops:
+        rollups_col.bulk_write(ops, ordered=False)
+
+
+# -------- WRITE SIDE -------- #
+
+def _alert_counters(alert: dict) -> Counter:
+    counts = Counter(_counters(
+        {
+            "alerts": "total",
+            "severity": alert["severity"],
+            "alert_type": alert["alert_type"],
+            "vehicle": str(alert["vehicle_id"])
+        },
+        alert["timestamp"]
+    ))
+
+    # Detection latency is kept as a (count, summed ms) pair so MTTD for any
+    # window is just sum / count over its buckets
+    latency = alert.get("detection_latency_ms")
+    if latency is not None:
+        for key in _counters({"detection": "count"}, alert["timestamp"]):
+            counts[key] += 1
+        for key in _counters({"detection": "latency_ms"}, alert["timestamp"]):
+            counts[key] += int(latency)
+    return counts
+
+
+def _rca_counters(rca: dict) -> list:
+    # Status is a current-state counter, so it only has a running total
+    return (
+        _counters({"rca": "total"}, rca["created_at"])
+        + _counters({"rca_status": rca["status"]}, rca["created_at"], ("all",))
+    )
+
+
+def _capa_counters(capa: dict) -> list:
+    return (
+        _counters({"capa": "total"}, capa["created_at"])
+        + _counters({"capa_status": capa["status"]}, capa["created_at"], ("all",))
+    )
+
+
+def record_alert(alert: dict):
+    _write(_alert_counters(alert))
+
+
+def record_alerts(alerts: list):
+    """Counters for a batch of alerts, merged into one bulk upsert."""
+    counts = Counter()
+    for alert in alerts:
+        counts.update(_alert_counters(alert))
+    _write(counts)
+
+
+def record_rca(rca: dict):
+    _write(Counter(_rca_counters(rca)))
+
+
+def record_capa(capa: dict):
+    _write(Counter(_capa_counters(capa)))
+
+
+def record_status_change(dimension: str, old_status, new_status):
+    """Move one item between status counters (running totals only)."""
+    if old_status == new_status:
+        return
+    increments = Counter({("all", ALL_TIME, dimension, new_status): 1})
+    if old_status is not None:
+        increments[("all", ALL_TIME, dimension, old_status)] -= 1
+    _write(increments)
+
+
+# -------- READ SIDE -------- #
+
+def get_total(dimension: str, key) -> int:
+    if rollups_col is None:
+        return 0
+    doc = rollups_col.find_one(
+        {"granularity": "all", "bucket": ALL_TIME, "dimension": dimension, "key": key},
+        {"count": 1}
+    )
+    return doc["count"] if doc else 0
+
+
+def get_totals(dimension: str) -> dict:
+    if rollups_col is None:
+        return {}
+    return {
+        d["key"]: d["count"]
+        for d in rollups_col.find(
+            {"granularity": "all", "bucket": ALL_TIME, "dimension": dimension},
+            {"key": 1, "count": 1}
+        )
+    }
+
+
+def get_series(dimension: str, key, granularity: str, since: datetime) -> list:
+    if rollups_col is None:
+        return []
+    return list(
+        rollups_col.find(
+            {
+                "granularity": granularity,
+                "dimension": dimension,
+                "key": key,
+                "bucket": {"$gte": _bucket(since, granularity)}
+            },
+            {"_id": 0, "bucket": 1, "count": 1}
+        ).sort("bucket", 1)
+    )
+
+
+def get_top(dimension: str, limit: int = 10) -> list:
+    if rollups_col is None:
+        return []
+    return list(
+        rollups_col.find(
+            {"granularity": "all", "bucket": ALL_TIME, "dimension": dimension},
+            {"_id": 0, "key": 1, "count": 1}
+        ).sort("count", -1).limit(limit)
+    )
+
+
+# -------- BACKFILL -------- #
+
+STAGING_COLLECTION = "analytics_rollups_staging"
+
+
+def _source_counts(since=None, until=None) -> Counter:
+    """Fold counters for alerts / rca / capa created in [since, until)."""
+    def window(field):
+        bounds = {"$type": "date"}
+        if since is not None:
+            bounds["$gte"] = since
+        if until is not None:
+            bounds["$lt"] = until
+        return {field: bounds}
+
+    counts = Counter()
+    for alert in db.alerts.find(
+        window("timestamp"),
+        {"severity": 1, "alert_type": 1, "vehicle_id": 1, "timestamp": 1,
+         "detection_latency_ms": 1}
+    ):
+        counts.update(_alert_counters(alert))
+
+    for rca in db.rca.find(window("created_at"), {"status": 1, "created_at": 1}):
+        counts.update(_rca_counters(rca))
+
+    for capa in db.capa_actions.find(window("created_at"), {"status": 1, "created_at": 1}):
+        counts.update(_capa_counters(capa))
+    return counts
+
+
+def rebuild_rollups():
+    """
+    Recompute every counter from the source collections.
+
+    Only needed once for data written before rollups existed (or to repair
+    drift); normal operation keeps the counters current at write time.
+
+    Counters are built in a staging collection and swapped in with a
+    rename, so readers never see a half-built set. Increments made to the
+    old collection while the build runs are lost with it. To cover that,
+    documents created after the build's cutoff are counted again on the
+    new collection after the swap. Status changes made during the rebuild
+    are not replayed.
+    """
+    if rollups_col is None:
+        return
+
+    cutoff = datetime.utcnow()
+    counts = _source_counts(until=cutoff)
+
+    staging = db[STAGING_COLLECTION]
+    staging.drop()
+    # rename() keeps the source's indexes, not the target's
+    ensure_declared_indexes(staging, "analytics_rollups")
+    docs = [
+        {
+            "_id": f"{granularity}|{bucket.isoformat()}|{dimension}|{key}",
+            "granularity": granularity,
+            "bucket": bucket,
+            "dimension": dimension,
+            "key": key,
+            "count": amount
+        }
+        for (granularity, bucket, dimension, key), amount in counts.items()
+        if amount
+    ]
+    for i in range(0, len(docs), 1000):
+        staging.insert_many(docs[i:i + 1000], ordered=False)
+
+    swapped_at = datetime.utcnow()
+    staging.rename(rollups_col.name, dropTarget=True)
+    _write(_source_counts(since=cutoff, until=swapped_at))
+
+
+def backfill_once() -> bool:
+    """
+    Run rebuild_rollups once per database (first deploy with rollups). The
+    "backfill" marker document makes sure only one API process does it.
+    Counters written by live traffic in the meantime don't matter: the
+    rebuild replaces them. Returns whether this call ran the backfill.
+    """
+    if rollups_col is None:
+        return False
+    try:
+        db.analytics_rollups_meta.insert_one({"_id": "backfill", "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return False
+
+    print("[rollups] Backfilling analytics counters from existing data")
+    try:
+        rebuild_rollups()
+    except Exception:
+        # Let the next start try again
+        db.analytics_rollups_meta.delete_one({"_id": "backfill"})
+        raise
+    db.analytics_rollups_meta.update_one(
+        {"_id": "backfill"}, {"$set": {"finished_at": datetime.utcnow()}}
+    )
+    return True
+
+
+if __name__ == "__main__":
+    rebuild_rollups()
+    print("Analytics rollups rebuilt")
@@ -0,0 +1,169 @@
+# scoring_pool.py
+"""
+Process pool for IsolationForest scoring.
+
+Tree traversal holds the GIL, so scoring a big batch in an API worker
+stalls every other request on that worker. Batches are scored in separate
+processes instead:
+
+    - each process loads the model once (initializer) and keeps
+      model_registry's hot-swap, so a newly activated version is picked up
+    - the feature matrix and the output scores live in one shared-memory
+      segment; only its name and row ranges are pickled, never the arrays
+    - large batches are split into ML_SCORING_CHUNK_ROWS chunks across the
+      processes
+
+`score` blocks the calling thread (outside the GIL) and `score_async`
+can be awaited from async endpoints. With ML_SCORING_PROCESSES=0 the
+scoring runs in the caller's process instead.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import ml
+from model_registry import get_model, ModelNotAvailableError
+from config import ML_SCORING_PROCESSES, ML_SCORING_CHUNK_ROWS
+
+
+# -------- WORKER SIDE -------- #
+
+def _init_worker():
+    try:
+        get_model()
+    except ModelNotAvailableError:
+        # Loaded on the first task instead, once a model has been trained
+        pass
+
+
+def _attach(name: str) -> SharedMemory:
+    # Spawned workers share the parent's resource tracker, so attaching here
+    # adds no second registration and the parent's unlink() cleans up
+    return SharedMemory(name=name)
+
+
+def _score_chunk(name: str, n: int, n_features: int, start: int, stop: int):
+    shm = _attach(name)
+    try:
+        X = np.ndarray((n, n_features), dtype=np.float64, buffer=shm.buf)
+        scores = np.ndarray((n,), dtype=np.float64, buffer=shm.buf, offset=X.nbytes)
+        scores[start:stop] = get_model().decision_function(X[start:stop])
+        # Views must be gone before the segment can be closed
+        del X, scores
+    finally:
+        shm.close()
+
+
+# -------- CALLER SIDE -------- #
+
+class ScoringPool:
+    def __init__(self, processes: int = ML_SCORING_PROCESSES, chunk_rows: int = ML_SCORING_CHUNK_ROWS):
+        self.processes = processes
+        self.chunk_rows = chunk_rows
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # spawn, not fork: the API process has threads that fork
+                # would copy in whatever state they happen to be in
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self.executor
+
+    def _submit(self, X: np.ndarray):
+        n, n_features = X.shape
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        shm = SharedMemory(create=True, size=X.nbytes + n * 8)
+        try:
+            shared = np.ndarray(X.shape, dtype=np.float64, buffer=shm.buf)
+            shared[:] = X
+            del shared
+
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_score_chunk, shm.name, n, n_features, start, min(start + self.chunk_rows, n))
+                for start in range(0, n, self.chunk_rows)
+            ]
+        except BaseException:
+            self._release(shm)
+            raise
+        return shm, futures
+
+    def _collect(self, shm: SharedMemory, n: int, n_features: int) -> np.ndarray:
+        view = np.ndarray((n,), dtype=np.float64, buffer=shm.buf, offset=n * n_features * 8)
+        scores = view.copy()
+        del view
+        return scores
+
+    @staticmethod
+    def _release(shm: SharedMemory):
+        shm.close()
+        shm.unlink()
+
+    def _broken(self):
+        # A worker died (OOM, segfault); start a fresh pool next time
+        with self.lock:
+            self.executor = None
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        if self.processes <= 0 or len(X) == 0:
+            return get_model().decision_function(X) if len(X) else np.empty(0)
+
+        shm, futures = self._submit(X)
+        try:
+            for f in futures:
+                f.result()
+            return self._collect(shm, *X.shape)
+        except BrokenProcessPool:
+            self._broken()
+            raise
+        finally:
+            self._release(shm)
+
+    async def score_async(self, X: np.ndarray) -> np.ndarray:
+        if len(X) == 0:
+            return np.empty(0)
+        if self.processes <= 0:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: get_model().decision_function(X))
+
+        shm, futures = self._submit(X)
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+            return self._collect(shm, *X.shape)
+        except BrokenProcessPool:
+            self._broken()
+            raise
+        finally:
+            # Safe even if a cancelled chunk is still running: the worker
+            # keeps its own mapping until it closes it
+            self._release(shm)
+
+    def detect_anomalies_batch(self, telemetry, skip_invalid: bool = False) -> list:
+        """Same results as ml.detect_anomalies_batch, scored in the pool."""
+        X, rows = ml.extract_feature_matrix(telemetry, skip_invalid=skip_invalid)
+        return ml.results_from_scores(len(telemetry), rows, self.score(X))
+
+    async def detect_anomalies_batch_async(self, telemetry, skip_invalid: bool = False) -> list:
+        X, rows = ml.extract_feature_matrix(telemetry, skip_invalid=skip_invalid)
+        return ml.results_from_scores(len(telemetry), rows, await self.score_async(X))
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+scoring_pool = ScoringPool()
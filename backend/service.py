@@ -7,10 +7,29 @@ from auth import require_roles
 from utils import UserRole
 from notifications import notify_service_centre
 from bson import ObjectId
+from indexes import declare_indexes, register_query
+from entity_cache import get_service_centre
 
 service_centres_col = db.service_centres
 bookings_col = db.bookings
 
+declare_indexes(
+    "bookings",
+    [("service_centre_id", 1), ("slot_start", 1), ("status", 1)],
+    [("user_id", 1)],
+    [("vehicle_id", 1), ("status", 1)]
+)
+
+register_query(
+    "bookings.slot_count", "bookings",
+    {"service_centre_id": "CENTRE", "status": {"$ne": "CANCELLED"}, "slot_start": "2025-01-01T09:00:00"}
+)
+register_query(
+    "bookings.by_centre", "bookings",
+    {"service_centre_id": "CENTRE"}, sort=[("slot_start", 1)]
+)
+register_query("bookings.by_user", "bookings", {"user_id": "USER"})
+
 
 def create_service_centre(name, location, contact, current_role, max_capacity=5):
     require_roles(current_role, [UserRole.OEM_ADMIN])
@@ -27,6 +46,7 @@ def create_service_centre(name, location, contact, current_role, max_capacity=5)
         'slot_duration_minutes': 60,
         'working_days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
     }
+    # New _id, so nothing in entity_cache can refer to it yet
     return str(service_centres_col.insert_one(centre).inserted_id)
 
 
@@ -43,7 +63,7 @@ def generate_available_slots(service_centre_id, date):
     if isinstance(service_centre_id, str):
         service_centre_id = ObjectId(service_centre_id)
     
-    centre = service_centres_col.find_one({'_id': service_centre_id})
+    centre = get_service_centre(service_centre_id)
     if not centre:
         raise ValueError('Service centre not found')
     
@@ -260,7 +280,7 @@ def get_service_centre_capacity(service_centre_id, slot_start, slot_end):
     if isinstance(service_centre_id, str):
         service_centre_id = ObjectId(service_centre_id)
     
-    centre = service_centres_col.find_one({'_id': service_centre_id})
+    centre = get_service_centre(service_centre_id)
     if not centre:
         return {'error': 'Service centre not found'}
     
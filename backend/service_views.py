@@ -1,7 +1,7 @@
 # Backend: Enhanced Service Centre Portal Views
 # File: backend/service_views.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from auth import get_current_role, require_roles
 from utils import UserRole
 from db import db
@@ -13,47 +13,92 @@ from datetime import datetime, timedelta
 router = APIRouter(prefix='/service', tags=['Service Centre Views'])
 
 
+DEFAULT_BOOKINGS_PAGE = 500
+MAX_BOOKINGS_PAGE = 2000
+
+
+def _index_by(collection, field: str, values, projection: dict) -> dict:
+    """One $in query for all distinct values, keyed by `field`."""
+    values = list({v for v in values if v})
+    if not values:
+        return {}
+    return {
+        doc[field]: doc
+        for doc in collection.find({field: {'$in': values}}, {**projection, field: 1, '_id': 0})
+    }
+
+
+def _enrich_bookings(bookings: list) -> list:
+    """Attach customer and vehicle details with one users and one vehicles query."""
+    customers = _index_by(
+        db.users, 'user_id', (b.get('user_id') for b in bookings),
+        {'name': 1, 'phone': 1, 'email': 1}
+    )
+    vehicles = _index_by(
+        db.vehicles, 'vin', (b.get('vehicle_id') for b in bookings),
+        {'make': 1, 'model': 1, 'year': 1}
+    )
+
+    for booking in bookings:
+        if '_id' in booking:
+            booking['booking_id'] = str(booking['_id'])
+            del booking['_id']
+
+        customer = customers.get(booking.get('user_id'))
+        if customer:
+            booking['customer_name'] = customer.get('name', 'N/A')
+            booking['customer_phone'] = customer.get('phone', 'N/A')
+            booking['customer_email'] = customer.get('email', 'N/A')
+
+        vehicle = vehicles.get(booking.get('vehicle_id'))
+        if vehicle:
+            booking['vehicle_make'] = vehicle.get('make', 'N/A')
+            booking['vehicle_model'] = vehicle.get('model', 'N/A')
+            booking['vehicle_year'] = vehicle.get('year', 'N/A')
+
+    return bookings
+
+
 @router.get('/bookings')
 def get_my_bookings(
     service_centre_id: str,
-    status: str = None,
+    response: Response,
+    status: str = Query(None, description="Status, or comma-separated statuses"),
+    from_: str = Query(None, alias="from", description="Earliest slot_start (ISO 8601)"),
+    to: str = Query(None, description="Latest slot_start (ISO 8601), exclusive"),
+    limit: int = Query(DEFAULT_BOOKINGS_PAGE, ge=1, le=MAX_BOOKINGS_PAGE),
+    offset: int = Query(0, ge=0),
     role=Depends(get_current_role)
 ):
+    """
+    One page of a centre's bookings ordered by slot (limit/offset). The
+    total number of matches is returned in the X-Total-Count header.
+    """
     require_roles(role, [UserRole.SERVICE_CENTER, UserRole.OEM_ADMIN])
     
     if db is None:
         return []
 
-    print(f"[DEBUG] get_my_bookings called with service_centre_id='{service_centre_id}', status='{status}'")
     query = {'service_centre_id': service_centre_id}
     if status:
-        query['status'] = status
-    
-    bookings = list(db.bookings.find(query).sort('slot_start', 1))
-    
-    # Convert MongoDB _id to booking_id and enrich with customer info
-    for booking in bookings:
-        if '_id' in booking:
-            booking['booking_id'] = str(booking['_id'])
-            del booking['_id']
-        
-        # Get customer details
-        if booking.get('user_id'):
-            customer = db.users.find_one({'user_id': booking['user_id']})
-            if customer:
-                booking['customer_name'] = customer.get('name', 'N/A')
-                booking['customer_phone'] = customer.get('phone', 'N/A')
-                booking['customer_email'] = customer.get('email', 'N/A')
-        
-        # Get vehicle details
-        if booking.get('vehicle_id'):
-            vehicle = db.vehicles.find_one({'vin': booking['vehicle_id']})
-            if vehicle:
-                booking['vehicle_make'] = vehicle.get('make', 'N/A')
-                booking['vehicle_model'] = vehicle.get('model', 'N/A')
-                booking['vehicle_year'] = vehicle.get('year', 'N/A')
-    
-    return bookings
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+    # slot_start is stored as an ISO string, so string ranges sort correctly
+    if from_ or to:
+        query['slot_start'] = {}
+        if from_:
+            query['slot_start']['$gte'] = from_
+        if to:
+            query['slot_start']['$lt'] = to
+
+    bookings = list(db.bookings.find(query).sort('slot_start', 1).skip(offset).limit(limit))
+    if len(bookings) < limit and (bookings or not offset):
+        # Short page: the total is known without counting
+        total = offset + len(bookings)
+    else:
+        total = db.bookings.count_documents(query)
+    response.headers['X-Total-Count'] = str(total)
+    return _enrich_bookings(bookings)
 
 
 @router.get('/jobs')
@@ -2,11 +2,14 @@
 Telemetry Simulator - Generates realistic car telemetry data for demo/testing
 """
 
+import json
 import threading
 import time
-from datetime import datetime
+import urllib.request
+from datetime import datetime, timedelta
 from typing import Dict, Optional, Callable
 import random
+import numpy as np
 
 class TelemetrySimulator:
     def __init__(self):
@@ -191,5 +194,531 @@ class VehicleSimulator:
         }
 
 
+class FleetSimulator:
+    """
+    Whole-fleet simulator for load testing.
+
+    Same physics as VehicleSimulator, but every field is a NumPy array with
+    one slot per vehicle, so a tick is a handful of vectorized operations
+    regardless of fleet size. Readings are written in chunks of batch_size
+    with one Redis pipeline per chunk.
+    """
+    def __init__(
+        self,
+        vehicle_ids: list,
+        seed: Optional[int] = None,
+        batch_size: int = 1000,
+        sink: Optional[Callable] = None
+    ):
+        n = len(vehicle_ids)
+        self.vehicle_ids = list(vehicle_ids)
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        # sink(readings) receives each chunk; defaults to the live Redis state
+        self.sink = sink or self._redis_sink
+
+        self.speed = np.zeros(n)
+        self.rpm = np.full(n, 800.0)
+        self.engine_temp = np.full(n, 80.0)
+        self.coolant_temp = np.full(n, 75.0)
+        self.fuel = np.full(n, 85.0)
+        self.battery = np.full(n, 13.5)
+        self.brake = np.full(n, 15.0)
+        self.acceleration = np.zeros(n)
+        self.throttle = np.zeros(n)
+        # Spread vehicles around the demo location so they don't overlap
+        self.latitude = 40.7128 + self.rng.uniform(-0.05, 0.05, n)
+        self.longitude = -74.006 + self.rng.uniform(-0.05, 0.05, n)
+
+        self.should_stop = False
+        self.thread: Optional[threading.Thread] = None
+        self.ticks = 0
+        self.last_step_ms = 0.0
+        self.last_emit_ms = 0.0
+
+    def step(self):
+        """Advance every vehicle by one second."""
+        rng = self.rng
+        n = len(self.vehicle_ids)
+
+        previous_speed = self.speed
+        self.speed = np.clip(self.speed + (rng.random(n) - 0.5) * 15, 0, 120)
+        # Not modelled by VehicleSimulator, but the anomaly model needs them
+        self.acceleration = (self.speed - previous_speed) / 3.6
+
+        target_rpm = 800 + (self.speed / 120) * 5700
+        self.rpm += (target_rpm - self.rpm) * 0.2
+        self.throttle = np.clip(self.rpm / 6500 * 100 + self.acceleration * 10, 0, 100)
+
+        temp_change = (self.rpm / 6000 - 0.3) * 0.5
+        self.engine_temp = np.clip(self.engine_temp + temp_change, 70, 110)
+        self.coolant_temp = np.clip(
+            self.engine_temp - 5 + (rng.random(n) - 0.5) * 2, 60, 100
+        )
+
+        self.fuel = np.maximum(5, self.fuel - (self.speed / 100) * 0.08 / 3600)
+
+        load_factor = self.rpm / 6000
+        self.battery = np.clip(
+            13.5 + (load_factor - 0.5) * 1.0 + (rng.random(n) - 0.5) * 0.1, 12.5, 14.8
+        )
+
+        # Parked cars wear slowly every tick, moving ones in occasional steps
+        parked = self.speed < 5
+        wear = np.where(
+            parked,
+            rng.random(n) * 0.001,
+            np.where(rng.random(n) > 0.9, rng.random(n) * 0.005, 0.0)
+        )
+        self.brake += wear
+
+        self.latitude += (rng.random(n) - 0.5) * 0.0001
+        self.longitude += (rng.random(n) - 0.5) * 0.0001
+
+    def readings(self, timestamp: Optional[str] = None) -> list:
+        """Current state as telemetry payloads, rounded like VehicleSimulator."""
+        timestamp = timestamp or datetime.utcnow().isoformat()
+        columns = {
+            'speed_kmph': np.round(self.speed, 1),
+            'rpm': np.round(self.rpm).astype(np.int64),
+            'engine_temp_c': np.round(self.engine_temp, 1),
+            'coolant_temp_c': np.round(self.coolant_temp, 1),
+            'brake_wear_percent': np.minimum(100, np.round(self.brake, 1)),
+            'battery_voltage_v': np.round(self.battery, 2),
+            'fuel_level_percent': np.round(self.fuel, 1),
+            'throttle_position_percent': np.round(self.throttle, 1),
+            'acceleration_mps2': np.round(self.acceleration, 2),
+            'latitude': np.round(self.latitude, 4),
+            'longitude': np.round(self.longitude, 4),
+        }
+        names = list(columns)
+        # tolist() converts a whole column to Python scalars in C
+        rows = zip(*(columns[name].tolist() for name in names))
+        engine_status = np.where(self.rpm > 500, 'ON', 'OFF').tolist()
+
+        readings = []
+        for vehicle_id, status, row in zip(self.vehicle_ids, engine_status, rows):
+            reading = dict(zip(names, row))
+            reading['vehicle_id'] = vehicle_id
+            reading['timestamp'] = timestamp
+            reading['engine_status'] = status
+            readings.append(reading)
+        return readings
+
+    def emit(self, readings: list):
+        for i in range(0, len(readings), self.batch_size):
+            self.sink(readings[i:i + self.batch_size])
+
+    def tick(self):
+        t0 = time.perf_counter()
+        self.step()
+        t1 = time.perf_counter()
+        self.emit(self.readings())
+        t2 = time.perf_counter()
+
+        self.ticks += 1
+        self.last_step_ms = (t1 - t0) * 1000
+        self.last_emit_ms = (t2 - t1) * 1000
+
+    def start(self, interval: float = 1.0):
+        self.should_stop = False
+        self.thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.should_stop = True
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def get_stats(self) -> dict:
+        return {
+            "vehicles": len(self.vehicle_ids),
+            "ticks": self.ticks,
+            "last_step_ms": round(self.last_step_ms, 2),
+            "last_emit_ms": round(self.last_emit_ms, 2)
+        }
+
+    def _run(self, interval: float):
+        next_tick = time.monotonic()
+        while not self.should_stop:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Fleet simulator error: {e}")
+            # Fixed schedule; a slow tick eats into the next sleep, and a
+            # tick that overruns the interval starts the next one right away
+            next_tick = max(next_tick + interval, time.monotonic())
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    @staticmethod
+    def _redis_sink(readings: list):
+        from redis_client import set_telemetry_many
+        set_telemetry_many(readings)
+
+
 # Global simulator instance
 telemetry_simulator = TelemetrySimulator()
+
+
+
+# -------- LOAD GENERATION -------- #
+#
+# A load run pairs a source of (offset_seconds, reading) pairs with a target
+# that delivers batches and records per-reading latency. Synthetic sources
+# are seeded and recorded ones are replayed in stored order, so the same
+# arguments produce the same traffic.
+
+class LatencyHistogram:
+    """
+    Fixed bucket counts plus exact count / mean / max, in constant memory.
+    Percentiles come from a uniform reservoir of at most RESERVOIR_SIZE
+    samples, so long 100k-vehicle runs don't keep every latency.
+    """
+    BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+    RESERVOIR_SIZE = 10000
+
+    def __init__(self, seed: int = 0):
+        self.counts = np.zeros(len(self.BOUNDS_MS) + 1, dtype=np.int64)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.reservoir = []
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms: float, count: int = 1):
+        with self.lock:
+            self.counts[np.searchsorted(self.BOUNDS_MS, latency_ms)] += count
+            self.total_ms += latency_ms * count
+            self.max_ms = max(self.max_ms, latency_ms)
+            for _ in range(count):
+                # Algorithm R: every sample so far is kept with equal probability
+                self.count += 1
+                if len(self.reservoir) < self.RESERVOIR_SIZE:
+                    self.reservoir.append(latency_ms)
+                else:
+                    slot = self.rng.randrange(self.count)
+                    if slot < self.RESERVOIR_SIZE:
+                        self.reservoir[slot] = latency_ms
+
+    def summary(self) -> dict:
+        with self.lock:
+            if not self.count:
+                return {"count": 0}
+            samples = np.array(self.reservoir)
+            counts = self.counts.tolist()
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+
+        labels = [f"<={b}ms" for b in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        p50, p90, p95, p99 = np.percentile(samples, [50, 90, 95, 99])
+        return {
+            "count": count,
+            "mean_ms": round(total_ms / count, 2),
+            "p50_ms": round(float(p50), 2),
+            "p90_ms": round(float(p90), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(max_ms, 2),
+            "buckets": dict(zip(labels, counts))
+        }
+
+
+def synthetic_source(vehicles: int, duration_seconds: int, seed: int = 0, interval: float = 1.0,
+                     start_time: Optional[datetime] = None):
+    """
+    A seeded FleetSimulator run, one reading per vehicle per interval.
+    Readings are stamped from start_time (default: now), so passing the same
+    seed and start_time reproduces them exactly.
+    """
+    start_time = start_time or datetime.utcnow()
+    fleet = FleetSimulator(
+        [f"SIM-{i:06d}" for i in range(vehicles)], seed=seed, sink=lambda readings: None
+    )
+    for tick in range(int(duration_seconds / interval)):
+        fleet.step()
+        offset = tick * interval
+        timestamp = (start_time + timedelta(seconds=offset)).isoformat()
+        for reading in fleet.readings(timestamp):
+            yield offset, reading
+
+
+def recorded_source(vehicle_id: Optional[str] = None, start=None, end=None, limit: int = 0):
+    """Stored telemetry_events, oldest first, spaced as originally recorded."""
+    from db import telemetry_col
+
+    query = {}
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lte"] = end
+
+    first = None
+    cursor = telemetry_col.find(query, {"_id": 0}).sort([("timestamp", 1), ("_id", 1)])
+    for doc in cursor.limit(limit):
+        ts = doc.get("timestamp")
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        if not isinstance(ts, datetime):
+            continue
+        ts = ts.replace(tzinfo=None)
+        first = first or ts
+        doc["timestamp"] = ts.isoformat()
+        yield (ts - first).total_seconds(), doc
+
+
+class IngestTarget:
+    """
+    POST /telemetry/batch on a running API; latency is the request round
+    trip. Readings the API reports as REJECTED count as errors.
+    """
+    def __init__(self, base_url: str = "http://localhost:8000", role: str = "OEM_ADMIN"):
+        self.url = base_url.rstrip("/") + "/telemetry/batch"
+        self.role = role
+
+    def send(self, batch: list, histogram: LatencyHistogram):
+        body = "\n".join(json.dumps(r, default=str) for r in batch).encode()
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Content-Type": "application/x-ndjson", "X-Role": self.role}
+        )
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read() or b"{}")
+        histogram.record((time.perf_counter() - t0) * 1000, len(batch))
+        return result.get("rejected", 0)
+
+    def close(self):
+        pass
+
+
+class PipelineTarget:
+    """
+    Run readings through the LangGraph pipeline in-process, one invocation
+    per reading, or one batch-graph invocation per batch with batch=True.
+    """
+    def __init__(self, batch: bool = False):
+        from graph import graph, run_batch
+        self.graph = graph
+        self.run_batch = run_batch
+        self.batch = batch
+
+    def send(self, batch: list, histogram: LatencyHistogram):
+        if self.batch:
+            # Every reading in the batch waits for the whole batch
+            t0 = time.perf_counter()
+            self.run_batch(batch)
+            histogram.record((time.perf_counter() - t0) * 1000, len(batch))
+            return
+
+        for reading in batch:
+            t0 = time.perf_counter()
+            self.graph.invoke({
+                "telemetry": reading,
+                "anomaly": {},
+                "severity": "",
+                "alert_id": None
+            })
+            histogram.record((time.perf_counter() - t0) * 1000)
+
+    def close(self):
+        pass
+
+
+class WebSocketTarget:
+    """
+    Write readings to Redis and time their arrival on /ws/telemetry clients.
+
+    Only vehicles in watch_ids get a socket; their readings are stamped with
+    a fresh timestamp on send so the receiving side can match them up.
+    """
+    def __init__(self, watch_ids: list, ws_url: str = "ws://localhost:8000", drain_seconds: float = 2.0):
+        try:
+            import websockets  # noqa: F401
+        except ImportError:
+            raise RuntimeError("The websocket target requires the websockets package")
+
+        import asyncio
+        self.ws_url = ws_url.rstrip("/")
+        self.watch_ids = set(watch_ids)
+        self.drain_seconds = drain_seconds
+        self.pending = {}
+        self.histogram = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        for vehicle_id in self.watch_ids:
+            asyncio.run_coroutine_threadsafe(self._listen(vehicle_id), self.loop)
+
+    async def _listen(self, vehicle_id: str):
+        import websockets
+
+        try:
+            async with websockets.connect(f"{self.ws_url}/ws/telemetry/{vehicle_id}") as ws:
+                async for message in ws:
+                    received = time.perf_counter()
+                    data = json.loads(message)
+                    sent = self.pending.pop((vehicle_id, data.get("timestamp")), None)
+                    if sent is not None and self.histogram is not None:
+                        self.histogram.record((received - sent) * 1000)
+        except Exception as e:
+            print(f"WebSocket listener for {vehicle_id} failed: {e}")
+
+    async def _shutdown(self):
+        import asyncio
+
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def send(self, batch: list, histogram: LatencyHistogram):
+        from redis_client import set_telemetry_many
+
+        self.histogram = histogram
+        for reading in batch:
+            reading["timestamp"] = datetime.utcnow().isoformat()
+            if reading["vehicle_id"] in self.watch_ids:
+                self.pending[(reading["vehicle_id"], reading["timestamp"])] = time.perf_counter()
+        set_telemetry_many(batch)
+
+    def close(self):
+        deadline = time.monotonic() + self.drain_seconds
+        while self.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        import asyncio
+
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class LoadGenerator:
+    """
+    Feed a source into a target on the source's own clock, sped up by
+    `speed` and optionally capped at max_rate readings per second.
+    """
+    def __init__(self, source, target, speed: float = 1.0, batch_size: int = 100,
+                 max_rate: Optional[float] = None):
+        self.source = source
+        self.target = target
+        self.speed = speed
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.histogram = LatencyHistogram()
+        self.sent = 0
+        self.errors = 0
+        self.max_lag = 0.0
+
+    def _flush(self, batch: list):
+        if not batch:
+            return
+        try:
+            # Targets return how many readings failed, if they can tell
+            failed = self.target.send(batch, self.histogram) or 0
+            self.sent += len(batch) - failed
+            self.errors += failed
+        except Exception as e:
+            self.errors += len(batch)
+            print(f"Load target error: {e}")
+        batch.clear()
+
+    def run(self) -> dict:
+        batch = []
+        queued = 0
+        start = time.monotonic()
+
+        for offset, reading in self.source:
+            due = start + offset / self.speed
+            if self.max_rate:
+                due = max(due, start + queued / self.max_rate)
+
+            delay = due - time.monotonic()
+            if delay > 0:
+                # Send what is already due before waiting for the next reading
+                self._flush(batch)
+                time.sleep(max(0.0, due - time.monotonic()))
+            else:
+                self.max_lag = max(self.max_lag, -delay)
+
+            batch.append(dict(reading))
+            queued += 1
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+
+        self._flush(batch)
+        elapsed = time.monotonic() - start
+        self.target.close()
+
+        return {
+            "sent": self.sent,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(self.sent / elapsed, 1) if elapsed else None,
+            "max_schedule_lag_s": round(self.max_lag, 3),
+            "latency": self.histogram.summary()
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fleet simulation and load generation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="time FleetSimulator ticks, nothing is written")
+    bench.add_argument("--vehicles", type=int, default=100_000)
+    bench.add_argument("--ticks", type=int, default=10)
+
+    load = commands.add_parser("load", help="replay or synthesize traffic into a target")
+    load.add_argument("target", choices=["ingest", "ws", "pipeline", "pipeline-batch"])
+    load.add_argument("--replay", action="store_true", help="replay telemetry_events instead of a synthetic fleet")
+    load.add_argument("--vehicle-id", help="replay a single vehicle")
+    load.add_argument("--limit", type=int, default=0, help="replay at most this many readings")
+    load.add_argument("--vehicles", type=int, default=100)
+    load.add_argument("--duration", type=int, default=60, help="synthetic fleet length in seconds")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--speed", type=float, default=1.0, help="1 = real time, 100 = 100x")
+    load.add_argument("--max-rate", type=float, help="cap in readings per second")
+    load.add_argument("--batch-size", type=int, default=100)
+    load.add_argument("--url", default="http://localhost:8000")
+    load.add_argument("--watch", type=int, default=10, help="vehicles with a WebSocket client (ws target)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        fleet = FleetSimulator(
+            [f"SIM-{i:06d}" for i in range(args.vehicles)], seed=0, sink=lambda readings: None
+        )
+        for _ in range(args.ticks):
+            fleet.tick()
+            print(fleet.get_stats())
+    else:
+        if args.replay:
+            source = recorded_source(args.vehicle_id, limit=args.limit)
+        else:
+            source = synthetic_source(args.vehicles, args.duration, seed=args.seed)
+
+        if args.target == "ingest":
+            target = IngestTarget(args.url)
+        elif args.target in ("pipeline", "pipeline-batch"):
+            target = PipelineTarget(batch=args.target == "pipeline-batch")
+        else:
+            if args.replay:
+                # Sample the vehicles up front so their sockets are open before sending
+                from db import telemetry_col
+                watch = telemetry_col.distinct("vehicle_id")[:args.watch]
+            else:
+                watch = [f"SIM-{i:06d}" for i in range(min(args.watch, args.vehicles))]
+            target = WebSocketTarget(watch, args.url.replace("http", "ws", 1))
+            time.sleep(1)  # let the sockets connect and receive their snapshots
+
+        report = LoadGenerator(
+            source, target,
+            speed=args.speed,
+            batch_size=args.batch_size,
+            max_rate=args.max_rate
+        ).run()
+        print(json.dumps(report, indent=2))
@@ -80,12 +80,29 @@
 #     )
 
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+import json
 from auth import get_current_role, require_roles
 from utils import validate_telemetry, UserRole
-from redis_client import set_telemetry, get_telemetry
-from db import telemetry_col
+from redis_client import (
+    set_telemetry,
+    set_telemetry_many,
+    get_telemetry_async,
+    get_telemetry_many_async,
+    get_live_vehicles,
+    count_live_vehicles
+)
+from db import db, telemetry_col
+from telemetry_buffer import telemetry_buffer
+from anomaly_worker import anomaly_worker, stream_stats
+from graph import collect_node_stats
+from twin import twin_writer, get_twin_state
+from telemetry_store import to_storage_doc, query_history, HistoryPage
 from simulator import telemetry_simulator
 
 
@@ -100,14 +117,263 @@ def ingest_telemetry(payload: dict, role=Depends(get_current_role)):
     payload["timestamp"] = datetime.utcnow().isoformat()
 
     set_telemetry(payload["vehicle_id"], payload)
-    telemetry_col.insert_one(payload)
+    telemetry_buffer.enqueue(payload)
 
 
     return {"status": "queued", "vehicle_id": payload["vehicle_id"]}
 
 
+MAX_BATCH_READINGS = 5000
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+
+def _too_large(detail: str):
+    return HTTPException(status_code=413, detail=detail)
+
+
+async def _read_batch_body(request: Request) -> bytes:
+    """Request body, refused with 413 once it grows past MAX_BATCH_BYTES."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_BATCH_BYTES:
+        raise _too_large(f"Batch body is limited to {MAX_BATCH_BYTES} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BATCH_BYTES:
+            raise _too_large(f"Batch body is limited to {MAX_BATCH_BYTES} bytes")
+    return bytes(body)
+
+
+def _parse_batch_body(body: bytes, content_type: str):
+    """
+    Accept either a JSON array of readings or NDJSON (one reading per line).
+    Returns a list of (reading, error) pairs so a bad line only rejects itself.
+    """
+    try:
+        text = body.decode("utf-8").strip()
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be UTF-8: {e}")
+    if not text:
+        return []
+
+    if "ndjson" not in content_type and text.startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        if len(items) > MAX_BATCH_READINGS:
+            raise _too_large(f"At most {MAX_BATCH_READINGS} readings per batch")
+        return [(item, None) for item in items]
+
+    parsed = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(parsed) == MAX_BATCH_READINGS:
+            raise _too_large(f"At most {MAX_BATCH_READINGS} readings per batch")
+        try:
+            parsed.append((json.loads(line), None))
+        except ValueError as e:
+            parsed.append((None, f"Invalid JSON: {e}"))
+    return parsed
+
+
+def ingest_telemetry_batch(items: list):
+    results = []
+    accepted = []  # (result index, payload)
+
+    for index, (payload, error) in enumerate(items):
+        if error is None:
+            try:
+                if not isinstance(payload, dict):
+                    raise ValueError("Reading must be a JSON object")
+                validate_telemetry(payload)
+            except ValueError as e:
+                error = str(e)
+
+        if error is not None:
+            results.append({
+                "index": index,
+                "vehicle_id": payload.get("vehicle_id") if isinstance(payload, dict) else None,
+                "status": "REJECTED",
+                "error": error
+            })
+            continue
+
+        payload["timestamp"] = datetime.utcnow().isoformat()
+        results.append({"index": index, "vehicle_id": payload["vehicle_id"], "status": "ACCEPTED"})
+        accepted.append((index, payload))
+
+    if accepted:
+        try:
+            telemetry_col.insert_many(
+                [to_storage_doc(p) for _, p in accepted], ordered=False
+            )
+        except BulkWriteError as e:
+            # With ordered=False every other document is still written;
+            # only the failed ones are reported back.
+            for write_error in e.details.get("writeErrors", []):
+                index, _ = accepted[write_error["index"]]
+                results[index]["status"] = "REJECTED"
+                results[index]["error"] = write_error.get("errmsg", "Write failed")
+
+        # Live state, pub/sub and the anomaly stream only see stored readings
+        stored = [p for index, p in accepted if results[index]["status"] == "ACCEPTED"]
+        if stored:
+            set_telemetry_many(stored)
+
+    accepted_count = sum(1 for r in results if r["status"] == "ACCEPTED")
+    return {
+        "status": "queued",
+        "accepted": accepted_count,
+        "rejected": len(results) - accepted_count,
+        "results": results
+    }
+
+
+@router.post("/telemetry/batch")
+async def ingest_telemetry_batch_endpoint(request: Request, role=Depends(get_current_role)):
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+
+    items = _parse_batch_body(
+        await _read_batch_body(request),
+        request.headers.get("content-type", "")
+    )
+    # Redis / Mongo calls are blocking, keep them off the event loop
+    return await run_in_threadpool(ingest_telemetry_batch, items)
+
+
+@router.get("/telemetry/buffer/stats")
+def get_buffer_stats(role=Depends(get_current_role)):
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+    return telemetry_buffer.get_stats()
+
+
+@router.get("/telemetry/stream/stats")
+def get_stream_stats(role=Depends(get_current_role)):
+    """Anomaly stream backlog: consumer group lag, pending entries, consumers."""
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+    stats = stream_stats()
+    if anomaly_worker.thread and anomaly_worker.thread.is_alive():
+        stats["in_process_worker"] = anomaly_worker.get_stats()
+    # Pipeline node wall times, summed over the API and every worker process
+    stats["graph_nodes"] = collect_node_stats()
+    return stats
+
+
+@router.get("/telemetry/twin/stats")
+def get_twin_stats(role=Depends(get_current_role)):
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+    return twin_writer.get_stats()
+
+
+@router.get("/telemetry/twin/{vehicle_id}")
+def get_twin(vehicle_id: str, role=Depends(get_current_role)):
+    require_roles(
+        role,
+        [
+            UserRole.CUSTOMER,
+            UserRole.SERVICE_CENTER,
+            UserRole.OEM_ADMIN,
+            UserRole.OEM_ANALYST,
+        ],
+    )
+    state = get_twin_state(vehicle_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="No twin state for vehicle")
+    return state
+
+
+@router.get("/telemetry/live-vehicles")
+def list_live_vehicles(
+    seen_within: int = Query(60, ge=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    role=Depends(get_current_role)
+):
+    require_roles(role, [UserRole.OEM_ADMIN, UserRole.OEM_ANALYST])
+
+    return {
+        "total": count_live_vehicles(seen_within),
+        "offset": offset,
+        "limit": limit,
+        "vehicles": get_live_vehicles(seen_within, offset, limit)
+    }
+
+
+MAX_SNAPSHOT_VEHICLES = 1000
+
+
+def _split(value: str | None) -> list:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def _resolve_snapshot_vehicles(vins: list, user_id: str | None, service_centre_id: str | None):
+    vehicle_ids = list(vins)
+    if db is not None:
+        if user_id:
+            vehicle_ids += db.vehicles.distinct("vin", {"owner_user_id": user_id})
+        if service_centre_id:
+            # Bookings reference vehicles by VIN
+            vehicle_ids += db.bookings.distinct("vehicle_id", {"service_centre_id": service_centre_id})
+    return list(dict.fromkeys(v for v in vehicle_ids if v))
+
+
+@router.get("/telemetry/live")
+async def get_live_snapshot(
+    vins: str | None = None,
+    user_id: str | None = None,
+    service_centre_id: str | None = None,
+    fields: str | None = None,
+    role=Depends(get_current_role)
+):
+    """
+    Live state for many vehicles in one Redis round trip.
+
+    Vehicles come from `vins` (comma separated) and/or everything owned by
+    `user_id` or booked at `service_centre_id`. `fields` (comma separated)
+    limits each entry to those columns plus vehicle_id.
+    """
+    require_roles(
+        role,
+        [
+            UserRole.CUSTOMER,
+            UserRole.SERVICE_CENTER,
+            UserRole.OEM_ADMIN,
+            UserRole.OEM_ANALYST,
+        ],
+    )
+
+    if not (vins or user_id or service_centre_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide vins, user_id or service_centre_id"
+        )
+
+    vehicle_ids = await run_in_threadpool(
+        _resolve_snapshot_vehicles, _split(vins), user_id, service_centre_id
+    )
+    if len(vehicle_ids) > MAX_SNAPSHOT_VEHICLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_SNAPSHOT_VEHICLES} vehicles per snapshot"
+        )
+
+    try:
+        snapshot = await get_telemetry_many_async(vehicle_ids, _split(fields))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Live telemetry unavailable: {e}")
+
+    return {
+        "count": len(vehicle_ids),
+        "vehicles": [t for t in snapshot.values() if t],
+        "missing": [v for v, t in snapshot.items() if not t]
+    }
+
+
 @router.get("/telemetry/live/{vehicle_id}")
-def get_live_telemetry(vehicle_id: str, role=Depends(get_current_role)):
+async def get_live_telemetry(vehicle_id: str, role=Depends(get_current_role)):
     require_roles(
         role,
         [
@@ -119,7 +385,7 @@ def get_live_telemetry(vehicle_id: str, role=Depends(get_current_role)):
     )
 
     try:
-        telemetry = get_telemetry(vehicle_id)
+        telemetry = await get_telemetry_async(vehicle_id)
     except Exception:
         telemetry = None
 
@@ -141,7 +407,13 @@ def get_live_telemetry(vehicle_id: str, role=Depends(get_current_role)):
 
 
 @router.get("/telemetry/history/{vehicle_id}")
-def get_telemetry_history(vehicle_id: str, limit: int = 50, role=Depends(get_current_role)):
+def get_telemetry_history(
+    vehicle_id: str,
+    limit: int = 50,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    role=Depends(get_current_role)
+):
     require_roles(
         role,
         [
@@ -152,9 +424,72 @@ def get_telemetry_history(vehicle_id: str, limit: int = 50, role=Depends(get_cur
         ],
     )
 
-    return list(
-        telemetry_col.find({"vehicle_id": vehicle_id}, {"_id": 0})
-        .sort("timestamp", -1)
-        .limit(limit)
+    # Wide ranges are served from the downsampled tiers in time-series mode
+    return query_history(vehicle_id, start=start, end=end, limit=limit)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _stream_history_page(page: HistoryPage):
+    header = {
+        "vehicle_id": page.vehicle_id,
+        "resolution": page.resolution,
+        "from": page.start.isoformat(),
+        "to": page.end.isoformat()
+    }
+    yield json.dumps(header)[:-1] + ', "points": ['
+    first = True
+    for point in page:
+        yield ("" if first else ",") + json.dumps(point, default=_json_default)
+        first = False
+    yield '], "next_cursor": ' + json.dumps(page.next_cursor) + "}"
+
+
+@router.get("/telemetry/history/{vehicle_id}/range")
+def get_telemetry_history_range(
+    vehicle_id: str,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    resolution: str = "auto",
+    max_points: int | None = Query(None, ge=1, le=10000),
+    page_size: int = Query(1000, ge=1, le=10000),
+    cursor: str | None = None,
+    role=Depends(get_current_role)
+):
+    """
+    Oldest-first history for a time range, streamed as JSON.
+
+    resolution is raw / 1m / 1h or auto (picked from the range). max_points
+    folds readings into that many time buckets with min/max/avg per field.
+    Pass next_cursor back as `cursor` (with the same from/to) for the next page.
+    """
+    require_roles(
+        role,
+        [
+            UserRole.CUSTOMER,
+            UserRole.SERVICE_CENTER,
+            UserRole.OEM_ADMIN,
+            UserRole.OEM_ANALYST,
+        ],
     )
 
+    try:
+        page = HistoryPage(
+            vehicle_id,
+            start=start,
+            end=end,
+            resolution=resolution,
+            max_points=max_points,
+            page_size=page_size,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(_stream_history_page(page), media_type="application/json")
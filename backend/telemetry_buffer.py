@@ -0,0 +1,191 @@
+# telemetry_buffer.py
+"""
+Write-behind buffer for telemetry history.
+
+Producers (the ingest API and the simulator loop) only enqueue. A single
+background thread drains the queue into telemetry_events with insert_many,
+either when a full batch is available or when the flush interval elapses.
+
+Readings are acknowledged to the client before they are flushed, so a
+flush that fails as a whole (failover, timeout, network) is retried with
+backoff before its documents count as failed; meanwhile the queue fills
+up and producers feel the backpressure. Documents Mongo rejects
+individually (BulkWriteError) are not retried.
+"""
+
+import queue
+import threading
+import time
+from pymongo.errors import BulkWriteError
+from db import telemetry_col
+from telemetry_store import to_storage_doc
+from config import (
+    TELEMETRY_BUFFER_MAX,
+    TELEMETRY_FLUSH_BATCH,
+    TELEMETRY_FLUSH_INTERVAL_MS,
+    TELEMETRY_FLUSH_MAX_ATTEMPTS,
+    TELEMETRY_FLUSH_RETRY_BASE_MS
+)
+
+DUPLICATE_KEY = 11000
+
+
+class TelemetryWriteBuffer:
+    def __init__(self, collection, max_size=TELEMETRY_BUFFER_MAX,
+                 batch_size=TELEMETRY_FLUSH_BATCH,
+                 flush_interval_ms=TELEMETRY_FLUSH_INTERVAL_MS, transform=None,
+                 max_attempts=TELEMETRY_FLUSH_MAX_ATTEMPTS,
+                 retry_base_ms=TELEMETRY_FLUSH_RETRY_BASE_MS):
+        self.collection = collection
+        # Must return a new dict: insert_many adds _id to what it writes
+        self.transform = transform or dict
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_size)
+        self.thread = None
+        self.should_stop = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "failed": 0,
+            "retries": 0,
+            "flushes": 0,
+            "blocked_enqueues": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # -------- PRODUCER SIDE -------- #
+
+    def enqueue(self, doc: dict):
+        """Queue a document for persistence, blocking while the buffer is full."""
+        self.start()
+        # Copy so callers holding on to the payload never see insert_many's
+        # _id (or a storage-format timestamp) appear on it
+        doc = self.transform(doc)
+        try:
+            self.queue.put_nowait(doc)
+        except queue.Full:
+            # Backpressure: the producer waits for the flusher to catch up
+            with self.lock:
+                self.stats["blocked_enqueues"] += 1
+            self.queue.put(doc)
+        with self.lock:
+            self.stats["enqueued"] += 1
+
+    # -------- FLUSHER SIDE -------- #
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.should_stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the flusher and write out everything still queued."""
+        self.should_stop.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        self.thread = None
+        # Anything enqueued after the thread exited still gets written
+        while self._flush_batch():
+            pass
+
+    def _run(self):
+        while not self.should_stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.should_stop.is_set():
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+        # Drain on shutdown
+        while self._flush_batch():
+            pass
+
+    def _flush_batch(self) -> bool:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(batch)
+        return bool(batch)
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        started = time.perf_counter()
+        written, failed = self._insert(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self.lock:
+            self.stats["flushed"] += written
+            self.stats["failed"] += failed
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = elapsed_ms
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+            self.stats["total_flush_ms"] += elapsed_ms
+
+    def _insert(self, batch: list):
+        """insert_many with retries; returns (written, failed)."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                return len(batch), 0
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if attempt > 1:
+                    # insert_many set _id on every document, so an earlier
+                    # attempt may already have written some of them
+                    errors = self._drop_own_writes(batch, errors)
+                if errors:
+                    print(f"[telemetry_buffer] {len(errors)} documents rejected: {errors[0].get('errmsg')}")
+                return len(batch) - len(errors), len(errors)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    print(f"[telemetry_buffer] Flush failed for {len(batch)} documents after {attempt} attempts: {e}")
+                    return 0, len(batch)
+                delay = self.retry_base * 2 ** (attempt - 1)
+                print(f"[telemetry_buffer] Flush failed, retrying in {delay:.1f}s: {e}")
+                with self.lock:
+                    self.stats["retries"] += 1
+                time.sleep(delay)
+
+    def _drop_own_writes(self, batch: list, errors: list) -> list:
+        ids = [batch[err["index"]]["_id"] for err in errors if err.get("code") == DUPLICATE_KEY]
+        if not ids:
+            return errors
+        stored = {doc["_id"] for doc in self.collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+        return [err for err in errors if batch[err["index"]]["_id"] not in stored]
+
+    # -------- METRICS -------- #
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_capacity"] = self.queue.maxsize
+        stats["avg_flush_ms"] = (
+            stats["total_flush_ms"] / stats["flushes"] if stats["flushes"] else 0.0
+        )
+        stats["running"] = self.thread is not None and self.thread.is_alive()
+        return stats
+
+
+# Global buffer instance shared by the API and the simulator
+telemetry_buffer = TelemetryWriteBuffer(telemetry_col, transform=to_storage_doc)
@@ -0,0 +1,200 @@
+# telemetry_codec.py
+"""
+Encodings for live telemetry stored in / published through Redis.
+
+    json     plain UTF-8 JSON; the original format, kept as compatibility mode
+    msgpack  schemaless binary, same structure as JSON but smaller and faster
+    struct   fixed binary layout over ml.FEATURES + location + engine status
+
+Readers never need to know which codec wrote a value: decode() sniffs the
+first byte (JSON objects start with "{", struct records with STRUCT_MAGIC,
+which msgpack never emits). Payloads that do not fit the struct schema are
+written as msgpack (or JSON if msgpack is unavailable) instead.
+"""
+
+import json
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from ml import FEATURES
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, payload: dict) -> bytes:
+        return json.dumps(payload).encode()
+
+    def decode(self, data: bytes) -> dict:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def encode(self, payload: dict) -> bytes:
+        if msgpack is None:
+            raise RuntimeError("TELEMETRY_CODEC=msgpack requires the msgpack package")
+        return msgpack.packb(payload, use_bin_type=True)
+
+    def decode(self, data: bytes) -> dict:
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read msgpack-encoded telemetry")
+        return msgpack.unpackb(data, raw=False)
+
+
+# 0xc1 is the one byte msgpack reserves as "never used"
+STRUCT_MAGIC = b"\xc1"
+STRUCT_FIELDS = FEATURES + ["latitude", "longitude"]
+ENGINE_STATUS = ["OFF", "ON"]
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+# magic | timestamp (us since epoch) | engine status | one float64 per field | vehicle_id
+_HEADER = struct.Struct(f"<qB{len(STRUCT_FIELDS)}d")
+
+
+class StructCodec:
+    name = "struct"
+
+    def __init__(self):
+        self.fallback = MsgpackCodec() if msgpack is not None else JsonCodec()
+        self.known_keys = set(STRUCT_FIELDS) | {"vehicle_id", "timestamp", "engine_status"}
+
+    def _fits(self, payload: dict) -> bool:
+        return (
+            set(payload) <= self.known_keys
+            and isinstance(payload.get("vehicle_id"), str)
+            and isinstance(payload.get("timestamp"), str)
+            and payload.get("engine_status") in ENGINE_STATUS
+            and all(
+                isinstance(payload.get(f, 0.0), (int, float))
+                and not isinstance(payload.get(f, 0.0), bool)
+                for f in STRUCT_FIELDS
+            )
+        )
+
+    def encode(self, payload: dict) -> bytes:
+        if not self._fits(payload):
+            return self.fallback.encode(payload)
+        try:
+            ts = datetime.fromisoformat(payload["timestamp"])
+        except ValueError:
+            return self.fallback.encode(payload)
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        micros = (ts - _EPOCH) // _US
+
+        # Missing readings travel as NaN and are dropped again on decode
+        values = [float(payload.get(f, math.nan)) for f in STRUCT_FIELDS]
+        return (
+            STRUCT_MAGIC
+            + _HEADER.pack(micros, ENGINE_STATUS.index(payload["engine_status"]), *values)
+            + payload["vehicle_id"].encode()
+        )
+
+    def decode(self, data: bytes) -> dict:
+        micros, status, *values = _HEADER.unpack_from(data, 1)
+        payload = {
+            "vehicle_id": data[1 + _HEADER.size:].decode(),
+            "timestamp": (_EPOCH + micros * _US).isoformat(),
+            "engine_status": ENGINE_STATUS[status]
+        }
+        for f, v in zip(STRUCT_FIELDS, values):
+            if not math.isnan(v):
+                payload[f] = v
+        return payload
+
+CODECS = {
+    "json": JsonCodec(),
+    "msgpack": MsgpackCodec(),
+    "struct": StructCodec()
+}
+
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown telemetry codec: {name}")
+
+
+def decode(data) -> dict:
+    """Decode a value written by any codec."""
+    if isinstance(data, str):
+        return json.loads(data)
+    head = data[:1]
+    if head == b"{":
+        return CODECS["json"].decode(data)
+    if head == STRUCT_MAGIC:
+        return CODECS["struct"].decode(data)
+    return CODECS["msgpack"].decode(data)
+
+
+def to_json_text(data) -> str:
+    """JSON text for a stored value, without a decode/encode round trip for JSON."""
+    if isinstance(data, str):
+        return data
+    if data[:1] == b"{":
+        return data.decode()
+    return json.dumps(decode(data))
+
+
+# -------- MICROBENCHMARK -------- #
+
+def benchmark(vehicles: int = 1000, rounds: int = 5):
+    """Encode/decode time and bytes per vehicle for each codec."""
+    import random
+    import time
+
+    random.seed(0)
+    payloads = [
+        {
+            "vehicle_id": f"VIN{i:014d}",
+            "speed_kmph": random.randint(0, 140),
+            "rpm": random.randint(800, 5000),
+            "engine_temp_c": round(random.uniform(80, 110), 1),
+            "coolant_temp_c": round(random.uniform(70, 100), 1),
+            "brake_wear_percent": round(random.uniform(0, 80), 1),
+            "battery_voltage_v": round(random.uniform(11.8, 14.4), 2),
+            "fuel_level_percent": round(random.uniform(5, 100), 2),
+            "throttle_position_percent": round(random.uniform(0, 100), 1),
+            "acceleration_mps2": round(random.uniform(-3, 3), 2),
+            "latitude": 12.9716 + random.uniform(-0.5, 0.5),
+            "longitude": 77.5946 + random.uniform(-0.5, 0.5),
+            "engine_status": "ON",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        for i in range(vehicles)
+    ]
+
+    results = {}
+    for name, c in CODECS.items():
+        if name == "msgpack" and msgpack is None:
+            continue
+        encode_s = decode_s = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            encoded = [c.encode(p) for p in payloads]
+            t1 = time.perf_counter()
+            for data in encoded:
+                decode(data)
+            t2 = time.perf_counter()
+            encode_s, decode_s = min(encode_s, t1 - t0), min(decode_s, t2 - t1)
+        results[name] = {
+            "bytes_per_vehicle": sum(map(len, encoded)) / vehicles,
+            "encode_us": encode_s / vehicles * 1e6,
+            "decode_us": decode_s / vehicles * 1e6
+        }
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'codec':<10}{'bytes/vehicle':>15}{'encode us':>12}{'decode us':>12}")
+    for name, r in benchmark().items():
+        print(f"{name:<10}{r['bytes_per_vehicle']:>15.1f}{r['encode_us']:>12.2f}{r['decode_us']:>12.2f}")
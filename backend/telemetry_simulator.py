@@ -2,12 +2,15 @@ import time
 import random
 from datetime import datetime
 from redis_client import set_telemetry
-from db import telemetry_col, vehicles_col  # <-- your vehicles collection
+from db import vehicles_col  # <-- your vehicles collection
+from telemetry_buffer import telemetry_buffer
 from alerts import create_alert
 
 # keep last known state per vehicle (keyed by VIN so it matches telemetry API)
 STATE = {}
 
+TICK_SECONDS = 3
+
 
 def _check_and_create_alerts(vehicle_db_id, prev_state: dict, current: dict):
     """
@@ -27,6 +30,7 @@ def _check_and_create_alerts(vehicle_db_id, prev_state: dict, current: dict):
             alert_type="ENGINE_OVERHEAT",
             value=curr_temp,
             severity="HIGH",
+            telemetry_timestamp=current["timestamp"],
         )
 
     # Brake wear nearing limit
@@ -38,6 +42,7 @@ def _check_and_create_alerts(vehicle_db_id, prev_state: dict, current: dict):
             alert_type="BRAKE_WEAR_HIGH",
             value=curr_brake,
             severity="MEDIUM",
+            telemetry_timestamp=current["timestamp"],
         )
 
     # Critically low fuel
@@ -49,6 +54,7 @@ def _check_and_create_alerts(vehicle_db_id, prev_state: dict, current: dict):
             alert_type="FUEL_LOW",
             value=curr_fuel,
             severity="LOW",
+            telemetry_timestamp=current["timestamp"],
         )
 
 
@@ -69,11 +75,18 @@ def generate(vehicle_vin: str, vehicle_db_id):
         },
     )
 
+    speed = max(0, prev_state["speed_kmph"] + random.randint(-2, 3))
+    rpm = max(800, prev_state["rpm"] + random.randint(-100, 150))
+    # Derived the same way as simulator.py, so every ml.FEATURES field is
+    # present and the anomaly worker can score these readings
+    acceleration = (speed - prev_state["speed_kmph"]) / 3.6 / TICK_SECONDS
+    throttle = min(100, max(0, rpm / 6500 * 100 + acceleration * 10))
+
     data = {
         # Keep VIN as vehicle_id for telemetry APIs / frontend
         "vehicle_id": vehicle_vin,
-        "speed_kmph": max(0, prev_state["speed_kmph"] + random.randint(-2, 3)),
-        "rpm": max(800, prev_state["rpm"] + random.randint(-100, 150)),
+        "speed_kmph": speed,
+        "rpm": rpm,
         "engine_temp_c": round(
             prev_state["engine_temp_c"] + random.choice([0, 0.2, 0.3]), 1
         ),
@@ -85,6 +98,8 @@ def generate(vehicle_vin: str, vehicle_db_id):
         ),
         "battery_voltage_v": round(12.4 + random.random() * 0.3, 2),
         "brake_wear_percent": prev_state["brake_wear_percent"],
+        "throttle_position_percent": round(throttle, 1),
+        "acceleration_mps2": round(acceleration, 2),
         "latitude": prev_state["latitude"] + random.uniform(-0.0001, 0.0001),
         "longitude": prev_state["longitude"] + random.uniform(-0.0001, 0.0001),
         "engine_status": "ON",
@@ -99,7 +114,7 @@ def generate(vehicle_vin: str, vehicle_db_id):
 
     # Persist telemetry for live view / history
     set_telemetry(vehicle_vin, data)
-    telemetry_col.insert_one(data)
+    telemetry_buffer.enqueue(data)
 
 
 def telemetry_simulator_loop():
@@ -108,4 +123,4 @@ def telemetry_simulator_loop():
         for v in vehicles:
             # v still includes "_id" even when projecting "vin"
             generate(vehicle_vin=v["vin"], vehicle_db_id=v["_id"])
-        time.sleep(3)
+        time.sleep(TICK_SECONDS)
@@ -0,0 +1,467 @@
+# telemetry_store.py
+"""
+Storage layout for telemetry history.
+
+In "standard" mode telemetry_events is a plain collection with ISO string
+timestamps (the original behaviour). In "timeseries" mode it is a MongoDB
+time-series collection (metaField vehicle_id, timeField timestamp as a real
+datetime) whose raw points expire after TELEMETRY_RAW_TTL_SECONDS. A
+background downsampler rolls raw points into two tiers that outlive them:
+
+    telemetry_1m   per-vehicle 1-minute min/max/sum/count
+    telemetry_1h   per-vehicle 1-hour min/max/sum/count (built from 1m)
+
+query_history() picks raw, 1m or 1h based on the requested range.
+"""
+
+import base64
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from db import db
+from indexes import declare_indexes
+from config import (
+    TELEMETRY_STORAGE_MODE,
+    TELEMETRY_RAW_TTL_SECONDS,
+    TELEMETRY_1M_TTL_SECONDS,
+    TELEMETRY_1H_TTL_SECONDS,
+    TELEMETRY_DOWNSAMPLE_INTERVAL_SECONDS
+)
+
+RAW_COLLECTION = "telemetry_events"
+TIER_COLLECTIONS = {"1m": "telemetry_1m", "1h": "telemetry_1h"}
+
+# Numeric readings that get min/max/avg in the downsampled tiers
+TIER_FIELDS = [
+    "speed_kmph",
+    "rpm",
+    "engine_temp_c",
+    "coolant_temp_c",
+    "brake_wear_percent",
+    "battery_voltage_v",
+    "fuel_level_percent"
+]
+
+# Widest range (seconds) each resolution is used for
+RAW_MAX_RANGE = 6 * 3600
+MINUTE_MAX_RANGE = 7 * 24 * 3600
+
+# Raw points younger than this may still be arriving, so they are not rolled up yet
+DOWNSAMPLE_LAG = timedelta(minutes=2)
+
+state_col = None if db is None else db.telemetry_downsample_state
+
+for _tier, _ttl in (("1m", TELEMETRY_1M_TTL_SECONDS), ("1h", TELEMETRY_1H_TTL_SECONDS)):
+    declare_indexes(TIER_COLLECTIONS[_tier], [("vehicle_id", 1), ("bucket", 1)], unique=True)
+    declare_indexes(TIER_COLLECTIONS[_tier], [("bucket", 1)], expireAfterSeconds=_ttl)
+
+
+def is_timeseries() -> bool:
+    return TELEMETRY_STORAGE_MODE == "timeseries"
+
+
+# -------- WRITE PATH -------- #
+
+def ensure_telemetry_storage(database=None):
+    """Create the time-series collection before anything writes to it."""
+    if not is_timeseries():
+        return
+    if database is None:
+        database = db
+    if database is None:
+        return
+
+    existing = database.list_collections(filter={"name": RAW_COLLECTION})
+    info = next(iter(existing), None)
+    if info is None:
+        database.create_collection(
+            RAW_COLLECTION,
+            timeseries={
+                "timeField": "timestamp",
+                "metaField": "vehicle_id",
+                "granularity": "seconds"
+            },
+            expireAfterSeconds=TELEMETRY_RAW_TTL_SECONDS
+        )
+    elif info.get("type") != "timeseries":
+        print(
+            f"Warning: {RAW_COLLECTION} already exists as a regular collection; "
+            "migrate it before enabling TELEMETRY_STORAGE_MODE=timeseries"
+        )
+    else:
+        # Keep the raw TTL in sync with config
+        database.command(
+            "collMod", RAW_COLLECTION, expireAfterSeconds=TELEMETRY_RAW_TTL_SECONDS
+        )
+
+
+def to_storage_doc(doc: dict) -> dict:
+    """
+    Copy of `doc` ready for insert. Time-series collections need a BSON date
+    in the time field, so ISO strings are parsed in that mode.
+    """
+    doc = dict(doc)
+    if is_timeseries() and isinstance(doc.get("timestamp"), str):
+        doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+    return doc
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_query_time(value: datetime):
+    # Standard mode stores ISO strings, which compare correctly as strings
+    value = _naive_utc(value)
+    return value if is_timeseries() else value.isoformat()
+
+
+# -------- DOWNSAMPLING -------- #
+
+def _watermark(tier: str):
+    doc = state_col.find_one({"_id": tier})
+    return doc["until"] if doc else None
+
+
+def _set_watermark(tier: str, until: datetime):
+    state_col.update_one({"_id": tier}, {"$set": {"until": until}}, upsert=True)
+
+
+def _rollup_pipeline(since, until, unit: str, target: str, from_tier: bool) -> list:
+    time_field = "bucket" if from_tier else "timestamp"
+    group = {
+        "_id": {
+            "vehicle_id": "$vehicle_id",
+            "bucket": {"$dateTrunc": {"date": f"${time_field}", "unit": unit}}
+        },
+        "count": {"$sum": "$count" if from_tier else 1}
+    }
+    project = {"_id": 0, "vehicle_id": "$_id.vehicle_id", "bucket": "$_id.bucket", "count": 1}
+
+    for f in TIER_FIELDS:
+        # Raw points aggregate the reading itself; the hour tier re-aggregates minute partials
+        group[f"{f}_min"] = {"$min": f"${f}_min" if from_tier else f"${f}"}
+        group[f"{f}_max"] = {"$max": f"${f}_max" if from_tier else f"${f}"}
+        group[f"{f}_sum"] = {"$sum": f"${f}_sum" if from_tier else f"${f}"}
+        for suffix in ("min", "max", "sum"):
+            project[f"{f}_{suffix}"] = 1
+
+    return [
+        {"$match": {time_field: {"$gte": since, "$lt": until}}},
+        {"$group": group},
+        {"$project": project},
+        {
+            "$merge": {
+                "into": target,
+                "on": ["vehicle_id", "bucket"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }
+        }
+    ]
+
+
+def _oldest(collection, time_field: str):
+    doc = collection.find_one({}, {time_field: 1}, sort=[(time_field, 1)])
+    return doc[time_field] if doc else None
+
+
+def downsample(now=None):
+    """
+    Roll every complete minute into telemetry_1m, then every complete hour
+    into telemetry_1h. Each window is processed once; watermarks in
+    telemetry_downsample_state record how far each tier has got.
+    """
+    if not is_timeseries() or db is None:
+        return
+
+    now = now or datetime.utcnow()
+    steps = (
+        ("1m", "minute", db[RAW_COLLECTION], "timestamp", False,
+         (now - DOWNSAMPLE_LAG).replace(second=0, microsecond=0)),
+        ("1h", "hour", db[TIER_COLLECTIONS["1m"]], "bucket", True,
+         (now - DOWNSAMPLE_LAG).replace(minute=0, second=0, microsecond=0)),
+    )
+
+    for tier, unit, source, time_field, from_tier, until in steps:
+        since = _watermark(tier) or _oldest(source, time_field)
+        if since is None or since >= until:
+            continue
+        source.aggregate(
+            _rollup_pipeline(since, until, unit, TIER_COLLECTIONS[tier], from_tier)
+        )
+        _set_watermark(tier, until)
+
+
+class Downsampler:
+    def __init__(self, interval_seconds=TELEMETRY_DOWNSAMPLE_INTERVAL_SECONDS):
+        self.interval = interval_seconds
+        self.should_stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not is_timeseries() or (self.thread and self.thread.is_alive()):
+            return
+        self.should_stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.should_stop.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self.should_stop.is_set():
+            try:
+                downsample()
+            except Exception as e:
+                print(f"[telemetry_store] Downsampling failed: {e}")
+            self.should_stop.wait(self.interval)
+
+
+downsampler = Downsampler()
+
+
+# -------- READ PATH -------- #
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    if not is_timeseries():
+        return "raw"
+    span = (end - start).total_seconds()
+    if span <= RAW_MAX_RANGE:
+        return "raw"
+    if span <= MINUTE_MAX_RANGE:
+        return "1m"
+    return "1h"
+
+
+def _tier_point(doc: dict, resolution: str) -> dict:
+    point = {
+        "vehicle_id": doc["vehicle_id"],
+        "timestamp": doc["bucket"],
+        "resolution": resolution,
+        "count": doc["count"]
+    }
+    for f in TIER_FIELDS:
+        total = doc.get(f"{f}_sum")
+        point[f] = total / doc["count"] if total is not None and doc["count"] else None
+        point[f"{f}_min"] = doc.get(f"{f}_min")
+        point[f"{f}_max"] = doc.get(f"{f}_max")
+    return point
+
+
+def query_history(vehicle_id: str, start=None, end=None, limit: int = 50) -> list:
+    """
+    Newest-first telemetry for a vehicle. Without a range this is the raw
+    newest-N view; with one, wide ranges are served from the coarser tiers.
+    """
+    if start is None and end is None:
+        return list(
+            db[RAW_COLLECTION].find({"vehicle_id": vehicle_id}, {"_id": 0})
+            .sort("timestamp", -1)
+            .limit(limit)
+        )
+
+    end = _naive_utc(end) or datetime.utcnow()
+    start = _naive_utc(start) or end - timedelta(seconds=RAW_MAX_RANGE)
+    resolution = pick_resolution(start, end)
+
+    if resolution == "raw":
+        return list(
+            db[RAW_COLLECTION].find(
+                {
+                    "vehicle_id": vehicle_id,
+                    "timestamp": {"$gte": to_query_time(start), "$lte": to_query_time(end)}
+                },
+                {"_id": 0}
+            )
+            .sort("timestamp", -1)
+            .limit(limit)
+        )
+
+    docs = (
+        db[TIER_COLLECTIONS[resolution]].find(
+            {"vehicle_id": vehicle_id, "bucket": {"$gte": start, "$lte": end}},
+            {"_id": 0}
+        )
+        .sort("bucket", -1)
+        .limit(limit)
+    )
+    return [_tier_point(d, resolution) for d in docs]
+
+
+# -------- RANGE QUERIES / PAGINATION -------- #
+
+def encode_cursor(ts: datetime, doc_id=None) -> str:
+    raw = json.dumps({"ts": ts.isoformat(), "id": str(doc_id) if doc_id else None})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (
+            datetime.fromisoformat(data["ts"]),
+            ObjectId(data["id"]) if data.get("id") else None
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _as_datetime(value) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class _Bucket:
+    """Running min/max/sum/count per field for one output point."""
+
+    def __init__(self, start: datetime):
+        self.start = start
+        self.count = 0
+        self.stats = {}
+
+    def add(self, doc: dict, from_tier: bool):
+        n = doc["count"] if from_tier else 1
+        self.count += n
+        for f in TIER_FIELDS:
+            if from_tier:
+                lo, hi, total = doc.get(f"{f}_min"), doc.get(f"{f}_max"), doc.get(f"{f}_sum")
+            else:
+                lo = hi = total = doc.get(f)
+            if total is None:
+                continue
+            cur = self.stats.get(f)
+            if cur is None:
+                self.stats[f] = [lo, hi, total, n]
+            else:
+                cur[0] = min(cur[0], lo)
+                cur[1] = max(cur[1], hi)
+                cur[2] += total
+                cur[3] += n
+
+    def to_point(self, vehicle_id: str, resolution: str) -> dict:
+        point = {
+            "vehicle_id": vehicle_id,
+            "timestamp": self.start,
+            "resolution": resolution,
+            "count": self.count
+        }
+        for f in TIER_FIELDS:
+            lo, hi, total, n = self.stats.get(f, (None, None, None, 0))
+            point[f] = total / n if n else None
+            point[f"{f}_min"] = lo
+            point[f"{f}_max"] = hi
+        return point
+
+
+class HistoryPage:
+    """
+    One page of a vehicle's history between `start` and `end`, oldest first.
+
+    Iterating yields points straight off the Mongo cursor, so a page is never
+    materialised in full. With `max_points`, readings are folded into that
+    many equal time buckets across [start, end] (min/max/avg per field); the
+    bucket grid is anchored at `start`, so it stays aligned across pages.
+    After iteration, `next_cursor` is set if more data remains.
+    """
+
+    def __init__(self, vehicle_id: str, start=None, end=None, resolution: str = "auto",
+                 max_points=None, page_size: int = 1000, cursor=None):
+        self.vehicle_id = vehicle_id
+        self.end = _naive_utc(end) or datetime.utcnow()
+        self.start = _naive_utc(start) or self.end - timedelta(seconds=RAW_MAX_RANGE)
+        if self.start >= self.end:
+            raise ValueError("'from' must be before 'to'")
+
+        if resolution == "auto":
+            resolution = pick_resolution(self.start, self.end)
+        elif resolution not in ("raw", "1m", "1h"):
+            raise ValueError(f"Unknown resolution: {resolution}")
+        elif resolution != "raw" and not is_timeseries():
+            raise ValueError(
+                f"Resolution {resolution} requires TELEMETRY_STORAGE_MODE=timeseries"
+            )
+        self.resolution = resolution
+
+        self.max_points = max_points
+        self.page_size = page_size
+        self.after = decode_cursor(cursor) if cursor else None
+        self.next_cursor = None
+
+        if max_points:
+            self.bucket_width = max((self.end - self.start) / max_points, timedelta(seconds=1))
+
+    def _source(self):
+        if self.resolution == "raw":
+            collection, time_field = db[RAW_COLLECTION], "timestamp"
+            to_query = to_query_time
+        else:
+            collection, time_field = db[TIER_COLLECTIONS[self.resolution]], "bucket"
+            to_query = lambda v: v
+
+        query = {
+            "vehicle_id": self.vehicle_id,
+            time_field: {"$gte": to_query(self.start), "$lte": to_query(self.end)}
+        }
+        if self.after:
+            ts, doc_id = self.after
+            if doc_id is None:
+                query[time_field]["$gte"] = to_query(ts)
+            else:
+                # Keyset: strictly after the last (time, _id) already returned
+                query["$or"] = [
+                    {time_field: {"$gt": to_query(ts)}},
+                    {time_field: to_query(ts), "_id": {"$gt": doc_id}}
+                ]
+
+        cursor = collection.find(query).sort([(time_field, 1), ("_id", 1)])
+        return cursor, time_field
+
+    def __iter__(self):
+        cursor, time_field = self._source()
+        from_tier = self.resolution != "raw"
+
+        if not self.max_points:
+            # One output point per stored document; fetch one extra to know
+            # whether another page exists
+            emitted = 0
+            for doc in cursor.limit(self.page_size + 1):
+                if emitted == self.page_size:
+                    self.next_cursor = encode_cursor(last_ts, last_id)
+                    break
+                last_ts, last_id = _as_datetime(doc[time_field]), doc["_id"]
+                emitted += 1
+                if from_tier:
+                    yield _tier_point(doc, self.resolution)
+                else:
+                    doc.pop("_id")
+                    yield doc
+            return
+
+        emitted = 0
+        bucket = None
+        for doc in cursor:
+            ts = _as_datetime(doc[time_field])
+            index = int((ts - self.start) / self.bucket_width)
+            bucket_start = self.start + index * self.bucket_width
+            if bucket is None or bucket_start != bucket.start:
+                if bucket is not None:
+                    if emitted == self.page_size:
+                        # Resume at the first bucket not yet returned
+                        self.next_cursor = encode_cursor(bucket.start)
+                        cursor.close()
+                        return
+                    yield bucket.to_point(self.vehicle_id, self.resolution)
+                    emitted += 1
+                bucket = _Bucket(bucket_start)
+            bucket.add(doc, from_tier)
+
+        if bucket is not None:
+            if emitted == self.page_size:
+                self.next_cursor = encode_cursor(bucket.start)
+            else:
+                yield bucket.to_point(self.vehicle_id, self.resolution)
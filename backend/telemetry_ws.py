@@ -1,9 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from websocket_manager import ConnectionManager
-from redis_client import get_telemetry
 from db import db
 from datetime import datetime
-import asyncio
 
 router = APIRouter()
 manager = ConnectionManager()
@@ -23,19 +22,21 @@ async def telemetry_socket(websocket: WebSocket, vehicle_id: str):
         "disconnected_at": None
     }
 
-    result = db.ws_sessions.insert_one(session)
+    result = await run_in_threadpool(db.ws_sessions.insert_one, session)
     session_id = result.inserted_id
 
+    # Updates are pushed by the manager's per-vehicle producer; this loop
+    # only waits for the client to go away
     try:
         while True:
-            telemetry = get_telemetry(vehicle_id)
-            if telemetry:
-                await manager.broadcast(vehicle_id, telemetry)
-            await asyncio.sleep(2)
-    except WebSocketDisconnect:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         manager.disconnect(vehicle_id, websocket)
 
-        db.ws_sessions.update_one(
+        await run_in_threadpool(
+            db.ws_sessions.update_one,
             {"_id": session_id},
             {"$set": {"disconnected_at": datetime.utcnow()}}
         )
@@ -0,0 +1,25 @@
+"""
+Backend modules connect to Mongo and Redis at import time, so the
+mongomock/fakeredis fakes from benchmarks.install_fakes() go in before any
+test imports them.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmarks
+
+benchmarks.install_fakes()
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def trained_model():
+    """An active model version in ML_MODEL_DIR, trained once per session."""
+    import model_registry
+
+    benchmarks._ensure_model()
+    return model_registry.current_version()
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import alerts
+from alerts import ALERT_CREATED, ALERT_ESCALATED, ALERT_SUPPRESSED, alerts_col, raise_alert
+
+VEHICLE = "VIN-ALERTS"
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    alerts_col.delete_many({})
+
+
+def test_repeat_is_folded_into_open_alert():
+    first, outcome = raise_alert(VEHICLE, "OVERHEAT", 110, "MEDIUM")
+    assert outcome == ALERT_CREATED
+
+    alert, outcome = alerts._absorb(VEHICLE, "OVERHEAT", 112, "MEDIUM", occurrences=2)
+    assert outcome == ALERT_SUPPRESSED
+    assert alert["_id"] == first["_id"]
+    assert alert["occurrences"] == 3
+    assert alert["last_value"] == 112
+    assert alerts_col.count_documents({}) == 1
+
+
+def test_lower_severity_does_not_downgrade():
+    raise_alert(VEHICLE, "OVERHEAT", 110, "HIGH")
+    alert, outcome = alerts._absorb(VEHICLE, "OVERHEAT", 100, "LOW")
+    assert outcome == ALERT_SUPPRESSED
+    assert alert["severity"] == "HIGH"
+
+
+def test_higher_severity_escalates_once():
+    raise_alert(VEHICLE, "OVERHEAT", 110, "LOW")
+    alert, outcome = alerts._absorb(VEHICLE, "OVERHEAT", 130, "HIGH")
+    assert outcome == ALERT_ESCALATED
+    assert alert["severity"] == "HIGH"
+
+    stored = alerts_col.find_one({"_id": alert["_id"]})
+    assert stored["severity"] == "HIGH"
+    assert stored["escalations"] == 1
+    assert "escalated_at" in stored
+
+    _, outcome = alerts._absorb(VEHICLE, "OVERHEAT", 131, "HIGH")
+    assert outcome == ALERT_SUPPRESSED
+
+
+def test_no_open_alert():
+    assert alerts._absorb(VEHICLE, "OVERHEAT", 110, "LOW") is None
+
+    alert, _ = raise_alert(VEHICLE, "OVERHEAT", 110, "LOW")
+    # Other type, resolved alert, and an alert last seen outside the window
+    assert alerts._absorb(VEHICLE, "LOW_BATTERY", 11, "LOW") is None
+    alerts_col.update_one({"_id": alert["_id"]}, {"$set": {"resolved": True}})
+    assert alerts._absorb(VEHICLE, "OVERHEAT", 110, "LOW") is None
+
+    alert, _ = raise_alert(VEHICLE, "OVERHEAT", 110, "LOW")
+    stale = datetime.utcnow() - alerts.dedup_window("OVERHEAT") - timedelta(seconds=1)
+    alerts_col.update_one({"_id": alert["_id"]}, {"$set": {"last_seen": stale}})
+    assert alerts._absorb(VEHICLE, "OVERHEAT", 110, "LOW") is None
+
+
+def test_disabled_window_always_creates(monkeypatch):
+    monkeypatch.setitem(alerts.DEDUP_WINDOWS, "OVERHEAT", 0)
+    raise_alert(VEHICLE, "OVERHEAT", 110, "LOW")
+    _, outcome = raise_alert(VEHICLE, "OVERHEAT", 111, "LOW")
+    assert outcome == ALERT_CREATED
+    assert alerts_col.count_documents({}) == 2
+
+
+def test_batch_folds_repeats_and_keeps_highest_severity():
+    specs = [
+        {"vehicle_id": VEHICLE, "alert_type": "OVERHEAT", "value": v, "severity": s}
+        for v, s in ((110, "LOW"), (120, "HIGH"), (115, "MEDIUM"))
+    ]
+    results = alerts.create_alerts_many(specs)
+    assert [outcome for _, outcome in results] == [ALERT_CREATED, ALERT_SUPPRESSED, ALERT_SUPPRESSED]
+
+    stored = alerts_col.find_one({})
+    assert alerts_col.count_documents({}) == 1
+    assert stored["occurrences"] == 3
+    assert stored["severity"] == "HIGH"
+    assert (stored["value"], stored["last_value"]) == (110, 115)
+
+    results = alerts.create_alerts_many(specs[:2])
+    assert results[0][1] == ALERT_SUPPRESSED
+    assert alerts_col.find_one({})["occurrences"] == 5
+
+
+@pytest.mark.parametrize("suffix, offset", [("", 0), ("+00:00", 0), ("Z", 0), ("+05:30", 330)])
+def test_detection_latency_with_timezone_offsets(suffix, offset):
+    reading_time = datetime.utcnow() - timedelta(seconds=5)
+    local = reading_time + timedelta(minutes=offset)
+    alert, _ = raise_alert(VEHICLE, "OVERHEAT", 110, "LOW", local.isoformat() + suffix)
+
+    stored = alerts_col.find_one({"_id": alert["_id"]})
+    assert stored["telemetry_timestamp"].tzinfo is None
+    assert abs(stored["telemetry_timestamp"] - reading_time) < timedelta(milliseconds=1)
+    assert 5000 <= stored["detection_latency_ms"] < 10000
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import vehicles
+from db import db
+from entity_cache import EntityCache, get_vehicle, vehicles_cache
+from utils import UserRole
+
+
+class CountingLoader:
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, key):
+        with self.lock:
+            self.calls.append(key)
+        if self.delay:
+            time.sleep(self.delay)
+        return {"_id": key, "version": len(self.calls)}
+
+
+def test_hit_within_ttl_and_reload_after():
+    loader = CountingLoader()
+    cache = EntityCache("t", loader, ttl=0.05)
+    assert cache.get("a") is cache.get("a")
+    assert loader.calls == ["a"]
+
+    time.sleep(0.06)
+    assert cache.get("a")["version"] == 2
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_missing_entities_are_cached_too():
+    calls = []
+    cache = EntityCache("t", lambda key: calls.append(key), ttl=60)
+    assert cache.get("a") is None
+    assert cache.get("a") is None
+    assert calls == ["a"]
+
+
+def test_lru_evicts_least_recently_used():
+    loader = CountingLoader()
+    cache = EntityCache("t", loader, ttl=60, max_entries=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")      # a is now the most recently used
+    cache.get("c")      # evicts b
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get_stats()["evictions"] == 1
+
+    cache.get("b")
+    assert loader.calls == ["a", "b", "c", "b"]
+
+
+def test_invalidate_forces_reload():
+    loader = CountingLoader()
+    cache = EntityCache("t", loader, ttl=60)
+    cache.get("a")
+    cache.invalidate("a")
+    assert cache.get("a")["version"] == 2
+
+
+def test_concurrent_misses_share_one_load():
+    loader = CountingLoader(delay=0.05)
+    cache = EntityCache("t", loader, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("a"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loader.calls == ["a"]
+    assert len(results) == 8 and all(r is results[0] for r in results)
+
+
+def test_invalidate_during_load_skips_store():
+    loader = CountingLoader(delay=0.05)
+    cache = EntityCache("t", loader, ttl=60)
+    reader = threading.Thread(target=cache.get, args=("a",))
+    reader.start()
+    time.sleep(0.01)
+    cache.invalidate("a")
+    reader.join()
+
+    assert "a" not in cache.entries
+
+
+def test_register_vehicle_clears_cached_miss_for_vin():
+    db.vehicles.delete_many({})
+    vehicles_cache.clear()
+    assert get_vehicle("VIN-NEW") is None
+
+    vehicle_id = vehicles.register_vehicle("VIN-NEW", "u1", "Make", "Model", 2024, UserRole.OEM_ADMIN)
+    assert get_vehicle("VIN-NEW")["_id"] == vehicle_id
+    assert get_vehicle(vehicle_id)["vin"] == "VIN-NEW"
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import db
+from telemetry_store import RAW_COLLECTION, HistoryPage, decode_cursor, to_storage_doc
+
+START = datetime(2025, 1, 1)
+VEHICLE = "VIN-HISTORY"
+
+
+@pytest.fixture
+def readings():
+    """60 readings, one a minute, plus three sharing the same timestamp."""
+    db[RAW_COLLECTION].delete_many({})
+    docs = [
+        {"vehicle_id": VEHICLE, "timestamp": (START + timedelta(minutes=i)).isoformat(), "speed_kmph": float(i)}
+        for i in range(60)
+    ]
+    tied = (START + timedelta(minutes=30, seconds=30)).isoformat()
+    docs += [{"vehicle_id": VEHICLE, "timestamp": tied, "speed_kmph": 100.0 + i} for i in range(3)]
+    docs.append({"vehicle_id": "OTHER", "timestamp": START.isoformat(), "speed_kmph": 1.0})
+    db[RAW_COLLECTION].insert_many([to_storage_doc(d) for d in docs])
+    return docs
+
+
+def _all_pages(**kwargs):
+    points, cursor, pages = [], None, 0
+    while True:
+        page = HistoryPage(VEHICLE, START, START + timedelta(hours=1), cursor=cursor, **kwargs)
+        points.extend(page)
+        pages += 1
+        if page.next_cursor is None:
+            return points, pages
+        cursor = page.next_cursor
+
+
+def test_raw_pages_cover_everything_once(readings):
+    points, pages = _all_pages(resolution="raw", page_size=10)
+    assert pages == 7
+    assert len(points) == 63
+    assert sorted(p["speed_kmph"] for p in points) == sorted(
+        d["speed_kmph"] for d in readings if d["vehicle_id"] == VEHICLE
+    )
+    timestamps = [p["timestamp"] for p in points]
+    assert timestamps == sorted(timestamps)
+
+
+def test_page_boundary_inside_tied_timestamps(readings):
+    # Minutes 0..30 plus one of the tied readings fill the first page
+    points, _ = _all_pages(resolution="raw", page_size=32)
+    assert len(points) == 63
+    assert sorted(p["speed_kmph"] for p in points if p["speed_kmph"] >= 100) == [100.0, 101.0, 102.0]
+
+
+def test_last_page_has_no_cursor(readings):
+    page = HistoryPage(VEHICLE, START, START + timedelta(hours=1), resolution="raw", page_size=63)
+    assert len(list(page)) == 63
+    assert page.next_cursor is None
+
+
+def test_downsampled_pages_stay_on_grid(readings):
+    whole = list(HistoryPage(VEHICLE, START, START + timedelta(hours=1), max_points=6, page_size=100))
+    assert [p["count"] for p in whole] == [10, 10, 10, 13, 10, 10]
+
+    points, pages = _all_pages(max_points=6, page_size=4)
+    assert pages == 2
+    assert [(p["timestamp"], p["count"]) for p in points] == [(p["timestamp"], p["count"]) for p in whole]
+    assert whole[0]["speed_kmph_min"] == 0.0 and whole[0]["speed_kmph_max"] == 9.0
+
+
+def test_invalid_cursor_and_range():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        HistoryPage(VEHICLE, START, START)
+    with pytest.raises(ValueError):
+        HistoryPage(VEHICLE, START, START + timedelta(hours=1), resolution="1m")
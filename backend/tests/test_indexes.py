@@ -0,0 +1,17 @@
+import mongomock
+
+import indexes
+
+
+def test_failing_collection_does_not_stop_the_rest():
+    indexes._load_declarations()
+    database = mongomock.MongoClient().db
+    # Existing duplicates block the unique twin_state index
+    database.twin_state.insert_many([{"vehicle_id": "V1"}, {"vehicle_id": "V1"}])
+
+    created, failed = indexes.ensure_indexes(database)
+
+    assert list(failed) == ["twin_state"]
+    assert set(created) == set(indexes.declared_indexes()) - {"twin_state"}
+    assert "vehicle_id_1" not in database.twin_state.index_information()
+    assert len(database.alerts.index_information()) > 1
@@ -0,0 +1,71 @@
+import shutil
+
+import pytest
+
+import model_registry
+from model_registry import ModelHolder, ModelNotAvailableError
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch, trained_model):
+    """A fresh registry holding copies of the session model as v1 and v2."""
+    source = model_registry._artifact_path(trained_model), model_registry._metadata_path(trained_model)
+    monkeypatch.setattr(model_registry, "ML_MODEL_DIR", str(tmp_path))
+    for version in ("v1", "v2"):
+        shutil.copy(source[0], model_registry._artifact_path(version))
+        shutil.copy(source[1], model_registry._metadata_path(version))
+    return tmp_path
+
+
+def test_get_without_model_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "ML_MODEL_DIR", str(tmp_path))
+    with pytest.raises(ModelNotAvailableError):
+        ModelHolder(reload_seconds=0).get()
+
+
+def test_activate_unknown_version_raises(model_dir):
+    with pytest.raises(ValueError):
+        model_registry.activate_version("v9")
+
+
+def test_hot_swap_on_activate(model_dir):
+    model_registry.activate_version("v1")
+    holder = ModelHolder(reload_seconds=0)
+    first = holder.get()
+    assert holder.version == "v1"
+    assert holder.get() is first
+
+    model_registry.activate_version("v2")
+    second = holder.get()
+    assert holder.version == "v2"
+    assert second is not first
+
+
+def test_no_reload_within_interval(model_dir):
+    model_registry.activate_version("v1")
+    holder = ModelHolder(reload_seconds=3600)
+    first = holder.get()
+
+    model_registry.activate_version("v2")
+    assert holder.get() is first
+    assert holder.version == "v1"
+
+
+def test_rollback(model_dir):
+    holder = ModelHolder(reload_seconds=0)
+    model_registry.activate_version("v2")
+    holder.get()
+    model_registry.activate_version("v1")
+    holder.get()
+    assert holder.version == "v1"
+    assert model_registry.list_versions() == ["v1", "v2"]
+
+
+def test_back_to_back_trainings_get_distinct_versions(tmp_path, monkeypatch, trained_model):
+    monkeypatch.setattr(model_registry, "ML_MODEL_DIR", str(tmp_path))
+    versions = [
+        model_registry.train_model(min_samples=100, n_estimators=5, activate=False)
+        for _ in range(2)
+    ]
+    assert versions[0] != versions[1]
+    assert model_registry.list_versions() == sorted(versions)
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import db
+from entity_cache import users_cache
+from notifications import notification_col, notify_user
+from notification_dispatcher import FakeSmsSink, NotificationDispatcher
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    notification_col.delete_many({})
+    db.users.delete_many({})
+    users_cache.clear()
+    db.users.insert_many([
+        {"_id": "u-phone", "phone": "+15550100"},
+        {"_id": "u-no-phone"}
+    ])
+
+
+def _dispatcher(sink, **kwargs):
+    options = dict(workers=1, rate_per_second=0, max_attempts=3,
+                   backoff_base_ms=1000, backoff_max_ms=5000, claim_timeout_ms=60000)
+    options.update(kwargs)
+    return NotificationDispatcher(sms_sink=sink, **options)
+
+
+def _row():
+    return notification_col.find_one({})
+
+
+def test_backoff_doubles_up_to_cap():
+    dispatcher = _dispatcher(FakeSmsSink())
+    assert [dispatcher.backoff(n).total_seconds() for n in (1, 2, 3, 4, 5)] == [1, 2, 4, 5, 5]
+
+
+def test_sends_queued_row():
+    sink = FakeSmsSink()
+    notify_user("u-phone", "hello")
+    _dispatcher(sink).dispatch_pending()
+
+    assert [(m["to"], m["message"]) for m in sink.sent] == [("+15550100", "hello")]
+    row = _row()
+    assert row["status"] == "SENT"
+    assert row["attempts"] == 1
+
+
+def test_failed_send_is_retried_later_then_fails():
+    sink = FakeSmsSink(fail_every=1)
+    dispatcher = _dispatcher(sink)
+    notify_user("u-phone", "hello")
+
+    dispatcher.dispatch_pending()
+    row = _row()
+    assert row["status"] == "QUEUED"
+    assert row["attempts"] == 1
+    assert row["next_attempt_at"] > datetime.utcnow() + timedelta(milliseconds=500)
+    assert "claimed_by" not in row
+
+    # Not due yet: nothing is claimed
+    dispatcher.dispatch_pending()
+    assert _row()["attempts"] == 1
+
+    for _ in range(2):
+        notification_col.update_one({}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+        dispatcher.dispatch_pending()
+    row = _row()
+    assert row["status"] == "FAILED"
+    assert row["attempts"] == 3
+    assert dispatcher.stats["retried"] == 2 and dispatcher.stats["failed"] == 1
+
+
+def test_missing_phone_fails_without_retry():
+    sink = FakeSmsSink()
+    notify_user("u-no-phone", "hello")
+    _dispatcher(sink).dispatch_pending()
+
+    row = _row()
+    assert row["status"] == "FAILED"
+    assert row["attempts"] == 1
+    assert sink.calls == 0
+
+
+def test_stale_claim_is_reclaimed():
+    sink = FakeSmsSink()
+    dispatcher = _dispatcher(sink)
+    notify_user("u-phone", "hello")
+    # A dispatcher claimed the row and died before finishing it
+    notification_col.update_one({}, {"$set": {
+        "status": "SENDING", "attempts": 1, "claimed_by": "dead",
+        "claimed_at": datetime.utcnow() - timedelta(seconds=10)
+    }})
+
+    dispatcher.dispatch_pending()
+    assert _row()["status"] == "SENDING"
+    assert sink.calls == 0
+
+    notification_col.update_one({}, {"$set": {"claimed_at": datetime.utcnow() - timedelta(minutes=2)}})
+    dispatcher.dispatch_pending()
+    row = _row()
+    assert row["status"] == "SENT"
+    assert row["attempts"] == 2
+    assert len(sink.sent) == 1
+
+
+def test_failed_complete_does_not_stop_workers(monkeypatch):
+    sink = FakeSmsSink()
+    dispatcher = _dispatcher(sink, claim_timeout_ms=0)
+    for message in ("first", "second"):
+        notify_user("u-phone", message)
+
+    complete = dispatcher.complete
+    failures = []
+
+    def flaky_complete(doc, error=None):
+        if not failures:
+            failures.append(doc["_id"])
+            raise RuntimeError("Mongo unavailable")
+        complete(doc, error)
+
+    monkeypatch.setattr(dispatcher, "complete", flaky_complete)
+    dispatcher.dispatch_pending()
+
+    # The other row was still sent; the one left SENDING was reclaimed and sent again
+    assert notification_col.count_documents({"status": "SENT"}) == 2
+    assert notification_col.find_one({"_id": failures[0]})["attempts"] == 2
+    assert [m["message"] for m in sink.sent].count("first") == 2
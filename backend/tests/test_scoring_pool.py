@@ -0,0 +1,66 @@
+import asyncio
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+import ml
+from benchmarks import _readings
+from model_registry import get_model
+from scoring_pool import ScoringPool
+
+
+@pytest.fixture(scope="module")
+def pool(trained_model):
+    # Chunks smaller than the batch so it is split across both processes
+    pool = ScoringPool(processes=2, chunk_rows=64)
+    yield pool
+    pool.shutdown()
+
+
+def _matrix(n: int) -> np.ndarray:
+    X, _ = ml.extract_feature_matrix(_readings(n, 1, seed=3))
+    return X
+
+
+def test_pool_scores_match_in_process(pool):
+    X = _matrix(300)
+    expected = get_model().decision_function(X)
+    np.testing.assert_allclose(pool.score(X), expected)
+
+
+def test_score_async_matches(pool):
+    X = _matrix(150)
+    expected = get_model().decision_function(X)
+    np.testing.assert_allclose(asyncio.run(pool.score_async(X)), expected)
+
+
+def test_detect_anomalies_batch_skips_invalid(pool):
+    readings = _readings(100, 1, seed=4)
+    readings[5] = {k: v for k, v in readings[5].items() if k != ml.FEATURES[0]}
+    results = pool.detect_anomalies_batch(readings, skip_invalid=True)
+    assert results == ml.detect_anomalies_batch(readings, skip_invalid=True)
+    assert results[5] is None
+
+
+def test_empty_batch_and_in_process_mode(trained_model):
+    X = _matrix(20)
+    in_process = ScoringPool(processes=0)
+    np.testing.assert_allclose(in_process.score(X), get_model().decision_function(X))
+    assert in_process.score(X[:0]).shape == (0,)
+    assert in_process.executor is None
+
+
+def test_segment_unlinked_after_scoring(pool, monkeypatch):
+    names = []
+    release = ScoringPool._release
+
+    def record(shm):
+        names.append(shm.name)
+        release(shm)
+
+    monkeypatch.setattr(ScoringPool, "_release", staticmethod(record))
+    pool.score(_matrix(100))
+    assert len(names) == 1
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=names[0])
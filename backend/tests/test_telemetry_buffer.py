@@ -0,0 +1,68 @@
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from telemetry_buffer import TelemetryWriteBuffer
+
+
+class FlakyCollection:
+    """Fails the first `failures` insert_many calls, optionally after writing part of the batch."""
+
+    def __init__(self, failures: int, partial: int = 0):
+        self.collection = mongomock.MongoClient().db.telemetry_events
+        self.failures = failures
+        self.partial = partial
+        self.calls = 0
+
+    def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.partial:
+                self.collection.insert_many(docs[:self.partial], ordered=ordered)
+            raise AutoReconnect("primary stepped down")
+        return self.collection.insert_many(docs, ordered=ordered)
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+
+def _readings(n: int) -> list:
+    return [{"vehicle_id": f"V{i}", "speed_kmph": float(i)} for i in range(n)]
+
+
+def _flush(collection, docs, **kwargs) -> dict:
+    buffer = TelemetryWriteBuffer(collection, retry_base_ms=1, **kwargs)
+    buffer._write([dict(d) for d in docs])
+    return buffer.get_stats()
+
+
+def test_insert_failing_once_is_retried():
+    collection = FlakyCollection(failures=1)
+    stats = _flush(collection, _readings(10))
+    assert (stats["flushed"], stats["failed"], stats["retries"]) == (10, 0, 1)
+    assert collection.collection.count_documents({}) == 10
+
+
+def test_retry_after_partial_write_does_not_duplicate():
+    collection = FlakyCollection(failures=1, partial=4)
+    stats = _flush(collection, _readings(10))
+    assert (stats["flushed"], stats["failed"]) == (10, 0)
+    assert collection.collection.count_documents({}) == 10
+
+
+def test_gives_up_after_max_attempts():
+    collection = FlakyCollection(failures=10)
+    stats = _flush(collection, _readings(10), max_attempts=3)
+    assert (stats["flushed"], stats["failed"], stats["retries"]) == (0, 10, 2)
+    assert collection.calls == 3
+
+
+@pytest.mark.parametrize("attempts", [1, 2])
+def test_rejected_documents_are_not_retried(attempts):
+    collection = FlakyCollection(failures=attempts - 1)
+    collection.collection.create_index("vehicle_id", unique=True)
+    docs = _readings(5)
+    collection.collection.insert_one({"vehicle_id": "V2"})
+    stats = _flush(collection, docs)
+    assert (stats["flushed"], stats["failed"]) == (4, 1)
+    assert collection.calls == attempts
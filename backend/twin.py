@@ -1,21 +1,166 @@
 # twin.py
+"""
+Digital twin state: the latest known readings per vehicle.
+
+Only the newest state matters, so writes go through TwinWriter instead of
+one upsert per reading: updates overwrite an in-memory entry and mark the
+vehicle dirty, and a background thread upserts all dirty vehicles with a
+single unordered bulk_write every TWIN_FLUSH_INTERVAL_MS.
+
+Reads see this process's writes that are not flushed yet, and otherwise
+go to Mongo. Nothing read from Mongo is kept: the anomaly workers that
+update twins usually run as separate processes, so a cached copy here
+would go stale.
+"""
+
+import atexit
+import threading
+import time
 from db import db
+from pymongo import UpdateOne
 from datetime import datetime
+from config import TWIN_FLUSH_INTERVAL_MS
+from indexes import declare_indexes
 
 twin_col = db.twin_state
 
+# Every flush upserts by vehicle_id
+declare_indexes("twin_state", [("vehicle_id", 1)], unique=True)
+
+def _twin_fields(telemetry):
+    return {
+        "speed": telemetry["speed_kmph"],
+        "rpm": telemetry["rpm"],
+        "engine_temp": telemetry["engine_temp_c"],
+        "battery_level": telemetry["battery_voltage_v"],
+        "brake_wear": telemetry["brake_wear_percent"],
+        "updated_at": datetime.utcnow()
+    }
+
+
+class TwinWriter:
+    def __init__(self, collection, flush_interval_ms=TWIN_FLUSH_INTERVAL_MS):
+        self.collection = collection
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.pending = {}   # vehicle_id -> latest twin fields, not written yet
+        self.flushing = {}  # the batch a flush is writing right now
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.should_stop = threading.Event()
+        self.stats = {
+            "updates": 0,
+            "coalesced": 0,
+            "written": 0,
+            "failed": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+        # Worker processes never call stop(); don't lose their last interval
+        atexit.register(self.stop)
+
+    # -------- WRITE SIDE -------- #
+
+    def update(self, vehicle_id, telemetry):
+        self.update_many([(vehicle_id, telemetry)])
+
+    def update_many(self, items):
+        """(vehicle_id, telemetry) pairs; later pairs win for the same vehicle."""
+        self.start()
+        fields = [(vehicle_id, _twin_fields(telemetry)) for vehicle_id, telemetry in items]
+        with self.lock:
+            for vehicle_id, state in fields:
+                if vehicle_id in self.pending:
+                    # Folded into a newer state before it was ever written
+                    self.stats["coalesced"] += 1
+                self.pending[vehicle_id] = state
+            self.stats["updates"] += len(fields)
+
+    # -------- READ SIDE -------- #
+
+    def get(self, vehicle_id):
+        with self.lock:
+            state = self.pending.get(vehicle_id) or self.flushing.get(vehicle_id)
+        if state is not None:
+            return {"vehicle_id": vehicle_id, **state}
+        return self.collection.find_one({"vehicle_id": vehicle_id}, {"_id": 0})
+
+    # -------- FLUSHER -------- #
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.should_stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        self.should_stop.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        self.thread = None
+        self.flush()
+
+    def _run(self):
+        while not self.should_stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                batch, self.pending = self.pending, {}
+                self.flushing = batch
+
+            started = time.perf_counter()
+            try:
+                self.collection.bulk_write(
+                    [
+                        UpdateOne({"vehicle_id": vehicle_id}, {"$set": state}, upsert=True)
+                        for vehicle_id, state in batch.items()
+                    ],
+                    ordered=False
+                )
+                written, failed = len(batch), 0
+            except Exception as e:
+                # Retry on the next flush, unless a newer state came in meanwhile
+                with self.lock:
+                    for vehicle_id, state in batch.items():
+                        self.pending.setdefault(vehicle_id, state)
+                written, failed = 0, len(batch)
+                print(f"[twin] Flush failed for {failed} vehicles: {e}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self.lock:
+                self.flushing = {}
+                self.stats["written"] += written
+                self.stats["failed"] += failed
+                self.stats["flushes"] += 1
+                self.stats["last_flush_ms"] = elapsed_ms
+                self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+            return written
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["pending"] = len(self.pending)
+        return stats
+
+
+twin_writer = TwinWriter(twin_col)
+
+
 def update_twin_state(vehicle_id, telemetry):
-    twin_col.update_one(
-        {"vehicle_id": vehicle_id},
-        {
-            "$set": {
-                "speed": telemetry["speed_kmph"],
-                "rpm": telemetry["rpm"],
-                "engine_temp": telemetry["engine_temp_c"],
-                "battery_level": telemetry["battery_voltage_v"],
-                "brake_wear": telemetry["brake_wear_percent"],
-                "updated_at": datetime.utcnow()
-            }
-        },
-        upsert=True
-    )
+    twin_writer.update(vehicle_id, telemetry)
+
+def update_twin_states(readings: list):
+    twin_writer.update_many([(r["vehicle_id"], r) for r in readings])
+
+def get_twin_state(vehicle_id):
+    """Latest twin state: this process's unflushed update if any, else Mongo."""
+    return twin_writer.get(vehicle_id)
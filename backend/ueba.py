@@ -1,9 +1,17 @@
 from datetime import datetime, timedelta
 from db import db
+from indexes import declare_indexes, register_query
 
 usage_col = db.api_usage
 alerts_col = db.alerts
 
+declare_indexes("api_usage", [("user_id", 1), ("endpoint", 1), ("date", 1)])
+
+register_query(
+    "api_usage.daily_counter", "api_usage",
+    {"user_id": "USER", "endpoint": "/", "date": "2025-01-01"}
+)
+
 def log_api_usage(user_id, role, endpoint):
     today = datetime.utcnow().date()
 
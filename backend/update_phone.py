@@ -10,6 +10,8 @@ def update_phone():
         {"_id": user_id},
         {"$set": {"phone": phone}}
     )
+    # Runs as its own process, so it can't clear the API's entity_cache;
+    # the API picks the new number up within ENTITY_CACHE_TTL_SECONDS
     
     if result.modified_count > 0:
         print("Update SUCCESSFUL.")
@@ -14,4 +14,6 @@ def create_user(name, email, role, current_role: UserRole):
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
+    # Users are cached by _id only, and a freshly generated _id can't have
+    # been looked up yet, so there is no entity_cache entry to invalidate
     return users_col.insert_one(user).inserted_id
@@ -2,6 +2,7 @@ from db import vehicles_col
 from datetime import datetime
 from utils import UserRole
 from auth import require_roles
+from entity_cache import vehicles_cache
 
 def register_vehicle(vin, owner_user_id, make, model, year, current_role: UserRole):
     require_roles(current_role, [UserRole.OEM_ADMIN])
@@ -15,4 +16,8 @@ def register_vehicle(vin, owner_user_id, make, model, year, current_role: UserRo
         "created_at": datetime.utcnow(),
         "last_seen_at": datetime.utcnow()
     }
-    return vehicles_col.insert_one(vehicle).inserted_id
+    vehicle_id = vehicles_col.insert_one(vehicle).inserted_id
+    # Telemetry for this VIN may have been seen (and cached as unknown)
+    # before registration; the new _id itself can't be cached yet
+    vehicles_cache.invalidate(vin)
+    return vehicle_id
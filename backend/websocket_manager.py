@@ -1,17 +1,170 @@
-from fastapi import WebSocket
+import asyncio
+import json
 from collections import defaultdict
+from fastapi import WebSocket
+from redis_client import async_pubsub_client, telemetry_channel, get_telemetry_async
+from telemetry_codec import to_json_text
+
+
+class Subscriber:
+    """One WebSocket plus its own bounded outbox and sender task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.task = None
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections = defaultdict(list)
+    """
+    Fan-out hub for live telemetry.
+
+    One shared Redis PubSub (a single connection, whatever the number of
+    vehicles) is subscribed to the channel of every watched vehicle (fed
+    by set_telemetry). A vehicle's channel is subscribed when its first
+    viewer connects and unsubscribed when its last viewer leaves. The
+    listener task pushes the raw JSON text into every subscriber's bounded
+    queue. Each socket has its own sender task, so one slow client never
+    holds up the others. A subscriber whose queue overflows is evicted.
+    """
+
+    def __init__(self, queue_size: int = 16, send_timeout: float = 5.0):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.active_connections = defaultdict(dict)  # vehicle_id -> {websocket: Subscriber}
+        self.channels = {}     # channel -> vehicle_id, for watched vehicles
+        self.pubsub = None
+        self.listener = None
+        self.evicted = 0
 
     async def connect(self, vehicle_id: str, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections[vehicle_id].append(websocket)
+        sub = Subscriber(websocket, self.queue_size)
+        sub.task = asyncio.create_task(self._sender(vehicle_id, sub))
+        self.active_connections[vehicle_id][websocket] = sub
+
+        # New viewers get the latest snapshot straight away
+        try:
+            telemetry = await get_telemetry_async(vehicle_id)
+        except Exception:
+            telemetry = None
+        if telemetry:
+            self._offer(vehicle_id, sub, json.dumps(telemetry))
+
+        await self._watch(vehicle_id)
 
     def disconnect(self, vehicle_id: str, websocket: WebSocket):
-        self.active_connections[vehicle_id].remove(websocket)
+        subs = self.active_connections.get(vehicle_id)
+        if not subs:
+            return
+        sub = subs.pop(websocket, None)
+        if sub and sub.task and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+        if not subs:
+            del self.active_connections[vehicle_id]
+            self._unwatch(vehicle_id)
+
+    async def broadcast(self, vehicle_id: str, data):
+        text = data if isinstance(data, str) else json.dumps(data)
+        for sub in list(self.active_connections.get(vehicle_id, {}).values()):
+            self._offer(vehicle_id, sub, text)
+
+    def subscriber_count(self, vehicle_id: str) -> int:
+        return len(self.active_connections.get(vehicle_id, {}))
+
+    # -------- INTERNALS -------- #
+
+    def _offer(self, vehicle_id: str, sub: Subscriber, text: str):
+        try:
+            sub.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            # Slow consumer: drop it rather than buffer without bound
+            self.evicted += 1
+            self._evict(vehicle_id, sub)
+
+    def _evict(self, vehicle_id: str, sub: Subscriber):
+        self.disconnect(vehicle_id, sub.websocket)
+        asyncio.create_task(self._close(sub.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    async def _sender(self, vehicle_id: str, sub: Subscriber):
+        try:
+            while True:
+                text = await sub.queue.get()
+                await asyncio.wait_for(sub.websocket.send_text(text), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out: the socket is gone or stuck
+            self._evict(vehicle_id, sub)
+
+    async def _watch(self, vehicle_id: str):
+        channel = telemetry_channel(vehicle_id)
+        if channel in self.channels:
+            return
+        self.channels[channel] = vehicle_id
+        if self.listener is None or self.listener.done():
+            # The listener subscribes everything in self.channels itself
+            self.listener = asyncio.create_task(self._listen())
+        elif self.pubsub is not None:
+            try:
+                await self.pubsub.subscribe(channel)
+            except Exception as e:
+                # The listener resubscribes every channel when it reconnects
+                print(f"[ws hub] Subscribing {vehicle_id} failed: {e}")
+
+    def _unwatch(self, vehicle_id: str):
+        channel = telemetry_channel(vehicle_id)
+        if self.channels.pop(channel, None) is None:
+            return
+        if self.pubsub is not None and self.channels:
+            asyncio.create_task(self._unsubscribe(self.pubsub, channel))
+        # With no channels left the listener closes the PubSub on its own
+
+    async def _unsubscribe(self, pubsub, channel: str):
+        try:
+            await pubsub.unsubscribe(channel)
+        except Exception:
+            pass
 
-    async def broadcast(self, vehicle_id: str, data: dict):
-        for ws in self.active_connections.get(vehicle_id, []):
-            await ws.send_json(data)
+    async def _listen(self):
+        while self.channels:
+            pubsub = async_pubsub_client.pubsub()
+            try:
+                # _watch only subscribes through self.pubsub once it is
+                # connected; two first subscribes would open two connections
+                initial = list(self.channels)
+                await pubsub.subscribe(*initial)
+                self.pubsub = pubsub
+                late = [c for c in self.channels if c not in initial]
+                gone = [c for c in initial if c not in self.channels]
+                if late:
+                    await pubsub.subscribe(*late)
+                if gone:
+                    await pubsub.unsubscribe(*gone)
+                while self.channels:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if not message or message["type"] != "message":
+                        continue
+                    channel = message["channel"]
+                    vehicle_id = self.channels.get(channel.decode() if isinstance(channel, bytes) else channel)
+                    if vehicle_id:
+                        # Decoded once per message, not once per subscriber
+                        await self.broadcast(vehicle_id, to_json_text(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ws hub] Redis subscription failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if self.pubsub is pubsub:
+                    self.pubsub = None
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
@@ -35,11 +35,49 @@ export const telemetryApi = {
   getLive: (vehicleId: string, role: UserRole) =>
     api.get(`/telemetry/live/${vehicleId}`, { headers: { 'X-Role': role } }),
 
+  // Live state for many vehicles in one request
+  getLiveSnapshot: (
+    role: UserRole,
+    params: {
+      vins?: string[];
+      user_id?: string;
+      service_centre_id?: string;
+      fields?: string[];
+    }
+  ) =>
+    api.get('/telemetry/live', {
+      params: {
+        vins: params.vins?.join(','),
+        user_id: params.user_id,
+        service_centre_id: params.service_centre_id,
+        fields: params.fields?.join(','),
+      },
+      headers: { 'X-Role': role }
+    }),
+
   getHistory: (vehicleId: string, limit = 50, role: UserRole) =>
     api.get(`/telemetry/history/${vehicleId}`, {
       params: { limit },
       headers: { 'X-Role': role }
     }),
+
+  // Range query with server-side bucketing; pass next_cursor back as cursor
+  getHistoryRange: (
+    vehicleId: string,
+    role: UserRole,
+    params: {
+      from?: string;
+      to?: string;
+      resolution?: 'auto' | 'raw' | '1m' | '1h';
+      max_points?: number;
+      page_size?: number;
+      cursor?: string;
+    } = {}
+  ) =>
+    api.get(`/telemetry/history/${vehicleId}/range`, {
+      params,
+      headers: { 'X-Role': role }
+    }),
 };
 
 // User Views
@@ -64,6 +102,8 @@ export const userApi = {
 };
 
 // Service Views
+const BOOKINGS_PAGE_SIZE = 500;
+
 export const serviceApi = {
   getDashboardStats: (serviceCentreId: string, role: UserRole) =>
     api.get<DashboardStats>(`/service/dashboard/stats?service_centre_id=${serviceCentreId}`, { headers: { 'X-Role': role } }),
@@ -71,8 +111,21 @@ export const serviceApi = {
   getServiceCentres: (role: UserRole) =>
     api.get('/service/centres', { headers: { 'X-Role': role } }),
 
-  getBookings: (serviceCentreId: string, role: UserRole) =>
-    api.get<Booking[]>(`/service/bookings?service_centre_id=${serviceCentreId}`, { headers: { 'X-Role': role } }),
+  // Pages through every booking; the server reports the total in X-Total-Count
+  getBookings: async (serviceCentreId: string, role: UserRole) => {
+    const bookings: Booking[] = [];
+    for (;;) {
+      const res = await api.get<Booking[]>('/service/bookings', {
+        params: { service_centre_id: serviceCentreId, limit: BOOKINGS_PAGE_SIZE, offset: bookings.length },
+        headers: { 'X-Role': role },
+      });
+      bookings.push(...res.data);
+      const total = Number(res.headers['x-total-count'] ?? bookings.length);
+      if (res.data.length === 0 || bookings.length >= total) {
+        return { ...res, data: bookings };
+      }
+    }
+  },
 
   getJobs: (serviceCentreId: string, role: UserRole) =>
     api.get<JobCard[]>(`/service/jobs?service_centre_id=${serviceCentreId}`, { headers: { 'X-Role': role } }),